@@ -1,53 +1,81 @@
-import sqlite3
+from db_session import connect
 import pandas as pd
 import matplotlib.pyplot as plt
+from online_metrics import MetricsAccumulator
+from rolling_metrics import compute_rolling_metrics
 
 class PortfolioAnalyzer:
     def __init__(self, db_path="Fund.db", freq="D", base_value=100):
-        self.db_path = db_path
+        self.db_path = db_path  # Chemin de la base ou DatabaseSession partagée
         self.freq = freq
         self.base_value = base_value
         self.performance_df = None
         self.metrics_df = None
 
-    def plot_portfolio_performance(self):
-        conn = sqlite3.connect(self.db_path)
-        portfolio_df = pd.read_sql_query("SELECT * FROM Portfolio_History", conn)
-        products_df = pd.read_sql_query("SELECT * FROM Products", conn)
+    def compute_nav(self, include_cash=True):
+        """
+        Valeur liquidative (NAV) journalière de chaque RISK_TYPE, sans graphique.
+
+        Matrice des positions (dates x (RISK_TYPE, TICKER)) multipliée par la matrice des prix
+        (dates x TICKER), toutes deux alignées "as of" : à chaque date, dernière quantité
+        du Portfolio_History et dernier prix connu de Products. Le CASH est valorisé à 1.
+
+        Returns:
+            pandas.DataFrame: NAV indexée par DATE, une colonne par RISK_TYPE (NaN avant son premier snapshot)
+        """
+        conn = connect(self.db_path)
+        portfolio_df = pd.read_sql_query("SELECT RISK_TYPE, TICKER, QUANTITY, DATE_SNAPSHOT FROM Portfolio_History", conn)
+        # Prix des seuls tickers détenus ; toutes les dates de cotation pour la grille
+        products_df = pd.read_sql_query("""
+            SELECT TICKER, PRICE, IMPORT_DATE FROM Products
+            WHERE TICKER IN (SELECT DISTINCT TICKER FROM Portfolio_History)
+        """, conn)
+        dates_df = pd.read_sql_query("SELECT DISTINCT IMPORT_DATE FROM Products", conn)
         conn.close()
 
+        if portfolio_df.empty or dates_df.empty:
+            # Aucun snapshot (ou aucun prix) : NAV vide, comme le graphique vide de l'ancien calcul
+            return pd.DataFrame(index=pd.DatetimeIndex([], name="DATE"), columns=pd.Index([], name="RISK_TYPE"), dtype=float)
+
         portfolio_df["DATE_SNAPSHOT"] = pd.to_datetime(portfolio_df["DATE_SNAPSHOT"])
-        products_df["IMPORT_DATE"] = pd.to_datetime(products_df["IMPORT_DATE"], dayfirst=True)
-
-        all_dates = products_df["IMPORT_DATE"].sort_values().unique()
-        portfolio_df = portfolio_df.sort_values(["RISK_TYPE", "DATE_SNAPSHOT"])
-
-        expanded = (
-            portfolio_df
-            .groupby(["RISK_TYPE", "TICKER"])
-            .apply(lambda group: group.set_index("DATE_SNAPSHOT")
-                                    .reindex(pd.date_range(group.DATE_SNAPSHOT.min(), all_dates[-1], freq=self.freq))
-                                    .ffill()
-                                    .assign(TICKER=group["TICKER"].iloc[0])
-                                    .reset_index())
-            .reset_index(drop=True)
-        )
-
-        expanded.rename(columns={"index": "DATE"}, inplace=True)
-        expanded = expanded[expanded["DATE"].isin(products_df["IMPORT_DATE"])]
-
-        merged_df = pd.merge(
-            expanded,
-            products_df,
-            left_on=["TICKER", "DATE"],
-            right_on=["TICKER", "IMPORT_DATE"],
-            how="inner"
-        )
-
-        merged_df["POSITION_VALUE"] = merged_df["QUANTITY"] * merged_df["PRICE"]
-        portfolio_value = merged_df.groupby(["DATE", "RISK_TYPE"])["POSITION_VALUE"].sum().reset_index()
-        pivot_df = portfolio_value.pivot(index="DATE", columns="RISK_TYPE", values="POSITION_VALUE")
-        self.performance_df = pivot_df / pivot_df.iloc[0] * self.base_value
+        products_df["IMPORT_DATE"] = pd.to_datetime(products_df["IMPORT_DATE"], format="%Y-%m-%d")
+        if not include_cash:
+            portfolio_df = portfolio_df[portfolio_df["TICKER"] != "CASH"]
+
+        # Dates de valorisation : dates de cotation à la fréquence self.freq, à partir du premier snapshot
+        product_dates = pd.DatetimeIndex(pd.to_datetime(dates_df["IMPORT_DATE"], format="%Y-%m-%d")).sort_values()
+        grid = pd.date_range(portfolio_df["DATE_SNAPSHOT"].min(), product_dates[-1], freq=self.freq)
+        dates = grid[grid.isin(product_dates)]
+
+        # Matrice des positions : dernière quantité connue à chaque date (0 avant le premier snapshot)
+        positions = portfolio_df.pivot_table(index="DATE_SNAPSHOT", columns=["RISK_TYPE", "TICKER"],
+                                             values="QUANTITY", aggfunc="last")
+        positions = positions.reindex(positions.index.union(dates)).ffill().reindex(dates)
+        started = positions.notna().T.groupby(level="RISK_TYPE").any().T
+        positions = positions.fillna(0)
+
+        # Matrice des prix : dernier prix connu à chaque date, CASH à 1
+        prices = products_df.pivot_table(index="IMPORT_DATE", columns="TICKER", values="PRICE", aggfunc="last")
+        prices = prices.reindex(prices.index.union(dates)).ffill().reindex(dates)
+        prices["CASH"] = 1.0
+        prices = prices.reindex(columns=positions.columns.get_level_values("TICKER"))
+
+        values = pd.DataFrame(positions.to_numpy() * prices.fillna(0).to_numpy(), index=dates, columns=positions.columns)
+        nav = values.T.groupby(level="RISK_TYPE").sum().T
+        # Portefeuilles sans aucune valorisation (snapshots postérieurs aux prix) exclus
+        nav = nav.where(started[nav.columns]).dropna(axis=1, how="all")
+        nav.index.name = "DATE"
+        nav.columns.name = "RISK_TYPE"
+        return nav
+
+    def plot_portfolio_performance(self):
+        nav = self.compute_nav()
+        if nav.empty:
+            print("Aucun historique de portefeuille à afficher (Portfolio_History vide).")
+            self.performance_df = nav
+            return self.performance_df
+        # Base commune : première valeur connue de chaque portefeuille
+        self.performance_df = nav / nav.bfill().iloc[0] * self.base_value
 
         self.performance_df.plot(figsize=(12, 6))
         plt.title(f"Performance journalière des portefeuilles (base {self.base_value})")
@@ -98,6 +126,34 @@ class PortfolioAnalyzer:
         self.metrics_df = pd.DataFrame(metrics).T.round(2)
         return self.metrics_df
 
+    def update_metrics_online(self):
+        """
+        Métriques de compute_portfolio_metrics mises à jour de façon incrémentale : seuls les
+        jours de NAV postérieurs au dernier calcul (état stocké dans Portfolio_Metrics_State)
+        sont traités. Ne nécessite pas plot_portfolio_performance().
+        """
+        self.metrics_df = MetricsAccumulator(self.db_path).update(self.compute_nav())
+        return self.metrics_df
+
+    def compute_rolling_metrics(self, windows=None, table=None):
+        """
+        Volatilité, Sharpe et max drawdown glissants (3M et 1Y par défaut) de tous les RISK_TYPE.
+
+        Args:
+            windows (dict): Libellé de fenêtre -> nombre d'observations
+            table (str): Table SQLite où écrire le résultat (remplacée), ex: "Rolling_Metrics"
+
+        Returns:
+            pandas.DataFrame: Colonnes DATE, RISK_TYPE, WINDOW, METRIC, VALUE
+        """
+        rolling_df = compute_rolling_metrics(self.compute_nav(), windows)
+        if table is not None:
+            conn = connect(self.db_path)
+            rolling_df.assign(DATE=rolling_df["DATE"].dt.strftime("%Y-%m-%d")).to_sql(table, conn, if_exists="replace", index=False)
+            conn.commit()
+            conn.close()
+        return rolling_df
+
     def describe_best_portfolios(self):
         """
         Compare les portefeuilles pour chaque métrique et génère une phrase descriptive
@@ -107,7 +163,7 @@ class PortfolioAnalyzer:
             raise ValueError("Il faut d'abord exécuter compute_portfolio_metrics().")
 
         # Connexion à la base
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         managers_df = pd.read_sql_query("SELECT * FROM Managers", conn)
         conn.close()
 
@@ -1,6 +1,10 @@
+import re
 import sqlite3
+from db_session import connect
 from faker import Faker
 import random
+import time
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta
 from collections import defaultdict
@@ -8,8 +12,19 @@ from collections import defaultdict
 fake = Faker()
 #test abdel
 class DatabaseBuilder:
+    # Version du schéma stockée dans PRAGMA user_version, et migrations à appliquer dans l'ordre
+    SCHEMA_VERSION = 6
+    MIGRATIONS = [
+        (1, "_migration_iso_import_dates"),
+        (2, "_migration_unique_products"),
+        (3, "_migration_portfolio_history_deltas"),
+        (4, "_migration_risk_type_aum"),
+        (5, "_migration_covering_indexes"),
+        (6, "_migration_trading_limits"),
+    ]
+
     def __init__(self, db_file):
-        self.db_file = db_file
+        self.db_file = db_file  # Chemin de la base ou DatabaseSession partagée
  
     def create_tables(self):
         Query_products = """CREATE TABLE IF NOT EXISTS Products (
@@ -85,12 +100,26 @@ class DatabaseBuilder:
             RISK_TYPE TEXT NOT NULL,
             TICKER TEXT NOT NULL,
             QUANTITY INTEGER NOT NULL,
-            DATE_SNAPSHOT DATE NOT NULL
+            DATE_SNAPSHOT DATE NOT NULL,
+            IS_CHECKPOINT INTEGER NOT NULL DEFAULT 1
+        );"""
+
+        Query_history_state = """CREATE TABLE IF NOT EXISTS Portfolio_History_State (
+            RISK_TYPE TEXT PRIMARY KEY,
+            LAST_DEAL_ID INTEGER NOT NULL,
+            LAST_SNAPSHOT_DATE DATE,
+            SNAPSHOTS_SINCE_CHECKPOINT INTEGER NOT NULL
+        );"""
+
+        Query_ticker_metadata = """CREATE TABLE IF NOT EXISTS Ticker_Metadata (
+            TICKER TEXT PRIMARY KEY,
+            SECTOR TEXT NOT NULL,
+            UPDATED_AT TIMESTAMP NOT NULL
         );"""
 
  
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
             cursor.execute(Query_products)
             cursor.execute(Query_returns)
@@ -99,6 +128,8 @@ class DatabaseBuilder:
             cursor.execute(Query_portfolio)
             cursor.execute(Query_deals)
             cursor.execute(create_history_table_query)
+            cursor.execute(Query_history_state)
+            cursor.execute(Query_ticker_metadata)
             conn.commit()
             print("Tables created successfully.")
         except sqlite3.Error as e:
@@ -106,6 +137,235 @@ class DatabaseBuilder:
         finally:
             if conn:
                 conn.close()
+
+        self.migrate_database()
+
+    def migrate_database(self):
+        """
+        Met à jour le schéma d'une base existante (ex: Fund.db) vers SCHEMA_VERSION.
+        Les migrations sont idempotentes et appliquées dans une seule transaction.
+        """
+        conn = None
+        try:
+            conn = connect(self.db_file)
+            cursor = conn.cursor()
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for target_version, migration in self.MIGRATIONS:
+                if version < target_version:
+                    getattr(self, migration)(cursor)
+                    print(f"Migration {target_version} appliquée : {migration}")
+            if version < self.SCHEMA_VERSION:
+                cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erreur SQLite lors de la migration : {e}")
+            if conn:
+                conn.rollback()
+        finally:
+            if conn:
+                conn.close()
+
+    def _migration_iso_import_dates(self, cursor):
+        """
+        Convertit Products.IMPORT_DATE du format texte DD/MM/YYYY vers ISO-8601 (YYYY-MM-DD),
+        pour que ORDER BY et les filtres de dates soient chronologiques et utilisent les index.
+        """
+        cursor.execute("""
+            UPDATE Products
+            SET IMPORT_DATE = substr(IMPORT_DATE, 7, 4) || '-' || substr(IMPORT_DATE, 4, 2) || '-' || substr(IMPORT_DATE, 1, 2)
+            WHERE IMPORT_DATE GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]'
+        """)
+        # Dates stockées avec une heure (ex: 2023-01-02 00:00:00)
+        cursor.execute("""
+            UPDATE Products
+            SET IMPORT_DATE = substr(IMPORT_DATE, 1, 10)
+            WHERE IMPORT_DATE GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]?*'
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_PRODUCTS_IMPORT_DATE ON Products(IMPORT_DATE)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_PRODUCTS_TICKER_DATE ON Products(TICKER, IMPORT_DATE)")
+
+    def _migration_unique_products(self, cursor):
+        """
+        Supprime les doublons (TICKER, IMPORT_DATE) de Products en gardant la dernière ligne insérée,
+        puis impose l'unicité de la clé pour permettre les upserts de BaseUpdate.update_products.
+        """
+        cursor.execute("""
+            DELETE FROM Products
+            WHERE PRODUCT_ID NOT IN (
+                SELECT MAX(PRODUCT_ID) FROM Products GROUP BY TICKER, IMPORT_DATE
+            )
+        """)
+        if cursor.rowcount > 0:
+            print(f"{cursor.rowcount} doublons supprimés de la table Products.")
+        cursor.execute("DROP INDEX IF EXISTS IDX_PRODUCTS_TICKER_DATE")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS UX_PRODUCTS_TICKER_DATE ON Products(TICKER, IMPORT_DATE)")
+
+    def _migration_portfolio_history_deltas(self, cursor):
+        """
+        Prépare Portfolio_History au stockage incrémental : colonne IS_CHECKPOINT (les snapshots
+        existants sont complets), table d'état de la reconstruction et index par date.
+        """
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(Portfolio_History)")]
+        if "IS_CHECKPOINT" not in columns:
+            cursor.execute("ALTER TABLE Portfolio_History ADD COLUMN IS_CHECKPOINT INTEGER NOT NULL DEFAULT 1")
+        cursor.execute("""CREATE TABLE IF NOT EXISTS Portfolio_History_State (
+            RISK_TYPE TEXT PRIMARY KEY,
+            LAST_DEAL_ID INTEGER NOT NULL,
+            LAST_SNAPSHOT_DATE DATE,
+            SNAPSHOTS_SINCE_CHECKPOINT INTEGER NOT NULL
+        )""")
+        cursor.execute("""CREATE INDEX IF NOT EXISTS IDX_PORTFOLIO_HISTORY_RISK_DATE
+                          ON Portfolio_History(RISK_TYPE, DATE_SNAPSHOT)""")
+
+    def _migration_risk_type_aum(self, cursor):
+        """
+        Crée l'agrégat Risk_Type_AUM (nombre de clients, somme, minimum et maximum de
+        INVESTMENT_AMOUNT par risk type), tenu à jour par des triggers sur Clients, et le
+        remplit à partir des clients existants. L'index (RISK_TYPE, INVESTMENT_AMOUNT) permet
+        aux triggers de retrouver le minimum et le maximum sans parcourir Clients.
+        """
+        cursor.execute("""CREATE TABLE IF NOT EXISTS Risk_Type_AUM (
+            RISK_TYPE TEXT PRIMARY KEY,
+            CLIENT_COUNT INTEGER NOT NULL,
+            TOTAL_AMOUNT REAL NOT NULL,
+            MIN_AMOUNT REAL,
+            MAX_AMOUNT REAL
+        )""")
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_CLIENTS_RISK_AMOUNT ON Clients(RISK_TYPE, INVESTMENT_AMOUNT)")
+
+        # Ajout d'un client à l'agrégat de son risk type, retrait (min/max relus par l'index si besoin)
+        add_client = """
+            INSERT INTO Risk_Type_AUM (RISK_TYPE, CLIENT_COUNT, TOTAL_AMOUNT, MIN_AMOUNT, MAX_AMOUNT)
+            VALUES (NEW.RISK_TYPE, 1, NEW.INVESTMENT_AMOUNT, NEW.INVESTMENT_AMOUNT, NEW.INVESTMENT_AMOUNT)
+            ON CONFLICT(RISK_TYPE) DO UPDATE SET
+                CLIENT_COUNT = CLIENT_COUNT + 1,
+                TOTAL_AMOUNT = TOTAL_AMOUNT + excluded.TOTAL_AMOUNT,
+                MIN_AMOUNT = MIN(MIN_AMOUNT, excluded.MIN_AMOUNT),
+                MAX_AMOUNT = MAX(MAX_AMOUNT, excluded.MAX_AMOUNT);
+        """
+        remove_client = """
+            UPDATE Risk_Type_AUM SET
+                CLIENT_COUNT = CLIENT_COUNT - 1,
+                TOTAL_AMOUNT = TOTAL_AMOUNT - OLD.INVESTMENT_AMOUNT,
+                MIN_AMOUNT = CASE WHEN OLD.INVESTMENT_AMOUNT > MIN_AMOUNT THEN MIN_AMOUNT
+                                  ELSE (SELECT MIN(INVESTMENT_AMOUNT) FROM Clients WHERE RISK_TYPE = OLD.RISK_TYPE) END,
+                MAX_AMOUNT = CASE WHEN OLD.INVESTMENT_AMOUNT < MAX_AMOUNT THEN MAX_AMOUNT
+                                  ELSE (SELECT MAX(INVESTMENT_AMOUNT) FROM Clients WHERE RISK_TYPE = OLD.RISK_TYPE) END
+            WHERE RISK_TYPE = OLD.RISK_TYPE;
+            DELETE FROM Risk_Type_AUM WHERE RISK_TYPE = OLD.RISK_TYPE AND CLIENT_COUNT <= 0;
+        """
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS TRG_CLIENTS_AUM_INSERT AFTER INSERT ON Clients
+            BEGIN {add_client} END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS TRG_CLIENTS_AUM_DELETE AFTER DELETE ON Clients
+            BEGIN {remove_client} END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS TRG_CLIENTS_AUM_UPDATE AFTER UPDATE OF RISK_TYPE, INVESTMENT_AMOUNT ON Clients
+            WHEN OLD.RISK_TYPE IS NOT NEW.RISK_TYPE OR OLD.INVESTMENT_AMOUNT IS NOT NEW.INVESTMENT_AMOUNT
+            BEGIN {remove_client} {add_client} END""")
+        self._rebuild_risk_type_aum(cursor)
+
+    def _migration_covering_indexes(self, cursor):
+        """
+        Index des requêtes fréquentes (vérifiés par query_plan_check.py) :
+        - Products par date : (IMPORT_DATE, TICKER, PRICE), couvrant les lectures de fenêtres de prix
+          (remplace IDX_PRODUCTS_IMPORT_DATE) ; par ticker, l'index unique (TICKER, IMPORT_DATE) ;
+        - Deals par portefeuille et période : (RISK_TYPE, EXECUTION_DATE) ;
+        - Portfolios par portefeuille et ticker : (RISK_TYPE, TICKER, QUANTITY), couvrant la lecture du cash.
+        """
+        cursor.execute("DROP INDEX IF EXISTS IDX_PRODUCTS_IMPORT_DATE")
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_PRODUCTS_DATE_TICKER_PRICE ON Products(IMPORT_DATE, TICKER, PRICE)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_DEALS_RISK_DATE ON Deals(RISK_TYPE, EXECUTION_DATE)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS IDX_PORTFOLIOS_RISK_TICKER ON Portfolios(RISK_TYPE, TICKER, QUANTITY)")
+
+    def _migration_trading_limits(self, cursor):
+        """
+        Crée le registre Trading_Limits : compteurs par portefeuille (RISK_TYPE) et mois (PERIOD, YYYY-MM)
+        du nombre de deals et des montants achetés et vendus, tenus à jour par des triggers sur Deals.
+        NOTIONAL (montant total échangé) et TURNOVER (min des achats et des ventes) sont calculés.
+        Les contrôles de quota (ex: 2 deals par mois pour LOW_TURNOVER) se font par clé primaire.
+        """
+        cursor.execute("""CREATE TABLE IF NOT EXISTS Trading_Limits (
+            RISK_TYPE TEXT NOT NULL,
+            PERIOD TEXT NOT NULL,
+            DEAL_COUNT INTEGER NOT NULL,
+            BUY_NOTIONAL REAL NOT NULL,
+            SELL_NOTIONAL REAL NOT NULL,
+            NOTIONAL REAL GENERATED ALWAYS AS (BUY_NOTIONAL + SELL_NOTIONAL) VIRTUAL,
+            TURNOVER REAL GENERATED ALWAYS AS (MIN(BUY_NOTIONAL, SELL_NOTIONAL)) VIRTUAL,
+            PRIMARY KEY (RISK_TYPE, PERIOD)
+        )""")
+
+        add_deal = """
+            INSERT INTO Trading_Limits (RISK_TYPE, PERIOD, DEAL_COUNT, BUY_NOTIONAL, SELL_NOTIONAL)
+            VALUES (NEW.RISK_TYPE, substr(NEW.EXECUTION_DATE, 1, 7), 1,
+                    CASE WHEN NEW.TRADE_TYPE = 'Buy' THEN NEW.QUANTITY * NEW.BUY_PRICE ELSE 0 END,
+                    CASE WHEN NEW.TRADE_TYPE = 'Sell' THEN NEW.QUANTITY * NEW.BUY_PRICE ELSE 0 END)
+            ON CONFLICT(RISK_TYPE, PERIOD) DO UPDATE SET
+                DEAL_COUNT = DEAL_COUNT + 1,
+                BUY_NOTIONAL = BUY_NOTIONAL + excluded.BUY_NOTIONAL,
+                SELL_NOTIONAL = SELL_NOTIONAL + excluded.SELL_NOTIONAL;
+        """
+        remove_deal = """
+            UPDATE Trading_Limits SET
+                DEAL_COUNT = DEAL_COUNT - 1,
+                BUY_NOTIONAL = BUY_NOTIONAL - CASE WHEN OLD.TRADE_TYPE = 'Buy' THEN OLD.QUANTITY * OLD.BUY_PRICE ELSE 0 END,
+                SELL_NOTIONAL = SELL_NOTIONAL - CASE WHEN OLD.TRADE_TYPE = 'Sell' THEN OLD.QUANTITY * OLD.BUY_PRICE ELSE 0 END
+            WHERE RISK_TYPE = OLD.RISK_TYPE AND PERIOD = substr(OLD.EXECUTION_DATE, 1, 7);
+            DELETE FROM Trading_Limits
+            WHERE RISK_TYPE = OLD.RISK_TYPE AND PERIOD = substr(OLD.EXECUTION_DATE, 1, 7) AND DEAL_COUNT <= 0;
+        """
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS TRG_DEALS_LIMITS_INSERT AFTER INSERT ON Deals
+            BEGIN {add_deal} END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS TRG_DEALS_LIMITS_DELETE AFTER DELETE ON Deals
+            BEGIN {remove_deal} END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS TRG_DEALS_LIMITS_UPDATE
+            AFTER UPDATE OF RISK_TYPE, EXECUTION_DATE, TRADE_TYPE, QUANTITY, BUY_PRICE ON Deals
+            BEGIN {remove_deal} {add_deal} END""")
+        self._rebuild_trading_limits(cursor)
+
+    def _rebuild_trading_limits(self, cursor):
+        """Recalcule entièrement Trading_Limits à partir de Deals."""
+        cursor.execute("DELETE FROM Trading_Limits")
+        cursor.execute("""
+            INSERT INTO Trading_Limits (RISK_TYPE, PERIOD, DEAL_COUNT, BUY_NOTIONAL, SELL_NOTIONAL)
+            SELECT RISK_TYPE, substr(EXECUTION_DATE, 1, 7), COUNT(*),
+                   TOTAL(CASE WHEN TRADE_TYPE = 'Buy' THEN QUANTITY * BUY_PRICE END),
+                   TOTAL(CASE WHEN TRADE_TYPE = 'Sell' THEN QUANTITY * BUY_PRICE END)
+            FROM Deals
+            GROUP BY RISK_TYPE, substr(EXECUTION_DATE, 1, 7)
+        """)
+
+    def rebuild_trading_limits(self):
+        """
+        Reconstruit le registre Trading_Limits à partir de la table Deals (reprise après incident).
+
+        Returns:
+            int: Nombre de lignes (RISK_TYPE, PERIOD) du registre, None en cas d'erreur
+        """
+        conn = None
+        try:
+            conn = connect(self.db_file)
+            cursor = conn.cursor()
+            self._rebuild_trading_limits(cursor)
+            conn.commit()
+            count = cursor.execute("SELECT COUNT(*) FROM Trading_Limits").fetchone()[0]
+            print(f"Trading_Limits reconstruit à partir de Deals ({count} période(s)).")
+            return count
+        except sqlite3.Error as e:
+            print(f"Erreur SQLite : {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    def _rebuild_risk_type_aum(self, cursor):
+        """Recalcule entièrement Risk_Type_AUM à partir de Clients."""
+        cursor.execute("DELETE FROM Risk_Type_AUM")
+        cursor.execute("""
+            INSERT INTO Risk_Type_AUM (RISK_TYPE, CLIENT_COUNT, TOTAL_AMOUNT, MIN_AMOUNT, MAX_AMOUNT)
+            SELECT RISK_TYPE, COUNT(*), SUM(INVESTMENT_AMOUNT), MIN(INVESTMENT_AMOUNT), MAX(INVESTMENT_AMOUNT)
+            FROM Clients
+            GROUP BY RISK_TYPE
+        """)
  
     def determine_risk_type(self, amount, knowledge, preference, goal, age):
         """Détermine le type de risque en fonction des caractéristiques du client."""
@@ -119,6 +379,118 @@ class DatabaseBuilder:
             return 'LOW_TURNOVER'
         else:
             return random.choice(['LOW_RISK', 'LOW_TURNOVER'])
+
+    def determine_risk_types(self, amount, knowledge, preference, goal, age, rng=None, current=None):
+        """
+        Version vectorisée de determine_risk_type : mêmes règles, évaluées sous forme de masques
+        sur des tableaux de clients. Les clients sans règle applicable reçoivent LOW_RISK ou
+        LOW_TURNOVER au hasard (générateur rng), ou conservent leur risk type actuel (current)
+        s'il est l'un de ces deux.
+
+        Returns:
+            numpy.ndarray: RISK_TYPE de chaque client
+        """
+        amount, age = np.asarray(amount, dtype=float), np.asarray(age)
+        knowledge, preference, goal = np.asarray(knowledge), np.asarray(preference), np.asarray(goal)
+        rng = rng if rng is not None else np.random.default_rng()
+        fallback = np.array(['LOW_RISK', 'LOW_TURNOVER'], dtype=object)[rng.integers(0, 2, len(amount))]
+        if current is not None:
+            current = np.asarray(current, dtype=object)
+            fallback = np.where(np.isin(current, ['LOW_RISK', 'LOW_TURNOVER']), current, fallback)
+        return np.select(
+            [
+                (amount > 50000) & (knowledge == 'High') & np.isin(preference, ['Stocks', 'Cryptocurrency']),
+                (amount < 20000) & (knowledge == 'Low') & (goal == 'Wealth Preservation'),
+                (age > 60) & np.isin(goal, ['Retirement', 'Wealth Preservation']),
+                np.isin(knowledge, ['Medium', 'High']) & np.isin(preference, ['Bonds', 'Real Estate']),
+            ],
+            ['HY_EQUITY', 'LOW_RISK', 'LOW_RISK', 'LOW_TURNOVER'],
+            default=fallback,
+        )
+
+    def reclassify_clients(self, method="numpy", seed=None):
+        """
+        Recalcule le risk type de tous les clients avec les règles de determine_risk_type.
+
+        Seules les lignes dont le RISK_TYPE change sont réécrites. Un client sans règle applicable
+        conserve son risk type s'il est LOW_RISK ou LOW_TURNOVER (pas de migration aléatoire).
+
+        Args:
+            method (str): "numpy" (masques sur le DataFrame des clients) ou "sql" (un seul CASE dans SQLite)
+            seed (int): Graine du tirage des clients sans règle applicable
+
+        Returns:
+            pandas.DataFrame: Nombre de clients par ancien (lignes) et nouveau (colonnes) risk type,
+                              None en cas d'erreur
+        """
+        if method not in ("numpy", "sql"):
+            raise ValueError("method doit être 'numpy' ou 'sql'.")
+        conn = None
+        try:
+            conn = connect(self.db_file)
+            cursor = conn.cursor()
+            if method == "numpy":
+                clients = pd.read_sql_query("""
+                    SELECT CLIENTS_ID, RISK_TYPE, INVESTMENT_AMOUNT, INVESTMENT_KNOWLEDGE, ASSET_PREFERENCE, INVESTMENT_GOAL, AGE
+                    FROM Clients
+                """, conn)
+                new_risk_types = self.determine_risk_types(
+                    clients["INVESTMENT_AMOUNT"], clients["INVESTMENT_KNOWLEDGE"], clients["ASSET_PREFERENCE"],
+                    clients["INVESTMENT_GOAL"], clients["AGE"], np.random.default_rng(seed), clients["RISK_TYPE"]
+                )
+                migrations = (pd.DataFrame({"OLD_RISK_TYPE": clients["RISK_TYPE"], "NEW_RISK_TYPE": new_risk_types})
+                              .value_counts().reset_index(name="COUNT"))
+                changed = clients["RISK_TYPE"].to_numpy() != new_risk_types
+                cursor.executemany("UPDATE Clients SET RISK_TYPE = ? WHERE CLIENTS_ID = ?",
+                                   zip(new_risk_types[changed].tolist(), clients["CLIENTS_ID"][changed].tolist()))
+            else:
+                if seed is not None:
+                    random.seed(seed)
+                # random() de SQLite n'est pas initialisable : tirage des cas sans règle fait en Python
+                conn.create_function("FALLBACK_RISK_TYPE", 0, lambda: random.choice(['LOW_RISK', 'LOW_TURNOVER']))
+                cursor.execute("DROP TABLE IF EXISTS temp.Clients_Reclassification")
+                cursor.execute("""
+                    CREATE TEMP TABLE Clients_Reclassification AS
+                    SELECT CLIENTS_ID, RISK_TYPE AS OLD_RISK_TYPE,
+                           CASE
+                               WHEN INVESTMENT_AMOUNT > 50000 AND INVESTMENT_KNOWLEDGE = 'High'
+                                    AND ASSET_PREFERENCE IN ('Stocks', 'Cryptocurrency') THEN 'HY_EQUITY'
+                               WHEN INVESTMENT_AMOUNT < 20000 AND INVESTMENT_KNOWLEDGE = 'Low'
+                                    AND INVESTMENT_GOAL = 'Wealth Preservation' THEN 'LOW_RISK'
+                               WHEN AGE > 60 AND INVESTMENT_GOAL IN ('Retirement', 'Wealth Preservation') THEN 'LOW_RISK'
+                               WHEN INVESTMENT_KNOWLEDGE IN ('Medium', 'High')
+                                    AND ASSET_PREFERENCE IN ('Bonds', 'Real Estate') THEN 'LOW_TURNOVER'
+                               WHEN RISK_TYPE IN ('LOW_RISK', 'LOW_TURNOVER') THEN RISK_TYPE
+                               ELSE FALLBACK_RISK_TYPE()
+                           END AS NEW_RISK_TYPE
+                    FROM Clients
+                """)
+                cursor.execute("""
+                    UPDATE Clients
+                    SET RISK_TYPE = r.NEW_RISK_TYPE
+                    FROM temp.Clients_Reclassification r
+                    WHERE Clients.CLIENTS_ID = r.CLIENTS_ID AND r.NEW_RISK_TYPE != r.OLD_RISK_TYPE
+                """)
+                migrations = pd.read_sql_query("""
+                    SELECT OLD_RISK_TYPE, NEW_RISK_TYPE, COUNT(*) AS COUNT
+                    FROM temp.Clients_Reclassification
+                    GROUP BY OLD_RISK_TYPE, NEW_RISK_TYPE
+                """, conn)
+                cursor.execute("DROP TABLE temp.Clients_Reclassification")
+            conn.commit()
+
+            summary = migrations.pivot_table(index="OLD_RISK_TYPE", columns="NEW_RISK_TYPE", values="COUNT",
+                                             aggfunc="sum", fill_value=0)
+            moved = migrations.loc[migrations["OLD_RISK_TYPE"] != migrations["NEW_RISK_TYPE"], "COUNT"].sum()
+            print(f"{moved} client(s) reclassé(s) sur {migrations['COUNT'].sum()}.")
+            return summary
+
+        except sqlite3.Error as e:
+            print(f"Erreur SQLite : {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
  
     def generate_clients_data(self, n):
         """Génère des données fictives pour les clients."""
@@ -211,6 +583,84 @@ class DatabaseBuilder:
             clients_data.append((FIRST_NAME, LAST_NAME, EMAIL, BIRTH_DATE_STR, PHONE, REGISTRATION_DATE_STR, RISK_TYPE, INVESTMENT_AMOUNT, INVESTMENT_KNOWLEDGE, ASSET_PREFERENCE, INVESTMENT_GOAL, AGE))
         
         return clients_data
+
+    def generate_clients_bulk(self, n, seed=None, chunk_size=100000, pool_size=1000, start_index=1):
+        """
+        Génère n clients fictifs par lots, pour les chargements volumineux (tests de charge).
+
+        Les champs numériques et catégoriels sont tirés avec NumPy sur tout un lot, avec les mêmes
+        lois que generate_clients_data ; noms et téléphones sont tirés dans des pools Faker
+        pré-générés. L'EMAIL est rendu unique par le numéro du client (start_index, start_index + 1, ...).
+        Comme dans generate_clients_data, les 3 premiers clients couvrent les 3 risk types.
+
+        Args:
+            n (int): Nombre de clients (au moins 3)
+            seed (int): Graine des tirages (None : aléatoire)
+            chunk_size (int): Nombre de clients par lot
+            pool_size (int): Taille des pools de prénoms, noms et téléphones
+            start_index (int): Numéro du premier client, utilisé dans l'EMAIL
+
+        Yields:
+            list: Tuples au format de generate_clients_data, chunk_size au plus par lot
+        """
+        if n < 3:
+            raise ValueError("Il faut au moins 3 clients pour couvrir tous les risk types (LOW_RISK, LOW_TURNOVER, HY_EQUITY)")
+
+        rng = np.random.default_rng(seed)
+        pool_faker = Faker()
+        if seed is not None:
+            pool_faker.seed_instance(seed)
+        first_names = np.array([pool_faker.first_name() for _ in range(pool_size)], dtype=object)
+        last_names = np.array([pool_faker.last_name() for _ in range(pool_size)], dtype=object)
+        phones = np.array([pool_faker.phone_number() for _ in range(pool_size)], dtype=object)
+
+        knowledge_values = np.array(['Low', 'Medium', 'High'], dtype=object)
+        preference_values = np.array(['Stocks', 'Bonds', 'Commodities', 'Real Estate', 'Cryptocurrency'], dtype=object)
+        goal_values = np.array(['Retirement', 'Education', 'Wealth Preservation', 'Wealth Accumulation', 'Other'], dtype=object)
+
+        # Dates manipulées en nombre de jours depuis le 01/01/1940, libellés DD/MM/YYYY formatés une seule fois
+        today = date.today()
+        origin = date(1940, 1, 1)
+        labels = np.asarray(pd.date_range(origin, today).strftime("%d/%m/%Y"), dtype=object)
+        day = lambda d: (d - origin).days
+        max_registration = day(date(2023, 12, 31))
+        adult = 18 * 365
+        youngest = (pd.Timestamp(today) - pd.DateOffset(years=18)).date()
+
+        for first in range(0, n, chunk_size):
+            size = min(chunk_size, n - first)
+            first_name = first_names[rng.integers(0, pool_size, size)]
+            last_name = last_names[rng.integers(0, pool_size, size)]
+            index = np.arange(start_index + first, start_index + first + size).astype(str).astype(object)
+            email = first_name + "_" + last_name + "." + index + "@gmail.com"
+
+            # Naissance entre 18 et 80 ans ; tirée avant 2006 si l'enregistrement (18 ans révolus) dépasse 2023
+            birth = rng.integers(day((pd.Timestamp(youngest) - pd.DateOffset(years=62)).date()), day(youngest) + 1, size)
+            too_young = birth + adult > max_registration
+            birth[too_young] = rng.integers(day(date(1943, 1, 1)), day(date(2005, 12, 31)) + 1, too_young.sum())
+            registration = rng.integers(birth + adult, max_registration + 1)
+
+            amount = np.round(rng.uniform(100000, 10000000, size), 2)
+            knowledge = knowledge_values[rng.integers(0, 3, size)]
+            preference = preference_values[rng.integers(0, 5, size)]
+            goal = goal_values[rng.integers(0, 5, size)]
+            age = (day(today) - birth) // 365
+
+            if first == 0:
+                # Un client par risk type, avec les profils de generate_clients_data
+                amount[:3] = np.round([rng.uniform(500000, 10000000), rng.uniform(100000, 500000), rng.uniform(100000, 1000000)], 2)
+                knowledge[:3] = ['High', 'Low', ['Medium', 'High'][rng.integers(2)]]
+                preference[:3] = [['Stocks', 'Cryptocurrency'][rng.integers(2)], ['Bonds', 'Real Estate'][rng.integers(2)], ['Bonds', 'Real Estate'][rng.integers(2)]]
+                goal[:3] = [['Wealth Accumulation', 'Education'][rng.integers(2)], 'Wealth Preservation', ['Retirement', 'Wealth Preservation'][rng.integers(2)]]
+                age[:3] = [rng.integers(25, 56), rng.integers(60, 81), rng.integers(35, 66)]
+            risk_type = self.determine_risk_types(amount, knowledge, preference, goal, age, rng)
+            if first == 0:
+                risk_type[:3] = ['HY_EQUITY', 'LOW_RISK', 'LOW_TURNOVER']
+
+            yield list(zip(first_name.tolist(), last_name.tolist(), email.tolist(), labels[birth].tolist(),
+                           phones[rng.integers(0, pool_size, size)].tolist(), labels[registration].tolist(),
+                           risk_type.tolist(), amount.tolist(), knowledge.tolist(), preference.tolist(),
+                           goal.tolist(), age.tolist()))
  
     def generate_managers_data(self, l):
         """Génère des données fictives pour les managers."""
@@ -259,7 +709,7 @@ class DatabaseBuilder:
     def insert_clients_data(self, num_clients):
         """Insère des données de clients dans la base de données."""
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
             insert_query = """
             INSERT INTO Clients (FIRST_NAME, LAST_NAME, EMAIL, BIRTH_DATE, PHONE, REGISTRATION_DATE, RISK_TYPE, INVESTMENT_AMOUNT, INVESTMENT_KNOWLEDGE, ASSET_PREFERENCE, INVESTMENT_GOAL, AGE)
@@ -275,10 +725,81 @@ class DatabaseBuilder:
             if conn:
                 conn.close()
  
+    def insert_clients_bulk(self, num_clients, seed=None, chunk_size=100000):
+        """
+        Insère un grand nombre de clients générés par generate_clients_bulk, en une seule transaction.
+
+        Chaque lot est chargé par executemany dans une table temporaire sans contrainte, puis
+        déplacé dans Clients par un seul INSERT ... SELECT trié par EMAIL : les contraintes de
+        Clients restent vérifiées, dans une requête par lot au lieu d'une exécution par ligne.
+        Les index secondaires et les triggers de Clients sont supprimés pendant le chargement,
+        puis recréés avec un recalcul de Risk_Type_AUM dans la même transaction.
+        Les EMAIL sont numérotés à la suite du plus grand numéro déjà présent dans Clients.
+
+        Returns:
+            int: Nombre de clients insérés (0 en cas d'erreur, la transaction étant annulée)
+        """
+        columns = ("FIRST_NAME, LAST_NAME, EMAIL, BIRTH_DATE, PHONE, REGISTRATION_DATE, RISK_TYPE, "
+                   "INVESTMENT_AMOUNT, INVESTMENT_KNOWLEDGE, ASSET_PREFERENCE, INVESTMENT_GOAL, AGE")
+        inserted = 0
+        conn = None
+        try:
+            conn = connect(self.db_file)
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS Clients_Staging ({columns})")
+            # Le DELETE ouvre la transaction qui couvre tout le chargement
+            cursor.execute("DELETE FROM Clients_Staging")
+            start_index = self._next_client_email_index(cursor)
+            start = time.perf_counter()
+            # Index secondaires et triggers de Clients suspendus pendant le chargement, recréés ensuite
+            suspended = cursor.execute("""
+                SELECT type, name, sql FROM sqlite_master
+                WHERE tbl_name = 'Clients' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            """).fetchall()
+            for object_type, name, _ in suspended:
+                cursor.execute(f"DROP {object_type.upper()} {name}")
+            for chunk in self.generate_clients_bulk(num_clients, seed, chunk_size, start_index=start_index):
+                cursor.executemany(f"INSERT INTO Clients_Staging VALUES ({', '.join('?' * 12)})", chunk)
+                cursor.execute(f"INSERT INTO Clients ({columns}) SELECT {columns} FROM Clients_Staging ORDER BY EMAIL")
+                cursor.execute("DELETE FROM Clients_Staging")
+                inserted += len(chunk)
+            cursor.execute("DROP TABLE temp.Clients_Staging")
+            for _, _, sql in suspended:
+                cursor.execute(sql)
+            if any(object_type == "trigger" for object_type, _, _ in suspended):
+                # Les triggers n'ont pas vu les nouveaux clients : agrégat recalculé en une requête
+                self._rebuild_risk_type_aum(cursor)
+            conn.commit()
+            elapsed = time.perf_counter() - start
+            print(f"{inserted} clients insérés avec succès dans la table 'Clients' "
+                  f"({inserted / elapsed if elapsed > 0 else 0:,.0f} lignes/s).")
+        except ValueError as e:
+            if conn:
+                conn.rollback()
+            print(f"Erreur de validation : {e}")
+        except sqlite3.Error as e:
+            if conn:
+                conn.rollback()
+            inserted = 0
+            print(f"Erreur SQLite : {e}")
+        finally:
+            if conn:
+                conn.close()
+        return inserted
+
+    def _next_client_email_index(self, cursor):
+        """Premier numéro d'EMAIL libre pour generate_clients_bulk (EMAIL de la forme prenom_nom.N@gmail.com)."""
+        emails = cursor.execute("""
+            SELECT EMAIL FROM Clients WHERE EMAIL GLOB '*.[0-9]*@gmail.com'
+        """).fetchall()
+        suffix = re.compile(r"\.(\d+)@gmail\.com$")
+        matches = (suffix.search(email) for email, in emails)
+        return max((int(match.group(1)) for match in matches if match), default=0) + 1
+ 
     def insert_managers_data(self, num_managers):
         """Insère des données de managers dans la base de données."""
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
             insert_query = """
             INSERT INTO Managers (FIRST_NAME, LAST_NAME, BIRTH_DATE, EMAIL, PHONE, SENIORITY, RISK_TYPE)
@@ -299,17 +820,10 @@ class DatabaseBuilder:
     def get_investment_amount_by_risk_type(self):
         """Calcule la somme des montants d'investissement par risk type."""
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
             
-            query = """
-            SELECT RISK_TYPE, COUNT(*) as client_count, SUM(INVESTMENT_AMOUNT) as total_amount
-            FROM Clients
-            GROUP BY RISK_TYPE
-            ORDER BY RISK_TYPE
-            """
-            
-            cursor.execute(query)
+            cursor.execute(self._risk_type_aum_query(cursor))
             results = cursor.fetchall()
             
             print("\nRésumé des investissements par risk type:")
@@ -329,20 +843,81 @@ class DatabaseBuilder:
             if conn:
                 conn.close()
 
+    def _risk_type_aum_query(self, cursor):
+        """
+        Requête (RISK_TYPE, CLIENT_COUNT, TOTAL_AMOUNT) triée par RISK_TYPE : lecture de l'agrégat
+        Risk_Type_AUM tenu par les triggers de Clients, ou GROUP BY sur Clients pour une base
+        pas encore migrée (schéma antérieur à la migration 4).
+        """
+        if cursor.execute("PRAGMA user_version").fetchone()[0] >= 4:
+            return """
+            SELECT RISK_TYPE, CLIENT_COUNT, TOTAL_AMOUNT
+            FROM Risk_Type_AUM
+            ORDER BY RISK_TYPE
+            """
+        return """
+        SELECT RISK_TYPE, COUNT(*), SUM(INVESTMENT_AMOUNT)
+        FROM Clients
+        GROUP BY RISK_TYPE
+        ORDER BY RISK_TYPE
+        """
+
+    def verify_risk_type_aum(self, repair=False, rel_tol=1e-9):
+        """
+        Compare l'agrégat Risk_Type_AUM à un recalcul complet sur Clients.
+
+        Args:
+            repair (bool): Reconstruire l'agrégat si des écarts sont trouvés
+            rel_tol (float): Tolérance relative sur les montants (sommes cumulées en flottant)
+
+        Returns:
+            pandas.DataFrame: Risk types en écart, valeurs stockées (_STORED) et recalculées (_ACTUAL) ;
+                              vide si l'agrégat est exact, None en cas d'erreur
+        """
+        conn = None
+        try:
+            conn = connect(self.db_file)
+            stored = pd.read_sql_query("SELECT * FROM Risk_Type_AUM", conn)
+            actual = pd.read_sql_query("""
+                SELECT RISK_TYPE, COUNT(*) AS CLIENT_COUNT, SUM(INVESTMENT_AMOUNT) AS TOTAL_AMOUNT,
+                       MIN(INVESTMENT_AMOUNT) AS MIN_AMOUNT, MAX(INVESTMENT_AMOUNT) AS MAX_AMOUNT
+                FROM Clients
+                GROUP BY RISK_TYPE
+            """, conn)
+
+            comparison = stored.merge(actual, on="RISK_TYPE", how="outer", suffixes=("_STORED", "_ACTUAL"))
+            columns = ["CLIENT_COUNT", "TOTAL_AMOUNT", "MIN_AMOUNT", "MAX_AMOUNT"]
+            stored_values = comparison[[f"{col}_STORED" for col in columns]].to_numpy(dtype=float)
+            actual_values = comparison[[f"{col}_ACTUAL" for col in columns]].to_numpy(dtype=float)
+            matches = np.isclose(stored_values, actual_values, rtol=rel_tol, atol=0)
+            mismatches = comparison[~matches.all(axis=1)].reset_index(drop=True)
+
+            if mismatches.empty:
+                print("Risk_Type_AUM est cohérent avec la table Clients.")
+            else:
+                print(f"⚠️ Risk_Type_AUM en écart pour : {', '.join(mismatches['RISK_TYPE'])}")
+                if repair:
+                    self._rebuild_risk_type_aum(conn.cursor())
+                    conn.commit()
+                    print("Risk_Type_AUM reconstruit à partir de Clients.")
+            return mismatches
+
+        except sqlite3.Error as e:
+            print(f"Erreur SQLite : {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
     def insert_initial_cash_portfolios(self, start_date):
         """Insère les montants initiaux en cash dans la table Portfolios."""
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
             
             # Récupérer les montants par risk type
-            query_amounts = """
-            SELECT RISK_TYPE, SUM(INVESTMENT_AMOUNT) as total_amount
-            FROM Clients
-            GROUP BY RISK_TYPE
-            """
-            cursor.execute(query_amounts)
-            risk_amounts = cursor.fetchall()
+            cursor.execute(self._risk_type_aum_query(cursor))
+            risk_amounts = [(risk_type, amount) for risk_type, _, amount in cursor.fetchall()]
             
             # Récupérer les managers par risk type
             query_managers = """
@@ -376,38 +951,77 @@ class DatabaseBuilder:
             if conn:
                 conn.close()
             
-    def rebuild_portfolio_history_by_risk_type(self, risk_type):
+    def rebuild_portfolio_history_by_risk_type(self, risk_type, incremental=False, checkpoint_every=10):
+        """
+        Reconstruit Portfolio_History à partir des Deals.
+
+        Mode complet (par défaut) : l'historique du type de risque est effacé, puis un snapshot
+        complet est écrit à chaque date de deal à partir de la composition actuelle de Portfolios
+        (deux appels successifs donnent le même historique).
+        Mode incrémental : reprend au dernier snapshot et ne traite que les nouveaux deals. Seules
+        les positions modifiées sont écrites (quantité absolue, 0 pour une position soldée), avec
+        un snapshot complet (IS_CHECKPOINT = 1) toutes les checkpoint_every dates. Sans état de
+        reprise, ou si un nouveau deal est antérieur ou égal au dernier snapshot, l'historique du
+        type de risque est effacé et entièrement reconstruit.
+        Dans les deux modes, un snapshot complet contient aussi une ligne à 0 pour chaque position
+        soldée à cette date, pour que les lectures "dernière quantité connue" ne la prolongent pas.
+        """
+        conn = None
         try:
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
 
-            # 1. Composition initiale des portefeuilles ayant ce type de risque
-            cursor.execute("""
-                SELECT TICKER, QUANTITY
-                FROM Portfolios
-                WHERE RISK_TYPE = ?
-            """, (risk_type,))
-            initial_assets = cursor.fetchall()
+            deals_query = """
+                SELECT DEAL_ID, DATE(EXECUTION_DATE), TICKER, TRADE_TYPE, QUANTITY
+                FROM Deals
+                WHERE RISK_TYPE = ? AND DEAL_ID > ?
+                ORDER BY EXECUTION_DATE ASC, DEAL_ID ASC
+            """
+            state = cursor.execute("""
+                SELECT LAST_DEAL_ID, LAST_SNAPSHOT_DATE, SNAPSHOTS_SINCE_CHECKPOINT
+                FROM Portfolio_History_State WHERE RISK_TYPE = ?
+            """, (risk_type,)).fetchone() if incremental else None
 
-            # Portefeuille global (non plus par manager)
-            portfolio = {ticker: qty for ticker, qty in initial_assets}
+            portfolio = None
+            if state is not None:
+                last_deal_id, last_snapshot_date, since_checkpoint = state
+                deals = cursor.execute(deals_query, (risk_type, last_deal_id)).fetchall()
+                if last_snapshot_date is not None and any(deal[1] <= last_snapshot_date for deal in deals):
+                    print(f"⚠️ Nouveaux deals antérieurs au dernier snapshot ({last_snapshot_date}) : reconstruction complète.")
+                elif last_snapshot_date is not None:
+                    # Reprise depuis les positions du dernier snapshot
+                    portfolio = self._holdings_as_of(cursor, risk_type, last_snapshot_date)
 
-            # 2. Récupérer les deals triés par date pour ce risk_type
-            cursor.execute("""
-                SELECT DATE(EXECUTION_DATE), TICKER, TRADE_TYPE, QUANTITY
-                FROM Deals
-                WHERE RISK_TYPE = ?
-                ORDER BY EXECUTION_DATE ASC
-            """, (risk_type,))
-            deals = cursor.fetchall()
+            if portfolio is None:
+                cursor.execute("DELETE FROM Portfolio_History WHERE RISK_TYPE = ?", (risk_type,))
+                last_deal_id, last_snapshot_date, since_checkpoint = 0, None, None
+
+                # 1. Composition initiale des portefeuilles ayant ce type de risque
+                cursor.execute("""
+                    SELECT TICKER, QUANTITY
+                    FROM Portfolios
+                    WHERE RISK_TYPE = ?
+                    ORDER BY INPUT_ID
+                """, (risk_type,))
+                initial_assets = cursor.fetchall()
+
+                # Portefeuille global (non plus par manager)
+                portfolio = {ticker: qty for ticker, qty in initial_assets}
+
+                # 2. Récupérer les deals triés par date pour ce risk_type
+                deals = cursor.execute(deals_query, (risk_type, 0)).fetchall()
 
             # 3. Grouper les deals par date
             deals_by_date = defaultdict(list)
-            for date, ticker, trade_type, qty in deals:
+            for deal_id, date, ticker, trade_type, qty in deals:
                 deals_by_date[date].append((ticker, trade_type, qty))
+                last_deal_id = max(last_deal_id, deal_id)
 
-            # 4. Appliquer les deals et sauvegarder un snapshot unique par date
+            # 4. Appliquer les deals et préparer un snapshot (complet ou delta) par date
+            rows = []
             for date in sorted(deals_by_date.keys()):
+                previous = portfolio
+                portfolio = dict(portfolio)
                 for ticker, trade_type, qty in deals_by_date[date]:
                     if trade_type == 'Buy':
                         portfolio[ticker] = portfolio.get(ticker, 0) + qty
@@ -417,19 +1031,73 @@ class DatabaseBuilder:
                 # Nettoyage des actifs à 0
                 portfolio = {k: v for k, v in portfolio.items() if v > 0}
 
-                # Insertion snapshot
-                for tick, qte in portfolio.items():
-                    cursor.execute("""
-                        INSERT INTO Portfolio_History (RISK_TYPE, TICKER, QUANTITY, DATE_SNAPSHOT)
-                        VALUES (?, ?, ?, ?)
-                    """, (risk_type, tick, qte, date))
+                if not incremental or since_checkpoint is None or since_checkpoint + 1 >= checkpoint_every:
+                    rows.extend((risk_type, tick, qte, date, 1) for tick, qte in portfolio.items())
+                    rows.extend((risk_type, tick, 0, date, 1) for tick, qte in previous.items()
+                                if qte > 0 and tick not in portfolio)
+                    since_checkpoint = 0
+                else:
+                    changed = [tick for tick in {**previous, **portfolio} if previous.get(tick, 0) != portfolio.get(tick, 0)]
+                    rows.extend((risk_type, tick, portfolio.get(tick, 0), date, 0) for tick in changed)
+                    since_checkpoint += 1
+                last_snapshot_date = date
+
+            # 5. Insertion groupée des snapshots et mise à jour de l'état
+            cursor.executemany("""
+                INSERT INTO Portfolio_History (RISK_TYPE, TICKER, QUANTITY, DATE_SNAPSHOT, IS_CHECKPOINT)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            cursor.execute("""
+                INSERT INTO Portfolio_History_State (RISK_TYPE, LAST_DEAL_ID, LAST_SNAPSHOT_DATE, SNAPSHOTS_SINCE_CHECKPOINT)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(RISK_TYPE) DO UPDATE SET
+                    LAST_DEAL_ID = excluded.LAST_DEAL_ID,
+                    LAST_SNAPSHOT_DATE = excluded.LAST_SNAPSHOT_DATE,
+                    SNAPSHOTS_SINCE_CHECKPOINT = excluded.SNAPSHOTS_SINCE_CHECKPOINT
+            """, (risk_type, last_deal_id, last_snapshot_date, since_checkpoint or 0))
 
             conn.commit()
-            print(f"✅ Historique reconstruit pour RISK_TYPE = '{risk_type}'")
+            print(f"✅ Historique reconstruit pour RISK_TYPE = '{risk_type}' ({len(rows)} lignes écrites)")
         except sqlite3.Error as e:
             print(f"❌ Erreur SQLite : {e}")
         finally:
             if conn:
                 conn.close()
 
+    def _holdings_as_of(self, cursor, risk_type, iso_date):
+        """Positions (TICKER -> QUANTITY > 0) au dernier snapshot <= iso_date : dernier checkpoint + deltas suivants."""
+        cursor.execute("""
+            SELECT TICKER, QUANTITY FROM (
+                SELECT TICKER, QUANTITY,
+                       ROW_NUMBER() OVER (PARTITION BY TICKER ORDER BY DATE_SNAPSHOT DESC, HISTORY_ID DESC) AS RN
+                FROM Portfolio_History
+                WHERE RISK_TYPE = ? AND DATE_SNAPSHOT <= ?
+                  AND DATE_SNAPSHOT >= (
+                      SELECT MAX(DATE_SNAPSHOT) FROM Portfolio_History
+                      WHERE RISK_TYPE = ? AND IS_CHECKPOINT = 1 AND DATE_SNAPSHOT <= ?
+                  )
+            )
+            WHERE RN = 1 AND QUANTITY > 0
+        """, (risk_type, iso_date, risk_type, iso_date))
+        return dict(cursor.fetchall())
+
+    def get_portfolio_holdings_as_of(self, risk_type, as_of_date):
+        """
+        Positions d'un type de risque à une date, sans rejouer les deals.
 
+        Args:
+            risk_type (str): LOW_RISK, LOW_TURNOVER ou HY_EQUITY
+            as_of_date (str or date): Date au format DD/MM/YYYY, ou objet date/datetime
+
+        Returns:
+            pandas.DataFrame: Colonnes TICKER et QUANTITY (vide avant le premier snapshot)
+        """
+        if isinstance(as_of_date, str):
+            as_of_date = pd.to_datetime(as_of_date, format="%d/%m/%Y")
+        iso_date = pd.Timestamp(as_of_date).strftime("%Y-%m-%d")
+        conn = connect(self.db_file)
+        try:
+            holdings = self._holdings_as_of(conn.cursor(), risk_type, iso_date)
+        finally:
+            conn.close()
+        return pd.DataFrame(sorted(holdings.items()), columns=["TICKER", "QUANTITY"])
@@ -1,7 +1,64 @@
+import numpy as np
 import pandas as pd
 from data_collector import GetData
 from datetime import datetime, timedelta
 import sqlite3
+from db_session import connect
+
+
+class IndexedFeed:
+    """
+    Price feed indexed once by date.
+
+    IMPORT_DATE is parsed and the rows are sorted by datetime64 once, so that each
+    update window is found by binary search instead of re-parsing the whole feed.
+    """
+
+    def __init__(self, data):
+        """
+        Index a price feed.
+
+        Args:
+            data (pandas.DataFrame): Feed with IMPORT_DATE (datetime, YYYY-MM-DD or DD/MM/YYYY),
+                                     TICKER, SECTOR and PRICE columns, e.g. GetData.main_data_frame()
+
+        Raises:
+            ValueError: If the IMPORT_DATE format is not recognized
+        """
+        dates = data['IMPORT_DATE']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = dates.astype(str)
+            if dates.str.contains('-').all():
+                dates = pd.to_datetime(dates)
+            elif dates.str.contains('/').all():
+                dates = pd.to_datetime(dates, format='%d/%m/%Y')
+            else:
+                raise ValueError("Format de date non reconnu")
+        dates = pd.DatetimeIndex(dates).tz_localize(None).normalize().as_unit('ns')
+
+        # Frame normalisée (dates ISO, prix float), dans l'ordre d'origine des lignes
+        self.data = data.assign(IMPORT_DATE=dates.strftime('%Y-%m-%d'),
+                                PRICE=data['PRICE'].astype(float)).reset_index(drop=True)
+        self._order = np.argsort(dates.to_numpy(), kind='stable')
+        self._dates = dates.to_numpy()[self._order]
+
+    def __len__(self):
+        return len(self.data)
+
+    def window(self, start_date, end_date):
+        """
+        Rows whose date is between start_date and end_date (both included).
+
+        Args:
+            start_date (datetime): First date of the window
+            end_date (datetime): Last date of the window
+
+        Returns:
+            pandas.DataFrame: Matching rows, in the order of the original feed
+        """
+        start = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left')
+        end = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right')
+        return self.data.iloc[np.sort(self._order[start:end])]
 
 
 class BaseUpdate: 
@@ -9,57 +66,74 @@ class BaseUpdate:
         self.tickers = tickers
         self.start_date = datetime.strptime(start_date, "%d/%m/%Y")
         self.end_date = datetime.strptime(end_date, "%d/%m/%Y")
-        self.db_file = db_file
+        self.db_file = db_file  # Chemin de la base ou DatabaseSession partagée
         self.all_data = existing_data
 
-    def update_products(self):
+    def update_products(self, bulk=False, outlier_remover=None):
         """
         Updates the Products table with new market data for a specific date range.
-        Uses the existing DataFrame passed during initialization.
+        Uses the existing DataFrame (or IndexedFeed) passed during initialization.
+        
+        Args:
+            bulk (bool): Upsert all rows in a single transaction through a staging table
+                         (idempotent on (TICKER, IMPORT_DATE)); False inserts row by row.
+                         Needs the unique (TICKER, IMPORT_DATE) index created by
+                         DatabaseBuilder.migrate_database(); falls back to row by row without it
+            outlier_remover (OutlierRemover): Filter applied to the rows before they are written,
+                         through its filter_stream method (e.g. OutlierRemover("hampel", group_by="TICKER"));
+                         its history is seeded with the last prices already stored in Products
+        
+        Returns:
+            dict: Number of rows inserted, updated and skipped (None if nothing was written);
+                  rows without a valid price are skipped in both modes
         """
         try:
             if self.all_data is None:
                 print("No data available. Please provide existing_data during initialization.")
                 return
             
-            # Convert IMPORT_DATE to datetime for filtering
-            df = self.all_data.copy()
-            
-            # Convertir les dates au format DD/MM/YYYY
+            # Indexer le flux par date (une seule fois si un IndexedFeed est fourni)
             try:
-                # Si les dates sont déjà au format datetime
-                if pd.api.types.is_datetime64_any_dtype(df['IMPORT_DATE']):
-                    df['IMPORT_DATE'] = df['IMPORT_DATE'].dt.strftime('%d/%m/%Y')
-                else:
-                    # Si les dates sont au format YYYY-MM-DD
-                    if df['IMPORT_DATE'].str.contains('-').all():
-                        df['IMPORT_DATE'] = pd.to_datetime(df['IMPORT_DATE']).dt.strftime('%d/%m/%Y')
-                    # Si les dates sont déjà au format DD/MM/YYYY
-                    elif df['IMPORT_DATE'].str.contains('/').all():
-                        pass  # Ne rien faire, déjà au bon format
-                    else:
-                        print("Format de date non reconnu")
-                        return
+                feed = self.all_data if isinstance(self.all_data, IndexedFeed) else IndexedFeed(self.all_data)
             except Exception as e:
                 print(f"Erreur lors de la conversion des dates: {e}")
                 return
             
             # Filter data for the specified date range
-            mask = (pd.to_datetime(df['IMPORT_DATE'], format='%d/%m/%Y') >= self.start_date) & \
-                   (pd.to_datetime(df['IMPORT_DATE'], format='%d/%m/%Y') <= self.end_date)
-            df_filtered = df[mask].copy()
+            df_filtered = feed.window(self.start_date, self.end_date).copy()
             
             if df_filtered.empty:
                 print(f"No data available for the specified date range ({self.start_date.strftime('%d/%m/%Y')} to {self.end_date.strftime('%d/%m/%Y')})")
                 return
             
-            # S'assurer que PRICE est un float
-            df_filtered.loc[:, 'PRICE'] = df_filtered['PRICE'].astype(float)
-            
             # Connect to the database
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
             
+            if outlier_remover is not None:
+                df_filtered = self._filter_outliers(cursor, df_filtered, outlier_remover)
+            
+            # Prix manquants (NaN) ou négatifs : ignorés dans les deux modes, car ils violeraient
+            # les contraintes de Products (et feraient échouer tout l'upsert groupé)
+            invalid = ~(df_filtered['PRICE'] >= 0)
+            if invalid.any():
+                print(f"{int(invalid.sum())} row(s) with a missing or negative price skipped")
+            rows = df_filtered[~invalid]
+            
+            # Index unique (TICKER, IMPORT_DATE) créé par la migration 2 (_migration_unique_products)
+            if bulk and cursor.execute("PRAGMA user_version").fetchone()[0] < 2:
+                print("Bulk upsert unavailable: Products has no unique (TICKER, IMPORT_DATE) index yet "
+                      "(run DatabaseBuilder.migrate_database()). Inserting row by row.")
+                bulk = False
+            
+            if bulk:
+                counts = self._bulk_upsert_products(cursor, rows)
+                counts['skipped'] += int(invalid.sum())
+                conn.commit()
+                print(f"Products upsert for the period {self.start_date.strftime('%d/%m/%Y')} to {self.end_date.strftime('%d/%m/%Y')}: "
+                      f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['skipped']} skipped")
+                return counts
+            
             # Prepare the insert query
             insert_query = """
             INSERT INTO Products (TICKER, SECTOR, PRICE, IMPORT_DATE)
@@ -68,13 +142,13 @@ class BaseUpdate:
             
             # Insert the filtered data
             records_inserted = 0
-            for _, row in df_filtered.iterrows():
+            for _, row in rows.iterrows():
                 try:
                     cursor.execute(insert_query, (
                         str(row['TICKER']),
                         str(row['SECTOR']),
                         float(row['PRICE']),
-                        str(row['IMPORT_DATE'])  # Déjà au format DD/MM/YYYY
+                        str(row['IMPORT_DATE'])  # Déjà au format YYYY-MM-DD
                     ))
                     records_inserted += 1
                 except sqlite3.Error as e:
@@ -83,6 +157,7 @@ class BaseUpdate:
             
             conn.commit()
             print(f"Successfully inserted {records_inserted} new records into Products table for the period {self.start_date.strftime('%d/%m/%Y')} to {self.end_date.strftime('%d/%m/%Y')}")
+            return {'inserted': records_inserted, 'updated': 0, 'skipped': len(df_filtered) - records_inserted}
             
         except Exception as e:
             print(f"Error updating Products table: {e}")
@@ -90,9 +165,98 @@ class BaseUpdate:
             if 'conn' in locals():
                 conn.close()
                     
+    def _filter_outliers(self, cursor, df, outlier_remover, batch_size=500):
+        """
+        Remove outliers from the rows of the update window with a streaming OutlierRemover.
+        
+        For a per-ticker filter, the tickers missing from the remover history are first seeded
+        with their last window - 1 prices stored before the update window, so that the first
+        rows of the window are checked against the stored series.
+        
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the open connection
+            df (pandas.DataFrame): Rows of the update window
+            outlier_remover (OutlierRemover): Filter to apply
+            batch_size (int): Number of tickers per history query
+            
+        Returns:
+            pandas.DataFrame: Rows kept
+        """
+        if outlier_remover.group_by == 'TICKER':
+            known = set() if outlier_remover.history is None else set(outlier_remover.history['TICKER'])
+            tickers = [ticker for ticker in df['TICKER'].unique() if ticker not in known]
+            rows = []
+            for first in range(0, len(tickers), batch_size):
+                batch = tickers[first:first + batch_size]
+                rows.extend(cursor.execute(f"""
+                    SELECT TICKER, SECTOR, PRICE, IMPORT_DATE FROM (
+                        SELECT TICKER, SECTOR, PRICE, IMPORT_DATE,
+                               ROW_NUMBER() OVER (PARTITION BY TICKER ORDER BY IMPORT_DATE DESC) AS POSITION
+                        FROM Products
+                        WHERE TICKER IN ({', '.join('?' * len(batch))}) AND IMPORT_DATE < ?
+                    )
+                    WHERE POSITION < ?
+                """, (*batch, self.start_date.strftime('%Y-%m-%d'), outlier_remover.window)).fetchall())
+            outlier_remover.seed_history(pd.DataFrame(rows, columns=['TICKER', 'SECTOR', 'PRICE', 'IMPORT_DATE']))
+        
+        kept = outlier_remover.filter_stream(df)
+        if len(kept) < len(df):
+            print(f"{len(df) - len(kept)} outlier row(s) removed before the Products update")
+        return kept
+    
+    def _bulk_upsert_products(self, cursor, df):
+        """
+        Upsert rows into Products through a temporary staging table, keyed on (TICKER, IMPORT_DATE).
+        Existing rows are only rewritten when their price or sector changed. The unique index on
+        the key is created by the schema migration, after removing the duplicates.
+        
+        Args:
+            cursor (sqlite3.Cursor): Cursor of the open transaction
+            df (pandas.DataFrame): Rows to write, IMPORT_DATE in YYYY-MM-DD format
+            
+        Returns:
+            dict: Number of rows inserted, updated and skipped
+        """
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS Products_Staging (
+                TICKER TEXT NOT NULL,
+                SECTOR TEXT NOT NULL,
+                PRICE REAL NOT NULL,
+                IMPORT_DATE DATE NOT NULL,
+                PRIMARY KEY (TICKER, IMPORT_DATE)
+            )
+        """)
+        cursor.execute("DELETE FROM Products_Staging")
+        
+        # Doublons dans le flux : on garde la dernière valeur
+        deduplicated = df.drop_duplicates(subset=['TICKER', 'IMPORT_DATE'], keep='last')
+        cursor.executemany("""
+            INSERT INTO Products_Staging (TICKER, SECTOR, PRICE, IMPORT_DATE) VALUES (?, ?, ?, ?)
+        """, zip(deduplicated['TICKER'].astype(str), deduplicated['SECTOR'].astype(str),
+                 deduplicated['PRICE'].astype(float), deduplicated['IMPORT_DATE'].astype(str)))
+        
+        inserted, updated = cursor.execute("""
+            SELECT SUM(p.TICKER IS NULL),
+                   SUM(p.TICKER IS NOT NULL AND (p.PRICE != s.PRICE OR p.SECTOR != s.SECTOR))
+            FROM Products_Staging s
+            LEFT JOIN Products p ON p.TICKER = s.TICKER AND p.IMPORT_DATE = s.IMPORT_DATE
+        """).fetchone()
+        
+        cursor.execute("""
+            INSERT INTO Products (TICKER, SECTOR, PRICE, IMPORT_DATE)
+            SELECT TICKER, SECTOR, PRICE, IMPORT_DATE FROM Products_Staging WHERE true
+            ON CONFLICT(TICKER, IMPORT_DATE) DO UPDATE
+            SET PRICE = excluded.PRICE, SECTOR = excluded.SECTOR
+            WHERE Products.PRICE != excluded.PRICE OR Products.SECTOR != excluded.SECTOR
+        """)
+        cursor.execute("DELETE FROM Products_Staging")
+        
+        inserted, updated = inserted or 0, updated or 0
+        return {'inserted': inserted, 'updated': updated, 'skipped': len(df) - inserted - updated}
+
     def initialisation_portefeuille_HY(self):
         """Initialise le portefeuille HY_EQUITY en achetant les 5 tickers avec les meilleurs rendements"""
-        conn = sqlite3.connect(self.db_file)
+        conn = connect(self.db_file)
         cursor = conn.cursor()
         risk_type = "HY_EQUITY"
         
@@ -126,7 +290,7 @@ class BaseUpdate:
                     WHERE IMPORT_DATE = (
                         SELECT IMPORT_DATE
                         FROM Products
-                        ORDER BY strftime('%d/%m/%Y', IMPORT_DATE) ASC
+                        ORDER BY IMPORT_DATE ASC
                         LIMIT 1
                     )
                 ),
@@ -136,7 +300,7 @@ class BaseUpdate:
                     WHERE IMPORT_DATE = (
                         SELECT IMPORT_DATE
                         FROM Products
-                        ORDER BY strftime('%d/%m/%Y', IMPORT_DATE) DESC
+                        ORDER BY IMPORT_DATE DESC
                         LIMIT 1
                     )
                 )
@@ -170,7 +334,7 @@ class BaseUpdate:
                         INSERT INTO Portfolios (RISK_TYPE, TICKER, QUANTITY, MANAGER_ID, LAST_UPDATED, SPOT_PRICE)
                         VALUES (?, ?, ?, ?, ?, ?)
                     """, ("HY_EQUITY", ticker, quantity, 1, 
-                          (self.end_date - timedelta(days=1)).strftime("%d/%m/%Y"), price))
+                          (self.end_date - timedelta(days=1)).strftime("%Y-%m-%d"), price))
                     print(f"→ Achat de {quantity} unités de {ticker} @ {price:.2f}")
                     total_invested += quantity * price
 
@@ -206,7 +370,7 @@ class BaseUpdate:
             risk_type (str): ici on utilisera toujours 'LOW_RISK'
         """
         risk_type = "LOW_RISK"
-        conn = sqlite3.connect(self.db_file)
+        conn = connect(self.db_file)
         cursor = conn.cursor()
 
         # Récupérer le MANAGER_ID (le premier dispo)
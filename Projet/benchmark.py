@@ -0,0 +1,272 @@
+"""
+Benchmark of the main1.ipynb pipeline on synthetic databases (no network access).
+
+Each configuration (tickers x years x clients) builds a fresh database, then times the
+stages DatabaseBuilder -> GetData -> BaseUpdate -> RunAllStrat.run ->
+rebuild_portfolio_history_by_risk_type -> PortfolioAnalyzer, and writes the timings
+to a JSON file. Two JSON files can be compared to detect regressions.
+
+    python benchmark.py run --tickers 10 50 --years 1 --clients 12 1000 --output new.json
+    python benchmark.py compare old.json new.json --threshold 0.2
+
+With --bulk-clients, the rate of DatabaseBuilder.insert_clients_bulk (generation and load,
+in clients per second) is reported as clients_per_s, e.g. --clients 1000000 --bulk-clients.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+STAGES = ["build", "collect", "update", "strategies", "history", "analyze"]
+RISK_TYPES = ["LOW_RISK", "LOW_TURNOVER", "HY_EQUITY"]
+# Tickers utilisés en dur par les stratégies (LOW_TURNOVER) et l'initialisation LOW_RISK
+CRYPTO_TICKERS = ["BTC-USD", "ETH-USD"]
+MACRO_TICKERS = ["TLT", "IEF"]
+
+
+def synthetic_tickers(n_tickers):
+    """Ticker universe of n_tickers symbols, always containing the crypto and macro tickers."""
+    equities = [f"SYN{i:03d}" for i in range(max(n_tickers - len(CRYPTO_TICKERS) - len(MACRO_TICKERS), 0))]
+    return CRYPTO_TICKERS + MACRO_TICKERS + equities
+
+
+def run_pipeline(db_file, n_tickers, years, n_clients, seed=0, use_session=False, bulk_clients=False):
+    """
+    Build a synthetic database and time every stage of the pipeline.
+
+    Args:
+        db_file (str): Path of the database to create (overwritten)
+        n_tickers (int): Number of tickers (at least the 4 tickers used by the strategies)
+        years (float): Length of the backtest in years
+        n_clients (int): Number of generated clients
+        seed (int): Seed of the random generators (clients, strategies)
+        use_session (bool): Run every stage through one DatabaseSession
+        bulk_clients (bool): Generate the clients with DatabaseBuilder.insert_clients_bulk
+
+    Returns:
+        dict: Timings per stage in seconds, total, row counts of the main tables, and the
+              bulk client load rate (clients_per_s, None without bulk_clients)
+    """
+    from faker import Faker
+    import matplotlib
+    matplotlib.use("Agg")
+    from base_builder import DatabaseBuilder
+    from base_update import BaseUpdate
+    from data_collector import GetData
+    from db_session import DatabaseSession, connect
+    from Performance import PortfolioAnalyzer
+    from strategies import RunAllStrat
+    from synthetic_data import SyntheticMarketData
+
+    if os.path.exists(db_file):
+        os.remove(db_file)
+    random.seed(seed)
+    np.random.seed(seed)
+    Faker.seed(seed)
+
+    tickers = synthetic_tickers(n_tickers)
+    warmup_start = datetime(2022, 9, 1)
+    backtest_start = datetime(2023, 1, 1)
+    backtest_end = backtest_start + timedelta(days=int(round(365 * years)) - 1)
+    fmt = "%d/%m/%Y"
+
+    db = DatabaseSession(db_file) if use_session else db_file
+    timings = {}
+    clients_per_s = None
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        builder = DatabaseBuilder(db)
+        builder.create_tables()
+        if bulk_clients:
+            clients_start = time.perf_counter()
+            inserted = builder.insert_clients_bulk(n_clients, seed)
+            clients_per_s = inserted / (time.perf_counter() - clients_start)
+        else:
+            builder.insert_clients_data(n_clients)
+        builder.insert_managers_data(3)
+        builder.get_investment_amount_by_risk_type()
+        builder.insert_initial_cash_portfolios(warmup_start.strftime(fmt))
+        timings["build"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        main_df = GetData(tickers, warmup_start.strftime(fmt), (backtest_end + timedelta(days=1)).strftime(fmt),
+                          transport=SyntheticMarketData(seed=seed)).main_data_frame()
+        timings["collect"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        updater = BaseUpdate(tickers, warmup_start.strftime(fmt), "29/12/2022", db, main_df)
+        updater.update_products(bulk=True)
+        updater.initialisation_portefeuille_HY()
+        updater.initialisation_portefeuille_LR(MACRO_TICKERS)
+        timings["update"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        RunAllStrat(db, backtest_start.strftime(fmt), backtest_end.strftime(fmt), tickers, main_df, seed=seed).run()
+        timings["strategies"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for risk_type in RISK_TYPES:
+            builder.rebuild_portfolio_history_by_risk_type(risk_type)
+        timings["history"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        analyzer = PortfolioAnalyzer(db)
+        analyzer.plot_portfolio_performance()
+        analyzer.compute_portfolio_metrics()
+        timings["analyze"] = time.perf_counter() - start
+
+    conn = connect(db)
+    rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("Clients", "Products", "Deals", "Portfolio_History")}
+    conn.close()
+    if use_session:
+        db.close()
+
+    errors = [line for line in output.getvalue().splitlines() if "rreur" in line or "rror" in line]
+    return {"stages": timings, "total": sum(timings.values()), "rows": rows, "errors": errors[:10],
+            "clients_per_s": clients_per_s}
+
+
+def run_benchmarks(tickers_list, years_list, clients_list, repeat=1, seed=0, use_session=False, workdir=None,
+                   bulk_clients=False):
+    """
+    Run the pipeline for every tickers x years x clients combination.
+
+    The timing of a stage is the minimum over the repeats (least noisy estimate).
+
+    Returns:
+        dict: Environment description and one entry per configuration
+    """
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "session": use_session,
+        "bulk_clients": bulk_clients,
+        "repeat": repeat,
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as temporary_dir:
+        workdir = workdir or temporary_dir
+        for n_tickers in tickers_list:
+            for years in years_list:
+                for n_clients in clients_list:
+                    samples = []
+                    for i in range(repeat):
+                        db_file = os.path.join(workdir, f"bench_{n_tickers}_{years}_{n_clients}.db")
+                        samples.append(run_pipeline(db_file, n_tickers, years, n_clients, seed, use_session, bulk_clients))
+                    stages = {stage: min(sample["stages"][stage] for sample in samples) for stage in STAGES}
+                    run = {
+                        "tickers": n_tickers, "years": years, "clients": n_clients,
+                        "stages": stages, "total": sum(stages.values()),
+                        "samples": [sample["stages"] for sample in samples],
+                        "rows": samples[-1]["rows"], "errors": samples[-1]["errors"],
+                        "clients_per_s": max(sample["clients_per_s"] for sample in samples) if bulk_clients else None,
+                    }
+                    results["runs"].append(run)
+                    print(f"{n_tickers} tickers x {years} an(s) x {n_clients} clients : "
+                          + ", ".join(f"{stage} {stages[stage]:.2f}s" for stage in STAGES)
+                          + f" | total {run['total']:.2f}s"
+                          + (f" | clients {run['clients_per_s']:,.0f}/s" if bulk_clients else ""))
+    return results
+
+
+def compare_results(baseline, candidate, threshold=0.2, min_seconds=0.05):
+    """
+    Compare two benchmark results configuration by configuration.
+
+    Args:
+        baseline (dict): Reference results (run_benchmarks output)
+        candidate (dict): New results
+        threshold (float): Relative slowdown above which a stage is a regression (0.2 = +20 %)
+        min_seconds (float): Absolute slowdown below which differences are ignored (noise)
+
+    Returns:
+        tuple: (comparison DataFrame, list of regression descriptions)
+    """
+    def key(run):
+        return run["tickers"], run["years"], run["clients"]
+
+    reference = {key(run): run for run in baseline["runs"]}
+    rows, regressions = [], []
+    for run in candidate["runs"]:
+        if key(run) not in reference:
+            continue
+        old = reference[key(run)]
+        for stage in STAGES + ["total"]:
+            before = old["total"] if stage == "total" else old["stages"][stage]
+            after = run["total"] if stage == "total" else run["stages"][stage]
+            ratio = after / before if before > 0 else float("inf")
+            regression = ratio > 1 + threshold and after - before > min_seconds
+            rows.append({"tickers": run["tickers"], "years": run["years"], "clients": run["clients"],
+                         "stage": stage, "baseline_s": before, "candidate_s": after,
+                         "ratio": ratio, "regression": regression})
+            if regression:
+                regressions.append(f"{stage} ({run['tickers']} tickers x {run['years']} an(s) x {run['clients']} clients) : "
+                                   f"{before:.3f}s -> {after:.3f}s (x{ratio:.2f})")
+    return pd.DataFrame(rows), regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline sur des bases synthétiques.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Exécuter les benchmarks")
+    run_parser.add_argument("--tickers", type=int, nargs="+", default=[10])
+    run_parser.add_argument("--years", type=float, nargs="+", default=[1])
+    run_parser.add_argument("--clients", type=int, nargs="+", default=[12])
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--session", action="store_true", help="Utiliser une DatabaseSession partagée")
+    run_parser.add_argument("--bulk-clients", action="store_true", help="Générer les clients en masse (NumPy)")
+    run_parser.add_argument("--workdir", default=None, help="Répertoire des bases (défaut : temporaire)")
+    run_parser.add_argument("--output", default="benchmark.json")
+
+    compare_parser = subparsers.add_parser("compare", help="Comparer deux résultats JSON")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument("--min-seconds", type=float, default=0.05)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run_benchmarks(args.tickers, args.years, args.clients, args.repeat, args.seed,
+                                 args.session, args.workdir, args.bulk_clients)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    comparison, regressions = compare_results(baseline, candidate, args.threshold, args.min_seconds)
+    if comparison.empty:
+        print("Aucune configuration commune aux deux fichiers.")
+        return 1
+    print(comparison.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    if regressions:
+        print("\nRégressions détectées :")
+        for regression in regressions:
+            print(f"- {regression}")
+        return 1
+    print("\nAucune régression.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# Scripts d'analyse qui ne sont pas des tests (dépendances Excel, chemins locaux)
+collect_ignore = ["test_2.py"]
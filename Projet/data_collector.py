@@ -1,11 +1,159 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
-import sqlite3
-from datetime import datetime
+import time
+import warnings
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from db_session import connect
+
+
+class SqlPriceReader:
+    """
+    Batched reader of the Products table.
+
+    Returns several tickers over a date range from one indexed query per batch of
+    tickers, as a wide date x ticker price matrix, and keeps its connection open
+    between calls.
+    """
+
+    MAX_TICKERS_PER_QUERY = 500
+
+    def __init__(self, db_file, dtype=np.float32):
+        """
+        Initialize the reader (the connection is opened on first use).
+
+        Args:
+            db_file (str or DatabaseSession): Path to the SQLite database, or shared session
+            dtype (numpy.dtype): dtype of the price matrix
+        """
+        self.db_file = db_file
+        self.dtype = dtype
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = connect(self.db_file)
+        return self._conn
+
+    def close(self):
+        """Close the connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read(self, tickers, start_date, end_date):
+        """
+        Prices of several tickers between two dates.
+
+        Args:
+            tickers (list): Stock ticker symbols (columns of the result, in this order)
+            start_date (str): First date in YYYY-MM-DD format (included)
+            end_date (str): Last date in YYYY-MM-DD format (included)
+
+        Returns:
+            pandas.DataFrame: Prices indexed by IMPORT_DATE, one column per ticker, NaN when missing
+        """
+        tickers = list(dict.fromkeys(tickers))
+        rows = []
+        for first in range(0, len(tickers), self.MAX_TICKERS_PER_QUERY):
+            batch = tickers[first:first + self.MAX_TICKERS_PER_QUERY]
+            placeholders = ", ".join("?" * len(batch))
+            rows.extend(self.conn.execute(f"""
+                SELECT IMPORT_DATE, TICKER, PRICE FROM Products
+                WHERE TICKER IN ({placeholders}) AND IMPORT_DATE BETWEEN ? AND ?
+            """, (*batch, start_date, end_date)).fetchall())
+
+        if not rows:
+            return pd.DataFrame(columns=tickers, dtype=self.dtype, index=pd.DatetimeIndex([], name="IMPORT_DATE"))
+        dates, row_tickers, prices = zip(*rows)
+        dates, date_codes = np.unique(np.asarray(dates), return_inverse=True)
+        ticker_index = {ticker: i for i, ticker in enumerate(tickers)}
+        matrix = np.full((len(dates), len(tickers)), np.nan, dtype=self.dtype)
+        matrix[date_codes, [ticker_index[ticker] for ticker in row_tickers]] = prices
+        index = pd.DatetimeIndex(pd.to_datetime(dates, format="%Y-%m-%d"), name="IMPORT_DATE")
+        return pd.DataFrame(matrix, index=index, columns=tickers)
+
+    def iter_chunks(self, tickers, start_date, end_date, chunk_days=365):
+        """
+        Same result as read(), split in consecutive date windows.
+
+        Args:
+            tickers (list): Stock ticker symbols
+            start_date (str): First date in YYYY-MM-DD format (included)
+            end_date (str): Last date in YYYY-MM-DD format (included)
+            chunk_days (int): Number of calendar days per chunk
+
+        Yields:
+            pandas.DataFrame: Price matrix of one window (windows without data are skipped)
+        """
+        current = datetime.strptime(start_date, "%Y-%m-%d")
+        last = datetime.strptime(end_date, "%Y-%m-%d")
+        while current <= last:
+            window_end = min(current + timedelta(days=chunk_days - 1), last)
+            chunk = self.read(tickers, current.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d"))
+            if not chunk.empty:
+                yield chunk
+            current = window_end + timedelta(days=1)
+
+
+class YahooTransport:
+    """
+    Default market-data transport backed by Yahoo Finance.
+
+    Any object exposing the same two methods can be passed to GetData as
+    `transport` (e.g. a local fake provider for offline tests):
+
+        download(tickers, start, end) -> DataFrame indexed by date, one close
+            price column per ticker (dates in YYYY-MM-DD format)
+        get_sector(ticker) -> str
+    """
+
+    def download(self, tickers, start, end):
+        """
+        Download adjusted close prices for several tickers in one request.
+
+        Args:
+            tickers (list): List of stock ticker symbols
+            start (str): Start date in YYYY-MM-DD format
+            end (str): End date in YYYY-MM-DD format
+
+        Returns:
+            pandas.DataFrame: Close prices, one column per ticker
+        """
+        data = yf.download(list(tickers), start=start, end=end, auto_adjust=True,
+                           progress=False, threads=False)
+        if data is None or data.empty:
+            return pd.DataFrame()
+        close = data['Close']
+        if isinstance(close, pd.Series):
+            close = close.to_frame(tickers[0])
+        return close
+
+    def get_sector(self, ticker):
+        """
+        Get the sector of a ticker.
+
+        Args:
+            ticker (str): Stock ticker symbol
+
+        Returns:
+            str: Sector name, "Unknown" when Yahoo does not provide one
+        """
+        return yf.Ticker(ticker).info.get("sector", "Unknown")
+
 
 class GetData: 
-    def __init__(self, tickers=None, start_date=None, end_date=None):
+    def __init__(self, tickers=None, start_date=None, end_date=None, transport=None, cache=None, metadata_store=None,
+                 db_file="Fund.db"):
         """
         Initialize the GetData class.
         
@@ -13,11 +161,20 @@ class GetData:
             tickers (list): List of stock ticker symbols
             start_date (str): Start date in DD/MM/YYYY format
             end_date (str): End date in DD/MM/YYYY format
+            transport (object): Market-data provider, see YahooTransport (default: Yahoo Finance)
+            cache (PriceCache): On-disk price cache, only missing date ranges are downloaded (default: no cache)
+            metadata_store (TickerMetadataStore): Sector store read instead of the transport (default: none)
+            db_file (str or DatabaseSession): Database read by get_data_sql and iter_data_sql
         """
         self.tickers = tickers or []
         self.start_date = start_date
         self.end_date = end_date
+        self.transport = transport or YahooTransport()
+        self.cache = cache
+        self.metadata_store = metadata_store
+        self.sql_reader = SqlPriceReader(db_file)
         self.all_data = None
+        self.failed_tickers = {}
         
     def _convert_date_format(self, date_str):
         """
@@ -52,12 +209,14 @@ class GetData:
             yf_start_date = self._convert_date_format(start_date)
             yf_end_date = self._convert_date_format(end_date)
             
-            df = yf.download(ticker, start=yf_start_date, end=yf_end_date, auto_adjust=True)[['Close']].ffill()
+            if self.cache is not None:
+                return self._get_data_cached(ticker, yf_start_date, yf_end_date)
+            
+            df = self._clean_prices(self.transport.download([ticker], yf_start_date, yf_end_date)[ticker]).to_frame()
             df.columns = ['PRICE']  
             df.index.name = 'IMPORT_DATE'  
             
-            stock = yf.Ticker(ticker)
-            sector = stock.info.get("sector", "Unknown")  
+            sector = self._get_sector(ticker)
             
             df["TICKER"] = ticker
             df["SECTOR"] = sector
@@ -68,53 +227,281 @@ class GetData:
             print(f"Failed to fetch data for {ticker}: {e}")
             return pd.DataFrame()
 
-    def get_data_sql(self, ticker, start_date, end_date):
+    @staticmethod
+    def _clean_prices(prices):
         """
-        Get stock data from SQL database.
+        Forward-fill the missing prices of a ticker and drop the dates before its first price.
+        
+        Applied by both the sequential and the concurrent fetch so that they return the same rows.
+        
+        Args:
+            prices (pandas.Series): Close prices of one ticker
+            
+        Returns:
+            pandas.Series: Cleaned prices
+        """
+        return prices.ffill().dropna()
+
+    def _get_sector(self, ticker):
+        """
+        Get the sector of a ticker from the metadata store, or from the transport without one.
         
         Args:
             ticker (str): Stock ticker symbol
-            start_date (str): Start date in DD/MM/YYYY format
-            end_date (str): End date in DD/MM/YYYY format
+            
+        Returns:
+            str: Sector name
+        """
+        if self.metadata_store is not None:
+            return self.metadata_store.get_sector(ticker)
+        return self.transport.get_sector(ticker)
+
+    def _get_data_cached(self, ticker, start, end):
+        """
+        Get stock data through the price cache, downloading only the missing date ranges.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            start (str): Start date in YYYY-MM-DD format
+            end (str): End date in YYYY-MM-DD format
             
         Returns:
             pandas.DataFrame: DataFrame containing stock data
         """
-        # Convert dates to YYYY-MM-DD format for SQL query
-        sql_start_date = self._convert_date_format(start_date)
-        sql_end_date = self._convert_date_format(end_date)
+        sector = self.cache.sector(ticker)
+        for gap_start, gap_end in self.cache.missing_ranges(ticker, start, end):
+            close = self.transport.download([ticker], gap_start, gap_end)
+            prices = self._clean_prices(close[ticker]) if ticker in close.columns else pd.Series(dtype=float)
+            if sector is None and not prices.empty:
+                sector = self._get_sector(ticker)
+            # Une plage sans cotation (week-end, jour férié) est aussi enregistrée comme couverte
+            self.cache.put(ticker, prices, sector, gap_start, gap_end)
+        
+        df = self.cache.get(ticker, start, end)
+        df["TICKER"] = ticker
+        return df[['IMPORT_DATE', 'PRICE', 'TICKER', 'SECTOR']]
+
+    def get_data_sql(self, tickers, start_date, end_date):
+        """
+        Get stock prices from the Products table.
+        
+        Args:
+            tickers (str or list): Stock ticker symbol(s)
+            start_date (str): Start date in DD/MM/YYYY format (included)
+            end_date (str): End date in DD/MM/YYYY format (included)
+            
+        Returns:
+            pandas.DataFrame: float32 prices indexed by IMPORT_DATE, one column per ticker
+        """
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        return self.sql_reader.read(tickers, self._convert_date_format(start_date), self._convert_date_format(end_date))
+
+    def iter_data_sql(self, tickers, start_date, end_date, chunk_days=365):
+        """
+        Get stock prices from the Products table by windows of chunk_days days.
+        
+        Args:
+            tickers (list): Stock ticker symbols
+            start_date (str): Start date in DD/MM/YYYY format (included)
+            end_date (str): End date in DD/MM/YYYY format (included)
+            chunk_days (int): Number of calendar days per chunk
+            
+        Yields:
+            pandas.DataFrame: float32 price matrix of one window
+        """
+        yield from self.sql_reader.iter_chunks(tickers, self._convert_date_format(start_date),
+                                               self._convert_date_format(end_date), chunk_days)
+
+    def _with_retry(self, func, max_retries, backoff):
+        """
+        Call func(), retrying with exponential backoff on failure.
+        
+        Args:
+            func (callable): Function without arguments
+            max_retries (int): Number of retries after the first attempt
+            backoff (float): Initial delay in seconds, doubled after each failure
+            
+        Returns:
+            The result of func()
+        """
+        for attempt in range(max_retries + 1):
+            try:
+                return func()
+            except Exception:
+                if attempt == max_retries:
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+
+    def _download_batch(self, batch, start, end, max_retries, backoff):
+        """
+        Download one batch of tickers, retrying tickers missing from the batch one by one.
+        
+        Args:
+            batch (list): Ticker symbols of the batch
+            start (str): Start date in YYYY-MM-DD format
+            end (str): End date in YYYY-MM-DD format
+            max_retries (int): Number of retries per request
+            backoff (float): Initial retry delay in seconds
+            
+        Returns:
+            tuple: ({ticker: price Series, empty when the answer had no price}, {ticker: error message})
+        """
+        prices, errors = {}, {}
+        try:
+            close = self._with_retry(lambda: self.transport.download(batch, start, end), max_retries, backoff)
+        except Exception as e:
+            close = pd.DataFrame()
+            print(f"Batch download failed for {batch}: {e}")
+        
+        for ticker in batch:
+            series = self._clean_prices(close[ticker]) if ticker in close.columns else pd.Series(dtype=float)
+            if series.empty:
+                # Ticker absent from the batch answer: retry it on its own
+                try:
+                    single = self._with_retry(lambda: self.transport.download([ticker], start, end), max_retries, backoff)
+                    series = self._clean_prices(single[ticker]) if ticker in single.columns else series
+                except Exception as e:
+                    errors[ticker] = str(e)
+                    continue
+            if series.empty:
+                errors[ticker] = "No price data returned"
+            prices[ticker] = series
+        return prices, errors
+
+    def _fetch_sector(self, ticker, max_retries, backoff):
+        """
+        Get the sector of a ticker, falling back to "Unknown" after all retries failed.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            max_retries (int): Number of retries
+            backoff (float): Initial retry delay in seconds
+            
+        Returns:
+            str: Sector name
+        """
+        try:
+            return self._with_retry(lambda: self._get_sector(ticker), max_retries, backoff)
+        except Exception as e:
+            print(f"Failed to fetch sector for {ticker}: {e}")
+            return "Unknown"
+
+    def _concurrent_data_frame(self, max_workers, batch_size, max_retries, backoff):
+        """
+        Fetch prices by batches of tickers and sectors in a thread pool.
+        
+        With a cache, only the date ranges missing from the cache are downloaded;
+        tickers sharing the same missing ranges are batched together.
         
-        query = """
-        SELECT * FROM fund 
-        WHERE ticker = ? 
-        AND date BETWEEN ? AND ?
+        Args:
+            max_workers (int): Number of worker threads
+            batch_size (int): Number of tickers per download request
+            max_retries (int): Number of retries per request
+            backoff (float): Initial retry delay in seconds
+            
+        Returns:
+            list: One DataFrame per successfully fetched ticker, in the order of self.tickers
         """
-        conn = sqlite3.connect("database.db")  # Ensure connection is established
-        df = pd.read_sql_query(query, conn, params=(ticker, sql_start_date, sql_end_date))
-        conn.close()  # Close connection after query
-        return df
+        yf_start_date = self._convert_date_format(self.start_date)
+        yf_end_date = self._convert_date_format(self.end_date)
+        tickers = list(dict.fromkeys(self.tickers))
+        
+        # Regrouper les tickers par plage de dates à télécharger
+        ranges = defaultdict(list)
+        for ticker in tickers:
+            if self.cache is None:
+                ranges[(yf_start_date, yf_end_date)].append(ticker)
+            else:
+                for gap in self.cache.missing_ranges(ticker, yf_start_date, yf_end_date):
+                    ranges[gap].append(ticker)
+        jobs = [(members[i:i + batch_size], start, end)
+                for (start, end), members in ranges.items()
+                for i in range(0, len(members), batch_size)]
+        
+        pieces = defaultdict(list)
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._download_batch, batch, start, end, max_retries, backoff): (start, end)
+                       for batch, start, end in jobs}
+            for future in as_completed(futures):
+                batch_prices, batch_errors = future.result()
+                for ticker, series in batch_prices.items():
+                    pieces[ticker].append((futures[future], series))
+                errors.update(batch_errors)
+            
+            sectors = {ticker: self.cache.sector(ticker) if self.cache is not None else None
+                       for ticker, ticker_pieces in pieces.items()
+                       if any(not series.empty for _, series in ticker_pieces)}
+            if self.metadata_store is not None:
+                # Une seule lecture de la table de métadonnées pour tous les tickers
+                sectors.update(self.metadata_store.get_sectors([t for t, sector in sectors.items() if sector is None]))
+            to_fetch = [ticker for ticker, sector in sectors.items() if sector is None]
+            sectors.update(zip(to_fetch, executor.map(lambda t: self._fetch_sector(t, max_retries, backoff), to_fetch)))
+        
+        data_frames = []
+        for ticker in tickers:
+            if self.cache is not None:
+                for (start, end), series in pieces[ticker]:
+                    self.cache.put(ticker, series, sectors.get(ticker), start, end)
+                cached = self.cache.get(ticker, yf_start_date, yf_end_date)
+                dates, price_values, sector = cached['IMPORT_DATE'], cached['PRICE'].to_numpy(dtype=float), self.cache.sector(ticker)
+            elif pieces[ticker]:
+                series = pd.concat([series for _, series in pieces[ticker]]).sort_index()
+                dates, price_values, sector = series.index, series.to_numpy(dtype=float), sectors.get(ticker)
+            else:
+                dates = []
+            
+            if len(dates) == 0:
+                self.failed_tickers[ticker] = errors.get(ticker, "No price data returned")
+                continue
+            df = pd.DataFrame({
+                'IMPORT_DATE': pd.DatetimeIndex(dates).strftime('%Y-%m-%d'),
+                'PRICE': price_values,
+                'TICKER': ticker,
+                'SECTOR': sector,
+            })
+            data_frames.append(df)
+        return data_frames
 
-    def main_data_frame(self):
+    def main_data_frame(self, concurrent=False, max_workers=8, batch_size=50, max_retries=3, backoff=1.0):
         """
         Create a main DataFrame by fetching data for all tickers.
         
+        Args:
+            concurrent (bool): Fetch by batches of tickers in a thread pool instead of one ticker at a time
+            max_workers (int): Number of worker threads (concurrent mode)
+            batch_size (int): Number of tickers per download request (concurrent mode)
+            max_retries (int): Number of retries per request (concurrent mode)
+            backoff (float): Initial retry delay in seconds, doubled after each failure (concurrent mode)
+        
         Returns:
             pandas.DataFrame: Combined DataFrame with data for all tickers
         """
         if not self.tickers or not self.start_date or not self.end_date:
             raise ValueError("Please set tickers, start_date, and end_date before calling main_data_frame")
-            
-        data_frames = []
+        
+        self.failed_tickers = {}
+        if concurrent:
+            data_frames = self._concurrent_data_frame(max_workers, batch_size, max_retries, backoff)
+        else:
+            data_frames = []
+        
+            for ticker in self.tickers:
+                try:
+                    df = self.get_data_yf(ticker, self.start_date, self.end_date)
+                    if not df.empty:
+                        # Convertir les dates au format ISO YYYY-MM-DD (format de stockage de Products)
+                        df['IMPORT_DATE'] = pd.to_datetime(df['IMPORT_DATE']).dt.strftime('%Y-%m-%d')
+                        data_frames.append(df)
+                    else:
+                        self.failed_tickers[ticker] = "No price data returned"
+                except Exception as e:
+                    print(f"Failed to fetch data for {ticker}: {e}")
+                    self.failed_tickers[ticker] = str(e)
     
-        for ticker in self.tickers:
-            try:
-                df = self.get_data_yf(ticker, self.start_date, self.end_date)
-                if not df.empty:
-                    # Convertir les dates au format DD/MM/YYYY
-                    df['IMPORT_DATE'] = pd.to_datetime(df['IMPORT_DATE']).dt.strftime('%d/%m/%Y')
-                    data_frames.append(df)
-            except Exception as e:
-                print(f"Failed to fetch data for {ticker}: {e}")
+        if self.failed_tickers:
+            print(f"Failed to fetch data for {len(self.failed_tickers)} ticker(s): {', '.join(self.failed_tickers)}")
     
         if data_frames:
             self.all_data = pd.concat(data_frames, ignore_index=True)
@@ -126,23 +513,41 @@ class GetData:
 
 
 class OutlierRemover:
-    def __init__(self, method="zscore", threshold=3):
+    METHODS = ("zscore", "iqr", "percentile", "hampel")
+
+    def __init__(self, method="zscore", threshold=3, group_by=None, window=21, date_column="IMPORT_DATE"):
         """
         Initialise l'outil de suppression des valeurs aberrantes.
         
-        :param method: str, méthode de détection ('zscore', 'iqr', 'percentile')
-        :param threshold: float, seuil pour identifier une valeur aberrante (ex: 3 pour z-score, 1.5 pour IQR)
+        :param method: str, méthode de détection ('zscore', 'iqr', 'percentile', 'hampel')
+        :param threshold: float, seuil pour identifier une valeur aberrante (ex: 3 pour z-score, 1.5 pour IQR,
+                          nombre de MAD pour 'hampel')
+        :param group_by: str, colonne de regroupement (ex: "TICKER") : statistiques calculées par groupe,
+                         en une seule passe vectorisée sur toutes les colonnes numériques
+        :param window: int, nombre d'observations de la fenêtre glissante (méthode 'hampel')
+        :param date_column: str, colonne qui ordonne chaque série (méthode 'hampel')
         """
         self.method = method
         self.threshold = threshold
+        self.group_by = group_by
+        self.window = window
+        self.date_column = date_column
+        self.history = None  # Dernières lignes de chaque groupe, conservées par filter_stream
     
     def remove_outliers(self, df):
         """
         Supprime les valeurs aberrantes d'un DataFrame en fonction de la méthode choisie.
         
+        Sans group_by, les colonnes sont filtrées l'une après l'autre sur l'ensemble des lignes ;
+        avec group_by (ou la méthode 'hampel'), une ligne est supprimée si l'une de ses colonnes
+        numériques est aberrante au sein de son groupe.
+        
         :param df: pd.DataFrame, le dataset à traiter
         :return: pd.DataFrame, dataset nettoyé
         """
+        if self.group_by is not None or self.method == "hampel":
+            return df[~self.outlier_mask(df)]
+        
         df_cleaned = df.copy()
         
         for col in df.select_dtypes(include=[np.number]).columns:
@@ -153,10 +558,130 @@ class OutlierRemover:
             elif self.method == "percentile":
                 df_cleaned = self._remove_by_percentile(df_cleaned, col)
             else:
-                raise ValueError("Méthode inconnue. Choisissez parmi 'zscore', 'iqr' ou 'percentile'.")
+                raise ValueError("Méthode inconnue. Choisissez parmi 'zscore', 'iqr', 'percentile' ou 'hampel'.")
         
         return df_cleaned
     
+    def outlier_mask(self, df):
+        """
+        Masque des lignes aberrantes, calculé par groupe en une passe sur toutes les colonnes numériques.
+        Les valeurs manquantes et les groupes de dispersion nulle ne sont jamais signalés.
+        
+        :param df: pd.DataFrame, le dataset à analyser
+        :return: np.ndarray de booléens, True pour les lignes à supprimer (dans l'ordre de df)
+        """
+        if self.method not in self.METHODS:
+            raise ValueError("Méthode inconnue. Choisissez parmi 'zscore', 'iqr', 'percentile' ou 'hampel'.")
+        columns = [col for col in df.select_dtypes(include=[np.number]).columns if col != self.group_by]
+        if df.empty or not columns:
+            return np.zeros(len(df), dtype=bool)
+        
+        # Un code entier par groupe (un seul groupe sans group_by)
+        if self.group_by is None:
+            codes = np.zeros(len(df), dtype=np.intp)
+        else:
+            codes = pd.factorize(df[self.group_by])[0]
+        values = df[columns].to_numpy(dtype=float)
+        
+        if self.method == "hampel":
+            outliers = self._hampel_outliers(df, codes, values)
+        else:
+            grouped = pd.DataFrame(values).groupby(codes)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                if self.method == "zscore":
+                    mean, std = grouped.mean().to_numpy()[codes], grouped.std().to_numpy()[codes]
+                    outliers = np.abs(values - mean) / std >= self.threshold
+                elif self.method == "iqr":
+                    q1, q3 = grouped.quantile(0.25).to_numpy()[codes], grouped.quantile(0.75).to_numpy()[codes]
+                    outliers = (values < q1 - self.threshold * (q3 - q1)) | (values > q3 + self.threshold * (q3 - q1))
+                else:
+                    lower, upper = grouped.quantile(0.01).to_numpy()[codes], grouped.quantile(0.99).to_numpy()[codes]
+                    outliers = (values < lower) | (values > upper)
+        return outliers.any(axis=1)
+    
+    def _hampel_outliers(self, df, codes, values, chunk_size=65536):
+        """
+        Filtre de Hampel glissant : une valeur est aberrante si elle s'écarte de la médiane des
+        `window` dernières observations de son groupe (elle comprise) de plus de threshold MAD
+        (écart absolu médian, mis à l'échelle de l'écart-type). Au moins window // 2 + 1 observations
+        sont nécessaires ; une fenêtre constante (MAD nulle) ne signale rien.
+        """
+        # Lignes triées par groupe puis par date ; début du groupe de chaque ligne
+        if self.date_column in df.columns:
+            date_ranks = pd.factorize(df[self.date_column], sort=True)[0]
+        else:
+            date_ranks = np.arange(len(df))
+        order = np.lexsort((date_ranks, codes))
+        sorted_codes = codes[order]
+        group_start = np.searchsorted(sorted_codes, sorted_codes, side="left")
+        sorted_values = values[order]
+        
+        outliers = np.zeros(values.shape, dtype=bool)
+        offsets = np.arange(self.window)
+        min_periods = self.window // 2 + 1
+        for first in range(0, len(order), chunk_size):
+            rows = np.arange(first, min(first + chunk_size, len(order)))
+            positions = rows[:, None] - offsets[None, :]
+            in_group = positions >= group_start[rows, None]
+            positions = np.where(in_group, positions, 0)
+            for j in range(values.shape[1]):
+                # Matrice (lignes, window) des observations précédentes du même groupe
+                windows = np.where(in_group, sorted_values[positions, j], np.nan)
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    median = np.nanmedian(windows, axis=1)
+                    mad = 1.4826 * np.nanmedian(np.abs(windows - median[:, None]), axis=1)
+                count = (~np.isnan(windows)).sum(axis=1)
+                with np.errstate(invalid="ignore"):
+                    outliers[order[rows], j] = ((count >= min_periods) & (mad > 0)
+                                                & (np.abs(sorted_values[rows, j] - median) > self.threshold * mad))
+        return outliers
+    
+    def seed_history(self, df):
+        """
+        Ajoute à l'historique de filter_stream des lignes déjà traitées (ex: derniers prix de la base)
+        pour les groupes qui n'y figurent pas encore.
+        
+        :param df: pd.DataFrame, lignes antérieures au prochain lot, mêmes colonnes que le flux
+        """
+        if df.empty:
+            return
+        if self.history is not None:
+            if self.group_by is not None:
+                df = df[~df[self.group_by].isin(self.history[self.group_by])]
+            else:
+                return
+        self._keep_history(df if self.history is None else pd.concat([self.history, df], ignore_index=True))
+    
+    def _keep_history(self, df):
+        """ Conserve les window - 1 dernières lignes (par date) de chaque groupe. """
+        if self.date_column in df.columns:
+            df = df.sort_values(self.date_column, kind="stable")
+        if self.group_by is None:
+            self.history = df.tail(self.window - 1).reset_index(drop=True)
+        else:
+            self.history = df.groupby(self.group_by, sort=False).tail(self.window - 1).reset_index(drop=True)
+    
+    def filter_stream(self, df):
+        """
+        Étape de filtrage d'un flux traité par lots successifs (ex: BaseUpdate.update_products).
+        
+        Les window - 1 dernières lignes de chaque groupe sont conservées d'un lot à l'autre et servent
+        de contexte au lot suivant : avec la méthode 'hampel', le résultat est identique à celui de
+        remove_outliers sur le flux complet. Les autres méthodes calculent leurs statistiques sur
+        cet historique et le lot courant.
+        
+        :param df: pd.DataFrame, lot de lignes à filtrer
+        :return: pd.DataFrame, lignes conservées du lot
+        """
+        if df.empty:
+            return df
+        history = self.history if self.history is not None else df.iloc[:0]
+        combined = pd.concat([history, df], ignore_index=True)
+        mask = self.outlier_mask(combined)[len(history):]
+        self._keep_history(combined)
+        return df[~mask]
+    
     def _remove_by_zscore(self, df, col):
         """ Supprime les valeurs aberrantes en utilisant le z-score. """
         z_scores = np.abs((df[col] - df[col].mean()) / df[col].std())
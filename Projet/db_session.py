@@ -0,0 +1,144 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,      # 64 Mo (valeur négative = taille en Kio)
+    "mmap_size": 268435456,    # 256 Mo
+    "temp_store": "MEMORY",
+}
+
+
+class SessionConnection(sqlite3.Connection):
+    """
+    Long-lived connection shared through a DatabaseSession.
+
+    close() is a no-op so that code written for short-lived connections can use it
+    unchanged, and commit() is deferred while a DatabaseSession.transaction() is open.
+    A rollback() inside a transaction() marks it as rollback-only: the whole block is
+    rolled back when it ends, instead of committing the work done after the rollback.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transaction_depth = 0
+        self.rollback_only = False
+
+    def close(self):
+        pass
+
+    def commit(self):
+        if self.transaction_depth == 0:
+            super().commit()
+
+    def rollback(self):
+        if self.transaction_depth > 0:
+            self.rollback_only = True
+        super().rollback()
+
+    def force_close(self):
+        super().close()
+
+
+class DatabaseSession:
+    """
+    One long-lived, tuned SQLite connection per process.
+
+    Can be passed to DatabaseBuilder, GetData, BaseUpdate, RunAllStrat, PortfolioAnalyzer...
+    in place of a db_file path: every method then reuses the same connection instead of
+    opening and closing its own. A ':memory:' session keeps a whole database in memory.
+    """
+
+    def __init__(self, db_file, pragmas=None):
+        """
+        Initialize the session (the connection is opened on first use).
+
+        Args:
+            db_file (str): Path to the SQLite database, or ':memory:'
+            pragmas (dict): PRAGMAs applied to the connection, merged over DEFAULT_PRAGMAS
+                            (a None value disables a default PRAGMA)
+        """
+        self.db_file = db_file
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        """The shared connection, reopened after a fork (one connection per process)."""
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.db_file, factory=SessionConnection, check_same_thread=False)
+            self._pid = os.getpid()
+            for name, value in self.pragmas.items():
+                if value is not None:
+                    self._connection.execute(f"PRAGMA {name} = {value}")
+        return self._connection
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group several operations in one transaction.
+
+        Commits made inside the block are deferred to its end; an exception rolls the
+        whole block back. Transactions can be nested, only the outermost one commits.
+        A conn.rollback() called inside the block (e.g. by an error handler) also rolls
+        the whole block back when it ends.
+
+        Yields:
+            SessionConnection: The shared connection
+
+        Raises:
+            sqlite3.OperationalError: When the block was rolled back by a conn.rollback() call
+        """
+        conn = self.connection
+        conn.transaction_depth += 1
+        try:
+            yield conn
+        except BaseException:
+            conn.transaction_depth -= 1
+            if conn.transaction_depth == 0:
+                conn.rollback_only = False
+                conn.rollback()
+            raise
+        else:
+            conn.transaction_depth -= 1
+            if conn.transaction_depth == 0 and conn.rollback_only:
+                conn.rollback_only = False
+                conn.rollback()
+                raise sqlite3.OperationalError("Transaction rolled back: rollback() was called inside the block")
+            conn.commit()
+
+    def close(self):
+        """Close the shared connection (committing pending changes)."""
+        if self._connection is not None and self._pid == os.getpid():
+            if self._connection.in_transaction and self._connection.transaction_depth == 0:
+                self._connection.commit()
+            self._connection.force_close()
+        self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        # La connexion n'est pas transmise aux autres processus : chacun ouvre la sienne
+        return {"db_file": self.db_file, "pragmas": self.pragmas, "_connection": None, "_pid": None}
+
+
+def connect(db):
+    """
+    Connection to a database given as a path or a DatabaseSession.
+
+    Args:
+        db (str or DatabaseSession): Database path, or session whose shared connection is returned
+
+    Returns:
+        sqlite3.Connection: A new connection for a path, the shared one for a session
+    """
+    if isinstance(db, DatabaseSession):
+        return db.connection
+    return sqlite3.connect(db)
@@ -0,0 +1,203 @@
+import copy
+from db_session import DatabaseSession, connect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from data_collector import YahooTransport
+
+
+class TickerMetadataStore:
+    """
+    Ticker metadata (sector) stored in the Ticker_Metadata table, next to Products.
+
+    Sectors almost never change, so they are read from the table and only fetched
+    from the transport when missing or older than the TTL. Stale entries are
+    served immediately and refreshed in bulk in a background thread.
+    """
+
+    def __init__(self, db_file, transport=None, ttl_days=30, max_workers=8):
+        """
+        Initialize the store.
+
+        Args:
+            db_file (str or DatabaseSession): Path to the SQLite database, or shared session
+            transport (object): Market-data provider exposing get_sector(ticker) (default: Yahoo Finance)
+            ttl_days (float): Age after which a sector is refreshed
+            max_workers (int): Number of threads used by bulk refreshes
+        """
+        self.db_file = db_file
+        self.transport = transport or YahooTransport()
+        self.ttl = timedelta(days=ttl_days)
+        self.max_workers = max_workers
+        self._refresh_thread = None
+        self.create_table()
+
+    def create_table(self):
+        """Create the Ticker_Metadata table if needed."""
+        conn = connect(self.db_file)
+        conn.execute("""CREATE TABLE IF NOT EXISTS Ticker_Metadata (
+            TICKER TEXT PRIMARY KEY,
+            SECTOR TEXT NOT NULL,
+            UPDATED_AT TIMESTAMP NOT NULL
+        );""")
+        conn.commit()
+        conn.close()
+
+    def _read(self, tickers):
+        """Return {ticker: (sector, updated_at)} for the stored tickers."""
+        if not tickers:
+            return {}
+        placeholders = ", ".join("?" * len(tickers))
+        conn = connect(self.db_file)
+        rows = conn.execute(f"""
+            SELECT TICKER, SECTOR, UPDATED_AT FROM Ticker_Metadata
+            WHERE TICKER IN ({placeholders})
+        """, list(tickers)).fetchall()
+        conn.close()
+        return {ticker: (sector, datetime.fromisoformat(updated_at)) for ticker, sector, updated_at in rows}
+
+    def _write(self, sectors):
+        """Upsert {ticker: sector} in one transaction."""
+        now = datetime.now().isoformat(timespec="seconds")
+        conn = connect(self.db_file)
+        conn.executemany("""
+            INSERT INTO Ticker_Metadata (TICKER, SECTOR, UPDATED_AT) VALUES (?, ?, ?)
+            ON CONFLICT(TICKER) DO UPDATE SET SECTOR = excluded.SECTOR, UPDATED_AT = excluded.UPDATED_AT
+        """, [(ticker, sector, now) for ticker, sector in sectors.items()])
+        conn.commit()
+        conn.close()
+
+    def _fetch(self, ticker):
+        try:
+            return self.transport.get_sector(ticker)
+        except Exception as e:
+            print(f"Failed to fetch sector for {ticker}: {e}")
+            return None
+
+    def refresh(self, tickers):
+        """
+        Fetch the sectors of several tickers in a thread pool and store them.
+
+        Tickers whose fetch fails keep their previous value.
+
+        Args:
+            tickers (list): Ticker symbols
+
+        Returns:
+            dict: {ticker: sector} for the tickers successfully fetched
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            fetched = dict(zip(tickers, executor.map(self._fetch, tickers)))
+        fetched = {ticker: sector for ticker, sector in fetched.items() if sector is not None}
+        if fetched:
+            self._write(fetched)
+        return fetched
+
+    def stale_tickers(self, tickers=None):
+        """
+        Tickers whose sector is older than the TTL.
+
+        Args:
+            tickers (list): Tickers to check (default: every stored ticker)
+
+        Returns:
+            list: Stale ticker symbols (tickers never stored are included when listed)
+        """
+        if tickers is None:
+            conn = connect(self.db_file)
+            tickers = [row[0] for row in conn.execute("SELECT TICKER FROM Ticker_Metadata")]
+            conn.close()
+        stored = self._read(tickers)
+        limit = datetime.now() - self.ttl
+        return [ticker for ticker in tickers if ticker not in stored or stored[ticker][1] < limit]
+
+    def refresh_async(self, tickers=None):
+        """
+        Refresh the stale sectors in a background thread.
+
+        Only one background refresh runs at a time. It never uses the connection of a
+        shared DatabaseSession: the thread opens its own connections to the database file,
+        so that its writes are not mixed with the main thread's transaction (an in-memory
+        session cannot be reached from another connection and is refreshed synchronously).
+
+        Args:
+            tickers (list): Tickers to consider (default: every stored ticker)
+
+        Returns:
+            threading.Thread: The refresh thread, None if a refresh is already running or ran synchronously
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return None
+        store = self
+        if isinstance(self.db_file, DatabaseSession):
+            if self.db_file.db_file == ":memory:":
+                self.refresh(self.stale_tickers(tickers))
+                return None
+            store = copy.copy(self)
+            store.db_file = self.db_file.db_file
+        self._refresh_thread = threading.Thread(
+            target=lambda: store.refresh(store.stale_tickers(tickers)), daemon=True
+        )
+        self._refresh_thread.start()
+        return self._refresh_thread
+
+    def get_sectors(self, tickers):
+        """
+        Sectors of several tickers with a single table read.
+
+        Missing tickers are fetched synchronously, stale ones are returned as stored
+        and refreshed in the background.
+
+        Args:
+            tickers (list): Ticker symbols
+
+        Returns:
+            dict: {ticker: sector}, "Unknown" when the sector could not be fetched
+        """
+        tickers = list(dict.fromkeys(tickers))
+        stored = self._read(tickers)
+        sectors = {ticker: sector for ticker, (sector, _) in stored.items()}
+
+        missing = [ticker for ticker in tickers if ticker not in stored]
+        sectors.update(self.refresh(missing))
+
+        limit = datetime.now() - self.ttl
+        if any(updated_at < limit for _, updated_at in stored.values()):
+            self.refresh_async([ticker for ticker, (_, updated_at) in stored.items() if updated_at < limit])
+
+        return {ticker: sectors.get(ticker, "Unknown") for ticker in tickers}
+
+    def get_sector(self, ticker):
+        """
+        Sector of one ticker.
+
+        Args:
+            ticker (str): Stock ticker symbol
+
+        Returns:
+            str: Sector name
+        """
+        return self.get_sectors([ticker])[ticker]
+
+    def fill_products_sectors(self):
+        """
+        Fill Products.SECTOR from the stored metadata, without any network call.
+
+        Returns:
+            int: Number of Products rows updated
+        """
+        conn = connect(self.db_file)
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE Products
+            SET SECTOR = (SELECT m.SECTOR FROM Ticker_Metadata m WHERE m.TICKER = Products.TICKER)
+            WHERE TICKER IN (SELECT TICKER FROM Ticker_Metadata)
+              AND SECTOR != (SELECT m.SECTOR FROM Ticker_Metadata m WHERE m.TICKER = Products.TICKER)
+        """)
+        updated = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return updated
@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class MonteCarloEngine:
+    """
+    Batched Monte Carlo simulation of future portfolio values.
+
+    The log-returns of the assets are modelled as i.i.d. multivariate normal draws
+    N(mean_returns, cov_matrix) per day. Over num_days the cumulated log-return is
+    N(num_days * mean, num_days * cov), so each path needs a single correlated draw:
+    all paths are drawn as one (num_paths, nb_assets) tensor from one Cholesky factor,
+    and the final values of every candidate portfolio come from one matrix product
+    (common random numbers: all candidates are evaluated on the same paths).
+    """
+
+    def __init__(self, mean_returns, cov_matrix, latest_prices, num_days=7, num_paths=30, seed=None):
+        """
+        Initialize the engine.
+
+        Args:
+            mean_returns (array-like): Mean daily log-return of each asset
+            cov_matrix (array-like): Covariance matrix of the daily log-returns
+            latest_prices (array-like): Current price of each asset
+            num_days (int): Simulation horizon in days
+            num_paths (int): Number of simulated paths
+            seed (int or numpy.random.Generator): Seed, or generator shared with the caller
+        """
+        self.mean_returns = np.asarray(mean_returns, dtype=float)
+        self.cov_matrix = np.asarray(cov_matrix, dtype=float)
+        self.latest_prices = np.asarray(latest_prices, dtype=float)
+        self.num_days = num_days
+        self.num_paths = num_paths
+        self.rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        self.cholesky = self._cholesky(self.cov_matrix * num_days)
+
+    @staticmethod
+    def _cholesky(cov):
+        """Cholesky factor of cov, through a clipped eigendecomposition when cov is not positive definite."""
+        try:
+            return np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            eigenvalues, eigenvectors = np.linalg.eigh(cov)
+            return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+    def simulate_final_prices(self):
+        """
+        Simulate the asset prices at the end of the horizon.
+
+        Returns:
+            numpy.ndarray: Final prices of shape (num_paths, nb_assets)
+        """
+        shocks = self.rng.standard_normal((self.num_paths, len(self.latest_prices)))
+        log_returns = self.mean_returns * self.num_days + shocks @ self.cholesky.T
+        return self.latest_prices * np.exp(log_returns)
+
+    def expected_values(self, quantities):
+        """
+        Expected final value of one or several portfolios.
+
+        Args:
+            quantities (array-like): Quantities of shape (nb_assets,) or (nb_candidates, nb_assets)
+
+        Returns:
+            float or numpy.ndarray: Mean simulated final value of each portfolio
+        """
+        quantities = np.asarray(quantities, dtype=float)
+        final_values = self.simulate_final_prices() @ np.atleast_2d(quantities).T
+        expected = final_values.mean(axis=0)
+        return expected[0] if quantities.ndim == 1 else expected
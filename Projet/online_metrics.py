@@ -0,0 +1,215 @@
+import math
+import pandas as pd
+from db_session import connect
+
+TRADING_DAYS = 252
+
+
+class OnlineMetrics:
+    """
+    Performance metrics of one NAV series, updated in O(1) per new point.
+
+    Daily returns feed a Welford mean/variance, a running peak gives the maximum
+    drawdown, and a weekly bucket (weeks ending on Sunday, like resample('W')) tracks
+    the best and worst weekly returns. The metrics match the batch computation of
+    PortfolioAnalyzer.compute_portfolio_metrics on the same series.
+    """
+
+    FIELDS = ["FIRST_DATE", "FIRST_VALUE", "LAST_DATE", "LAST_VALUE", "N_RETURNS", "MEAN_RETURN", "M2",
+              "PEAK", "MAX_DRAWDOWN", "WEEK_END", "WEEK_LAST", "PREV_WEEK_LAST", "BEST_WEEK", "WORST_WEEK"]
+
+    def __init__(self, state=None):
+        """
+        Initialize the accumulator.
+
+        Args:
+            state (dict): State returned by to_state(), to resume a previous run
+        """
+        state = state or {}
+        for field in self.FIELDS:
+            setattr(self, field.lower(), state.get(field))
+        self.n_returns = int(self.n_returns or 0)
+        self.mean_return = float(self.mean_return or 0.0)
+        self.m2 = float(self.m2 or 0.0)
+        self.max_drawdown = float(self.max_drawdown or 0.0)
+        for field in ("first_date", "last_date", "week_end"):
+            if getattr(self, field) is not None:
+                setattr(self, field, pd.Timestamp(getattr(self, field)))
+
+    def _add_weekly_return(self, weekly_return):
+        self.best_week = weekly_return if self.best_week is None else max(self.best_week, weekly_return)
+        self.worst_week = weekly_return if self.worst_week is None else min(self.worst_week, weekly_return)
+
+    def update(self, date, value):
+        """
+        Add one NAV point.
+
+        Args:
+            date (datetime): Date of the point, after the last processed date
+            value (float): Portfolio value at that date
+        """
+        date = pd.Timestamp(date)
+        value = float(value)
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Date {date.date()} déjà traitée (dernière date : {self.last_date.date()}).")
+
+        if self.first_date is None:
+            self.first_date, self.first_value, self.peak = date, value, value
+        else:
+            # Welford : moyenne et variance des rendements journaliers
+            daily_return = value / self.last_value - 1
+            self.n_returns += 1
+            delta = daily_return - self.mean_return
+            self.mean_return += delta / self.n_returns
+            self.m2 += delta * (daily_return - self.mean_return)
+
+            self.peak = max(self.peak, value)
+            self.max_drawdown = min(self.max_drawdown, (value - self.peak) / self.peak)
+
+        # Semaines se terminant le dimanche : la semaine précédente est close au changement de semaine
+        week_end = (date + pd.offsets.Week(weekday=6, n=0)).normalize()
+        if self.week_end is not None and week_end != self.week_end:
+            if self.prev_week_last is not None:
+                self._add_weekly_return(self.week_last / self.prev_week_last - 1)
+            if (week_end - self.week_end).days > 7:
+                # Semaines sans cotation : rendement nul, comme pct_change sur les valeurs propagées
+                self._add_weekly_return(0.0)
+            self.prev_week_last = self.week_last
+        self.week_end, self.week_last = week_end, value
+
+        self.last_date, self.last_value = date, value
+
+    def metrics(self):
+        """
+        Current metrics, the current week counting as a (partial) weekly return.
+
+        Returns:
+            dict: Same keys and units as compute_portfolio_metrics (NaN when undefined)
+        """
+        nan = float("nan")
+        std = math.sqrt(self.m2 / (self.n_returns - 1)) if self.n_returns > 1 else nan
+        best_week, worst_week = self.best_week, self.worst_week
+        if self.prev_week_last is not None:
+            current_week = self.week_last / self.prev_week_last - 1
+            best_week = current_week if best_week is None else max(best_week, current_week)
+            worst_week = current_week if worst_week is None else min(worst_week, current_week)
+
+        if self.first_date is None:
+            cumulative_return = cagr = nan
+        else:
+            cumulative_return = self.last_value / self.first_value - 1
+            days = (self.last_date - self.first_date).days
+            cagr = (self.last_value / self.first_value) ** (365 / days) - 1 if days > 0 else nan
+
+        return {
+            "Performance Totale (%)": cumulative_return * 100,
+            "Volatilité Annuelle (%)": std * math.sqrt(TRADING_DAYS) * 100,
+            "Sharpe Ratio": self.mean_return / std * math.sqrt(TRADING_DAYS) if self.n_returns > 1 and std > 0 else nan,
+            "Max Drawdown (%)": self.max_drawdown * 100 if self.first_date is not None else nan,
+            "CAGR (%)": cagr * 100,
+            "Meilleure Perf Hebdo (%)": best_week * 100 if best_week is not None else nan,
+            "Pire Perf Hebdo (%)": worst_week * 100 if worst_week is not None else nan,
+        }
+
+    def to_state(self):
+        """State of the accumulator, with dates as YYYY-MM-DD strings."""
+        state = {field: getattr(self, field.lower()) for field in self.FIELDS}
+        for field in ("FIRST_DATE", "LAST_DATE", "WEEK_END"):
+            if state[field] is not None:
+                state[field] = state[field].strftime("%Y-%m-%d")
+        return state
+
+
+class MetricsAccumulator:
+    """
+    OnlineMetrics of every RISK_TYPE, persisted in a SQLite table so that each run
+    only processes the NAV points after the last stored date.
+    """
+
+    def __init__(self, db_file, table="Portfolio_Metrics_State"):
+        """
+        Initialize the accumulator.
+
+        Args:
+            db_file (str or DatabaseSession): Path to the SQLite database, or shared session
+            table (str): Table storing one accumulator state per RISK_TYPE
+        """
+        self.db_file = db_file
+        self.table = table
+
+    def _create_table(self, conn):
+        columns = ", ".join(f"{field} {'DATE' if field.endswith(('_DATE', '_END')) else 'REAL'}"
+                            for field in OnlineMetrics.FIELDS)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (RISK_TYPE TEXT PRIMARY KEY, {columns})")
+
+    def load(self):
+        """
+        Stored accumulators.
+
+        Returns:
+            dict: RISK_TYPE -> OnlineMetrics
+        """
+        conn = connect(self.db_file)
+        try:
+            self._create_table(conn)
+            states = pd.read_sql_query(f"SELECT * FROM {self.table}", conn)
+        finally:
+            conn.close()
+        states = states.astype(object).where(states.notna(), None)
+        return {row.pop("RISK_TYPE"): OnlineMetrics(row) for row in states.to_dict("records")}
+
+    def update(self, nav_df):
+        """
+        Process the new NAV points and persist the accumulators.
+
+        A stored accumulator is restarted from scratch when the NAV at its last processed
+        date no longer matches (e.g. after a full Portfolio_History rebuild).
+
+        Args:
+            nav_df (pandas.DataFrame): NAV indexed by date, one column per RISK_TYPE
+                                       (e.g. PortfolioAnalyzer.compute_nav())
+
+        Returns:
+            pandas.DataFrame: Metrics of every RISK_TYPE, rounded like compute_portfolio_metrics
+        """
+        accumulators = self.load()
+        for risk_type in nav_df.columns:
+            series = nav_df[risk_type].dropna()
+            accumulator = accumulators.get(risk_type)
+            if accumulator is not None and accumulator.last_date is not None:
+                known = series.get(accumulator.last_date)
+                if known is None or not math.isclose(known, accumulator.last_value, rel_tol=1e-9):
+                    print(f"⚠️ NAV de {risk_type} modifiée depuis le dernier calcul : métriques recalculées.")
+                    accumulator = None
+                else:
+                    series = series[series.index > accumulator.last_date]
+            if accumulator is None:
+                accumulator = OnlineMetrics()
+            for date, value in series.items():
+                accumulator.update(date, value)
+            accumulators[risk_type] = accumulator
+
+        conn = connect(self.db_file)
+        try:
+            self._create_table(conn)
+            fields = ["RISK_TYPE"] + OnlineMetrics.FIELDS
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                [[risk_type] + list(accumulator.to_state().values()) for risk_type, accumulator in accumulators.items()]
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        metrics = {risk_type: accumulators[risk_type].metrics() for risk_type in nav_df.columns}
+        return pd.DataFrame(metrics).T.round(2)
+
+    def reset(self):
+        """Delete the stored accumulators."""
+        conn = connect(self.db_file)
+        try:
+            self._create_table(conn)
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import time
+import threading
+import pandas as pd
+
+
+class PriceCache:
+    """
+    On-disk price cache keyed by ticker and date.
+
+    Prices are stored in one columnar file per ticker (Parquet or Feather) with the
+    IMPORT_DATE, PRICE and SECTOR columns. A JSON index records, for every ticker,
+    the date ranges already downloaded so that only the missing ranges have to be
+    fetched again (weekends and holidays inside a covered range are not gaps).
+    """
+
+    INDEX_FILE = "_index.json"
+
+    def __init__(self, cache_dir="price_cache", fmt="parquet", max_age_days=None, max_size_mb=None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory holding the cache files
+            fmt (str): Storage format, 'parquet' or 'feather'
+            max_age_days (float): Entries written longer ago than this are evicted (None: no limit)
+            max_size_mb (float): Least recently used entries are evicted above this size (None: no limit)
+        """
+        if fmt not in ("parquet", "feather"):
+            raise ValueError("Unknown format. Choose between 'parquet' and 'feather'.")
+        self.cache_dir = cache_dir
+        self.fmt = fmt
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, path)
+
+    def _path(self, ticker):
+        safe_ticker = re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+        return os.path.join(self.cache_dir, f"{safe_ticker}.{self.fmt}")
+
+    def _read(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=["IMPORT_DATE", "PRICE", "SECTOR"])
+        if self.fmt == "parquet":
+            return pd.read_parquet(path)
+        return pd.read_feather(path)
+
+    def _write(self, ticker, df):
+        path = self._path(ticker)
+        if self.fmt == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_feather(path)
+
+    @staticmethod
+    def _merge_ranges(ranges):
+        """Merge overlapping or adjacent [start, end) date ranges."""
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    def missing_ranges(self, ticker, start, end):
+        """
+        Date ranges of [start, end) not covered by the cache for a ticker.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            start (str): Start date in YYYY-MM-DD format (included)
+            end (str): End date in YYYY-MM-DD format (excluded)
+
+        Returns:
+            list: (start, end) tuples in YYYY-MM-DD format, empty when fully cached
+        """
+        with self._lock:
+            entry = self._index.get(ticker)
+            covered = entry["ranges"] if entry else []
+            missing = []
+            cursor = start
+            for range_start, range_end in covered:
+                if range_end <= cursor:
+                    continue
+                if range_start >= end:
+                    break
+                if range_start > cursor:
+                    missing.append((cursor, range_start))
+                cursor = max(cursor, range_end)
+            if cursor < end:
+                missing.append((cursor, end))
+
+            if not missing:
+                self.hits += 1
+            elif len(missing) == 1 and missing[0] == (start, end):
+                self.misses += 1
+            else:
+                self.partial_hits += 1
+            return missing
+
+    def get(self, ticker, start, end):
+        """
+        Read the cached prices of a ticker for [start, end).
+
+        Args:
+            ticker (str): Stock ticker symbol
+            start (str): Start date in YYYY-MM-DD format (included)
+            end (str): End date in YYYY-MM-DD format (excluded)
+
+        Returns:
+            pandas.DataFrame: IMPORT_DATE, PRICE and SECTOR columns sorted by date
+        """
+        with self._lock:
+            df = self._read(ticker)
+            if ticker in self._index:
+                self._index[ticker]["last_access"] = time.time()
+        dates = pd.to_datetime(df["IMPORT_DATE"])
+        mask = (dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))
+        return df[mask].reset_index(drop=True)
+
+    def sector(self, ticker):
+        """
+        Cached sector of a ticker.
+
+        Args:
+            ticker (str): Stock ticker symbol
+
+        Returns:
+            str: Sector name, None when the ticker is not cached
+        """
+        entry = self._index.get(ticker)
+        return entry.get("sector") if entry else None
+
+    def put(self, ticker, prices, sector, start, end):
+        """
+        Store downloaded prices and mark [start, end) as covered.
+
+        The range is marked as covered even when no price was returned (e.g. a
+        weekend or holiday span), so that it is not downloaded again. It is
+        clipped to today so that the latest prices are downloaded again until
+        the day is over.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            prices (pandas.Series): Close prices indexed by date
+            sector (str): Sector of the ticker (None keeps the cached sector)
+            start (str): Start date of the download in YYYY-MM-DD format
+            end (str): End date of the download in YYYY-MM-DD format
+        """
+        new_rows = pd.DataFrame({
+            "IMPORT_DATE": pd.to_datetime(prices.index).tz_localize(None).normalize(),
+            "PRICE": prices.to_numpy(dtype=float),
+            "SECTOR": sector,
+        })
+        end = min(end, pd.Timestamp.today().strftime("%Y-%m-%d"))
+
+        with self._lock:
+            if not new_rows.empty:
+                cached = self._read(ticker)
+                df = new_rows if cached.empty else pd.concat([cached, new_rows], ignore_index=True)
+                df["IMPORT_DATE"] = pd.to_datetime(df["IMPORT_DATE"])
+                df = (df.drop_duplicates(subset="IMPORT_DATE", keep="last")
+                        .sort_values("IMPORT_DATE")
+                        .reset_index(drop=True))
+                self._write(ticker, df)
+
+            entry = self._index.setdefault(ticker, {"ranges": []})
+            if start < end:
+                entry["ranges"] = self._merge_ranges(entry["ranges"] + [[start, end]])
+            if sector is not None:
+                entry["sector"] = sector
+            entry["written_at"] = time.time()
+            entry["last_access"] = time.time()
+            self.evict(keep=[ticker])
+            self._save_index()
+
+    def invalidate(self, ticker):
+        """Remove a ticker from the cache."""
+        with self._lock:
+            path = self._path(ticker)
+            if os.path.exists(path):
+                os.remove(path)
+            self._index.pop(ticker, None)
+            self._save_index()
+
+    def clear(self):
+        """Remove every ticker from the cache and reset the counters."""
+        with self._lock:
+            for ticker in list(self._index):
+                self.invalidate(ticker)
+            self.hits = self.partial_hits = self.misses = 0
+
+    def _size_bytes(self, ticker):
+        path = self._path(ticker)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def evict(self, keep=()):
+        """
+        Apply the age and size limits.
+
+        Args:
+            keep (iterable): Tickers never evicted (e.g. the ticker just written)
+
+        Returns:
+            list: Evicted tickers
+        """
+        evicted = []
+        keep = set(keep)
+        with self._lock:
+            if self.max_age_days is not None:
+                limit = time.time() - self.max_age_days * 86400
+                for ticker, entry in list(self._index.items()):
+                    if ticker not in keep and entry.get("written_at", 0) < limit:
+                        self.invalidate(ticker)
+                        evicted.append(ticker)
+
+            if self.max_size_mb is not None:
+                max_bytes = self.max_size_mb * 1024 * 1024
+                sizes = {ticker: self._size_bytes(ticker) for ticker in self._index}
+                total = sum(sizes.values())
+                by_access = sorted(self._index, key=lambda t: self._index[t].get("last_access", 0))
+                for ticker in by_access:
+                    if total <= max_bytes:
+                        break
+                    if ticker in keep:
+                        continue
+                    total -= sizes[ticker]
+                    self.invalidate(ticker)
+                    evicted.append(ticker)
+        return evicted
+
+    def stats(self):
+        """
+        Cache statistics.
+
+        Returns:
+            dict: Hit/miss counters, number of cached tickers and size on disk
+        """
+        with self._lock:
+            lookups = self.hits + self.partial_hits + self.misses
+            return {
+                "hits": self.hits,
+                "partial_hits": self.partial_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "tickers": len(self._index),
+                "size_bytes": sum(self._size_bytes(ticker) for ticker in self._index),
+            }
@@ -0,0 +1,192 @@
+from db_session import connect
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+
+class PriceWindow:
+    """Read-only slice of a PriceCube: a tickers x dates price matrix."""
+
+    def __init__(self, tickers, dates, prices):
+        self.tickers = tickers
+        self.dates = dates
+        self.prices = prices
+
+    def to_frame(self):
+        """
+        Long DataFrame with the IMPORT_DATE, TICKER and PRICE columns (missing prices dropped),
+        sorted by date then ticker like the Products queries of the strategies.
+        """
+        df = pd.DataFrame({
+            "IMPORT_DATE": np.tile(pd.to_datetime(self.dates), len(self.tickers)),
+            "TICKER": np.repeat(np.asarray(self.tickers, dtype=object), len(self.dates)),
+            "PRICE": self.prices.ravel(),
+        })
+        return df.dropna(subset=["PRICE"]).sort_values(["IMPORT_DATE", "TICKER"], kind="stable").reset_index(drop=True)
+
+
+class PriceCube:
+    """
+    In-memory ticker x date price matrix loaded once per backtest.
+
+    Every accessor takes the simulation date and only returns prices observed strictly
+    before it, i.e. what Products contains on the morning of that date, so a strategy
+    reading from the cube cannot look ahead.
+    """
+
+    def __init__(self, tickers, dates, prices):
+        """
+        Initialize the cube.
+
+        Args:
+            tickers (list): Ticker symbols, one per row of prices
+            dates (numpy.ndarray): Sorted dates (datetime64[D]), one per column of prices
+            prices (numpy.ndarray): Price matrix of shape (len(tickers), len(dates)), NaN when missing
+        """
+        self.tickers = list(tickers)
+        self.ticker_index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self.prices = np.asarray(prices, dtype=float)
+        self.prices.flags.writeable = False
+        # Colonnes où chaque ticker a un prix, pour retrouver les N dernières observations en O(log n)
+        self._valid_columns = [np.flatnonzero(~np.isnan(row)) for row in self.prices]
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build the cube from a frame with IMPORT_DATE, TICKER and PRICE columns.
+
+        IMPORT_DATE may be datetime, YYYY-MM-DD or DD/MM/YYYY. Duplicated (TICKER, IMPORT_DATE)
+        rows keep the last price.
+
+        Args:
+            df (pandas.DataFrame): Price data, e.g. GetData.main_data_frame()
+
+        Returns:
+            PriceCube: The loaded cube
+        """
+        long_df = pd.DataFrame({
+            "IMPORT_DATE": cls._parse_dates(df["IMPORT_DATE"]).to_numpy(),
+            "TICKER": df["TICKER"].to_numpy(),
+            "PRICE": df["PRICE"].astype(float).to_numpy(),
+        })
+        wide = (long_df.drop_duplicates(subset=["TICKER", "IMPORT_DATE"], keep="last")
+                       .pivot(index="TICKER", columns="IMPORT_DATE", values="PRICE")
+                       .sort_index(axis=1))
+        return cls(wide.index.tolist(), wide.columns.to_numpy(dtype="datetime64[D]"), wide.to_numpy())
+
+    @staticmethod
+    def _parse_dates(dates):
+        """Parse datetime, YYYY-MM-DD or DD/MM/YYYY dates to normalized datetime64."""
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = dates.astype(str)
+            dates = pd.to_datetime(dates, format="%d/%m/%Y" if dates.str.contains("/").all() else "%Y-%m-%d")
+        return dates.dt.normalize()
+
+    @classmethod
+    def from_db(cls, db_file, feed=None):
+        """
+        Build the cube from the Products table, optionally completed with the price feed
+        that the weekly updates will write during the backtest.
+
+        Args:
+            db_file (str or DatabaseSession): Path to the SQLite database, or shared session
+            feed (pandas.DataFrame): Price feed with IMPORT_DATE, TICKER and PRICE columns
+
+        Returns:
+            PriceCube: The loaded cube
+        """
+        conn = connect(db_file)
+        products_df = pd.read_sql_query("SELECT IMPORT_DATE, TICKER, PRICE FROM Products", conn)
+        conn.close()
+        if feed is not None and not feed.empty:
+            products_df["IMPORT_DATE"] = cls._parse_dates(products_df["IMPORT_DATE"])
+            feed = feed[["IMPORT_DATE", "TICKER", "PRICE"]].assign(IMPORT_DATE=cls._parse_dates(feed["IMPORT_DATE"]))
+            products_df = pd.concat([products_df, feed], ignore_index=True)
+        return cls.from_frame(products_df)
+
+    def __contains__(self, ticker):
+        return ticker in self.ticker_index
+
+    def _end(self, date):
+        """Number of columns strictly before date."""
+        return int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date).date(), "D"), side="left"))
+
+    def as_of(self, date, lookback=None, tickers=None):
+        """
+        Prices known before a date.
+
+        Args:
+            date (datetime): Simulation date, excluded
+            lookback (int or timedelta): Number of dates, or calendar period before date, to keep
+                                         (default: the whole history)
+            tickers (list): Tickers to keep, in this order (default: every ticker)
+
+        Returns:
+            PriceWindow: Read-only view of the matching part of the cube
+        """
+        end = self._end(date)
+        if lookback is None:
+            start = 0
+        elif isinstance(lookback, (timedelta, pd.Timedelta)):
+            start = self._end(pd.Timestamp(date) - lookback)
+        else:
+            start = max(end - int(lookback), 0)
+
+        if tickers is None:
+            rows, prices = self.tickers, self.prices[:, start:end]
+        else:
+            rows = [ticker for ticker in tickers if ticker in self.ticker_index]
+            prices = self.prices[[self.ticker_index[ticker] for ticker in rows], start:end]
+            prices.flags.writeable = False
+        return PriceWindow(rows, self.dates[start:end], prices)
+
+    def observations(self, ticker, until):
+        """
+        Observed prices of one ticker before one or many dates, skipping the dates without a price.
+
+        The series is cut inside the cube at the latest of the until dates, and the number of
+        observations strictly before each date is returned alongside, so that the prices known
+        on every simulation date are prices[:count] without another search by the caller.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            until (datetime or list): Simulation date(s), excluded
+
+        Returns:
+            tuple: (prices, counts), the observed prices in chronological order before the latest
+                   date (empty for an unknown ticker), and the number of them before each date
+                   (an int for a single date, a numpy array otherwise)
+        """
+        dates = pd.DatetimeIndex(np.atleast_1d(until)).normalize()
+        ends = np.searchsorted(self.dates, dates.to_numpy(dtype="datetime64[D]"), side="left")
+        if ticker in self.ticker_index:
+            i = self.ticker_index[ticker]
+            valid = self._valid_columns[i]
+            counts = np.searchsorted(valid, ends, side="left")
+            prices = self.prices[i, valid[:counts.max(initial=0)]]
+        else:
+            counts = np.zeros(len(ends), dtype=int)
+            prices = np.array([], dtype=float)
+        return prices, int(counts[0]) if np.ndim(until) == 0 else counts
+
+    def history(self, ticker, date, lookback=None):
+        """
+        Last observed prices of one ticker before a date, skipping the dates without a price.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            date (datetime): Simulation date, excluded
+            lookback (int): Number of observations to keep (default: the whole history)
+
+        Returns:
+            pandas.Series: Prices indexed by date, in chronological order (empty for an unknown ticker)
+        """
+        if ticker not in self.ticker_index:
+            return pd.Series(dtype=float)
+        i = self.ticker_index[ticker]
+        valid = self._valid_columns[i]
+        stop = int(np.searchsorted(valid, self._end(date), side="left"))
+        start = 0 if lookback is None else max(stop - lookback, 0)
+        columns = valid[start:stop]
+        return pd.Series(self.prices[i, columns], index=pd.DatetimeIndex(self.dates[columns]), name=ticker)
@@ -0,0 +1,159 @@
+"""
+Query-plan regression check of the SQL used by the pipeline.
+
+Every SQL statement written as a string literal in strategies.py, base_update.py and
+Performance.py is extracted with ast, then run through EXPLAIN QUERY PLAN on an empty
+in-memory database built by DatabaseBuilder (tables, migrations and indexes). The check
+fails when a statement scans a whole table that is not allowlisted.
+
+    python query_plan_check.py
+    python query_plan_check.py --verbose --allow Managers
+"""
+import argparse
+import ast
+import contextlib
+import io
+import os
+import re
+import sqlite3
+import sys
+
+DEFAULT_MODULES = ["strategies.py", "base_update.py", "Performance.py"]
+
+# Tables dont la lecture complète est voulue (ou sans index possible), avec la raison
+ALLOWLIST = {
+    "Managers": "quelques lignes, lues en entier pour les descriptions",
+    "Portfolio_History": "chargée en entier par compute_nav (matrice des positions)",
+    "Products_Staging": "table temporaire de l'upsert, parcourue en entier par construction",
+    "StartPrices": "CTE de quelques lignes par ticker",
+    "EndPrices": "CTE de quelques lignes par ticker",
+}
+
+SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|CREATE)\b", re.IGNORECASE)
+TABLE_SCAN = re.compile(r"^SCAN (\w+)\b(?! USING (?:COVERING )?INDEX)")
+
+
+def _literal_sql(node):
+    """SQL text of a string or f-string node (formatted values replaced by a placeholder), or None."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        text = node.value
+    elif isinstance(node, ast.JoinedStr):
+        text = "".join(part.value if isinstance(part, ast.Constant) else "?" for part in node.values)
+    else:
+        return None
+    return text.strip() if SQL_START.match(text) else None
+
+
+def _table_name(sql, name):
+    """Table behind a name of a query plan, which can be an alias (e.g. "FROM Products_Staging s")."""
+    match = re.search(rf"\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?{name}\b", sql, re.IGNORECASE)
+    return match.group(1) if match else name
+
+
+def extract_sql(path):
+    """
+    SQL statements written as string literals in a Python module.
+
+    Args:
+        path (str): Path of the module
+
+    Returns:
+        list: (line number, SQL text) pairs, in source order
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    statements, inside_fstring = [], set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.JoinedStr):
+            inside_fstring.update(id(part) for part in node.values)
+    for node in ast.walk(tree):
+        if id(node) in inside_fstring:
+            continue
+        sql = _literal_sql(node)
+        if sql is not None:
+            statements.append((node.lineno, sql))
+    return sorted(statements)
+
+
+def build_schema():
+    """In-memory database with the full schema (DatabaseBuilder.create_tables and migrations)."""
+    from base_builder import DatabaseBuilder
+    from db_session import DatabaseSession
+
+    session = DatabaseSession(":memory:")
+    with contextlib.redirect_stdout(io.StringIO()):
+        DatabaseBuilder(session).create_tables()
+    return session
+
+
+def check_query_plans(modules=None, allowlist=None, base_dir=None):
+    """
+    Run EXPLAIN QUERY PLAN on every SQL statement of the modules.
+
+    CREATE statements (e.g. temporary staging tables) are executed first so that the
+    statements using them can be planned.
+
+    Args:
+        modules (list): Module file names (default: DEFAULT_MODULES)
+        allowlist (iterable): Tables allowed to be fully scanned (default: ALLOWLIST)
+        base_dir (str): Directory of the modules (default: directory of this file)
+
+    Returns:
+        list: One dict per statement with module, line, sql, plan (list of str),
+              scans (fully scanned tables not allowlisted) and error (str or None)
+    """
+    modules = modules or DEFAULT_MODULES
+    allowlist = set(ALLOWLIST if allowlist is None else allowlist)
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+
+    statements = [(module, line, sql) for module in modules
+                  for line, sql in extract_sql(os.path.join(base_dir, module))]
+    session = build_schema()
+    conn = session.connection
+    for module, line, sql in statements:
+        if re.match(r"^\s*CREATE\b", sql, re.IGNORECASE):
+            conn.execute(sql)
+
+    results = []
+    for module, line, sql in statements:
+        result = {"module": module, "line": line, "sql": sql, "plan": [], "scans": [], "error": None}
+        if not re.match(r"^\s*CREATE\b", sql, re.IGNORECASE):
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count("?")).fetchall()
+            except sqlite3.Error as e:
+                result["error"] = str(e)
+            else:
+                result["plan"] = [row[-1] for row in rows]
+                scanned = [_table_name(sql, match.group(1)) for match in map(TABLE_SCAN.match, result["plan"]) if match]
+                result["scans"] = [table for table in scanned if table not in allowlist]
+        results.append(result)
+    session.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vérifie qu'aucune requête ne parcourt une table entière.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules à analyser")
+    parser.add_argument("--allow", nargs="*", default=[], help="Tables supplémentaires autorisées en parcours complet")
+    parser.add_argument("--verbose", action="store_true", help="Afficher le plan de chaque requête")
+    args = parser.parse_args(argv)
+
+    results = check_query_plans(args.modules, set(ALLOWLIST) | set(args.allow))
+    failures = [result for result in results if result["scans"] or result["error"]]
+    for result in results:
+        if args.verbose or result in failures:
+            first_line = " ".join(result["sql"].split())[:100]
+            print(f"{result['module']}:{result['line']} {first_line}")
+            for step in result["plan"]:
+                print(f"    {step}")
+            if result["scans"]:
+                print(f"    -> parcours complet de : {', '.join(result['scans'])}")
+            if result["error"]:
+                print(f"    -> erreur : {result['error']}")
+
+    print(f"{len(results)} requête(s) analysée(s), {len(failures)} en échec.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+TRADING_DAYS = 252
+DEFAULT_WINDOWS = {"3M": 63, "1Y": 252}
+
+
+def _window_sums(values, window):
+    """
+    Sums and counts of valid values over every trailing window, from cumulative sums.
+
+    Args:
+        values (numpy.ndarray): Matrix of shape (nb_dates, nb_columns), NaN when missing
+        window (int): Number of rows per window
+
+    Returns:
+        tuple: (sums, counts) of shape (nb_dates - window + 1, nb_columns)
+    """
+    valid = ~np.isnan(values)
+    cumulated = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    counts = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(valid, axis=0)])
+    return cumulated[window:] - cumulated[:-window], counts[window:] - counts[:-window]
+
+
+def rolling_volatility_sharpe(returns, window):
+    """
+    Rolling annualised volatility and Sharpe ratio of every column.
+
+    The mean and the variance of each window come from cumulative sums of the returns
+    and of their squares (centred on the column mean to limit cancellation), so the
+    cost does not depend on the window length.
+
+    Args:
+        returns (numpy.ndarray): Daily returns of shape (nb_dates, nb_columns)
+        window (int): Number of returns per window
+
+    Returns:
+        tuple: (volatility, sharpe) of shape (nb_dates, nb_columns), NaN until a full window is available
+    """
+    volatility = np.full(returns.shape, np.nan)
+    sharpe = np.full(returns.shape, np.nan)
+    if len(returns) < window or window < 2:
+        return volatility, sharpe
+
+    totals, counts = np.nansum(returns, axis=0), (~np.isnan(returns)).sum(axis=0)
+    centre = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+    centred = returns - centre
+    sums, counts = _window_sums(centred, window)
+    squares, _ = _window_sums(centred ** 2, window)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = np.clip((squares - sums ** 2 / window) / (window - 1), 0, None)
+        std = np.sqrt(variance)
+        mean = sums / window + centre
+        full = counts == window
+        volatility[window - 1:] = np.where(full, std * np.sqrt(TRADING_DAYS), np.nan)
+        sharpe[window - 1:] = np.where(full & (std > 0), mean / std * np.sqrt(TRADING_DAYS), np.nan)
+    return volatility, sharpe
+
+
+def rolling_max_drawdown(nav, window):
+    """
+    Rolling maximum drawdown of every column over windows of window NAV points.
+
+    Args:
+        nav (numpy.ndarray): NAV of shape (nb_dates, nb_columns)
+        window (int): Number of NAV points per window
+
+    Returns:
+        numpy.ndarray: Drawdowns (<= 0) of shape (nb_dates, nb_columns), NaN until a full window is available
+    """
+    drawdown = np.full(nav.shape, np.nan)
+    if len(nav) < window:
+        return drawdown
+    # Vue (nb_fenêtres, nb_colonnes, window) sans copie ; plus haut courant le long de chaque fenêtre
+    windows = sliding_window_view(nav, window, axis=0)
+    with np.errstate(invalid="ignore"):
+        drawdown[window - 1:] = (windows / np.maximum.accumulate(windows, axis=-1) - 1).min(axis=-1)
+    return drawdown
+
+
+def compute_rolling_metrics(nav_df, windows=None):
+    """
+    Rolling volatility, Sharpe ratio and maximum drawdown of every column of a NAV matrix.
+
+    Args:
+        nav_df (pandas.DataFrame): NAV indexed by date, one column per RISK_TYPE
+                                   (e.g. PortfolioAnalyzer.compute_nav())
+        windows (dict): Window label -> number of observations (default: 3M = 63, 1Y = 252)
+
+    Returns:
+        pandas.DataFrame: Long frame with DATE, RISK_TYPE, WINDOW, METRIC (VOLATILITY, SHARPE,
+                          MAX_DRAWDOWN) and VALUE (fractions, not percentages), without the
+                          dates where the window is incomplete
+    """
+    columns = ["DATE", "RISK_TYPE", "WINDOW", "METRIC", "VALUE"]
+    if nav_df.empty:
+        return pd.DataFrame(columns=columns)
+    windows = windows or DEFAULT_WINDOWS
+    nav = nav_df.to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = nav[1:] / nav[:-1] - 1
+
+    frames = []
+    for label, window in windows.items():
+        volatility, sharpe = rolling_volatility_sharpe(returns, window)
+        metrics = {
+            # Le rendement de la ligne i est daté du point de NAV i + 1
+            "VOLATILITY": np.vstack([np.full((1, nav.shape[1]), np.nan), volatility]),
+            "SHARPE": np.vstack([np.full((1, nav.shape[1]), np.nan), sharpe]),
+            "MAX_DRAWDOWN": rolling_max_drawdown(nav, window),
+        }
+        for metric, values in metrics.items():
+            frame = pd.DataFrame(values, columns=nav_df.columns).assign(DATE=nav_df.index.to_numpy())
+            frames.append(frame.melt(id_vars="DATE", var_name="RISK_TYPE", value_name="VALUE")
+                               .assign(WINDOW=label, METRIC=metric))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns].dropna(subset=["VALUE"]).reset_index(drop=True)
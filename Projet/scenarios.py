@@ -0,0 +1,209 @@
+import os
+import io
+import time
+import tempfile
+import contextlib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from base_builder import DatabaseBuilder
+from db_session import DatabaseSession, connect
+from strategies import RunAllStrat
+
+RISK_TYPES = ["LOW_RISK", "LOW_TURNOVER", "HY_EQUITY"]
+
+
+def clone_database(source_db, target_db):
+    """
+    Copy a SQLite database with the online backup API.
+
+    Args:
+        source_db (str or DatabaseSession): Database to copy
+        target_db (str or DatabaseSession): Copy (an existing file is overwritten)
+    """
+    if not isinstance(target_db, DatabaseSession) and os.path.exists(target_db):
+        os.remove(target_db)
+    source = connect(source_db)
+    target = connect(target_db)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def run_scenario(base_db, workdir, scenario, existing_data=None, quiet=True, in_memory=False):
+    """
+    Run one backtest on a private copy of the base database.
+
+    Top-level function so that it can be sent to a process pool.
+
+    Args:
+        base_db (str or DatabaseSession): Base database (left untouched)
+        workdir (str): Directory receiving the scenario database
+        scenario (dict): name, start_date, end_date (DD/MM/YYYY), tickers, and optional
+                         options passed to RunAllStrat (seed, mc_paths, low_risk_mode...)
+        existing_data (pandas.DataFrame): Price feed of the backtest
+        quiet (bool): Silence the output of the strategies
+        in_memory (bool): Run on an in-memory copy (DatabaseSession(':memory:')) instead of a file
+
+    Returns:
+        dict: Scenario name, status, timings, Deals and Portfolio_History frames
+    """
+    name = scenario["name"]
+    result = {"name": name, "status": "ok", "error": None, "deals": None, "history": None}
+    scenario_db = DatabaseSession(":memory:") if in_memory else os.path.join(workdir, f"{name}.db")
+    output = io.StringIO() if quiet else None
+    scenario_start = time.perf_counter()
+    try:
+        start = time.perf_counter()
+        clone_database(base_db, scenario_db)
+        result["clone_time"] = time.perf_counter() - start
+
+        if existing_data is not None:
+            existing_data = existing_data[existing_data["TICKER"].isin(scenario["tickers"])]
+
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            start = time.perf_counter()
+            strategy = RunAllStrat(scenario_db, scenario["start_date"], scenario["end_date"], scenario["tickers"],
+                                   existing_data, **scenario.get("options", {}))
+            strategy.run()
+            result["run_time"] = time.perf_counter() - start
+            # RunAllStrat.run() affiche ses erreurs sans les lever
+            if strategy.error is not None:
+                raise strategy.error
+
+            start = time.perf_counter()
+            builder = DatabaseBuilder(scenario_db)
+            for risk_type in RISK_TYPES:
+                builder.rebuild_portfolio_history_by_risk_type(risk_type)
+            result["history_time"] = time.perf_counter() - start
+
+        conn = connect(scenario_db)
+        result["deals"] = pd.read_sql_query("SELECT * FROM Deals", conn)
+        result["history"] = pd.read_sql_query("SELECT * FROM Portfolio_History", conn)
+        conn.close()
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    finally:
+        if in_memory:
+            scenario_db.close()
+    result["total_time"] = time.perf_counter() - scenario_start
+    return result
+
+
+class ScenarioRunner:
+    """
+    Run many RunAllStrat backtests (start/end windows, ticker universes, options) in a
+    process pool, each on its own copy of the base database, and collect the resulting
+    Deals and Portfolio_History into a single results database.
+    """
+
+    def __init__(self, base_db, results_db="scenarios.db", max_workers=None, existing_data=None,
+                 workdir=None, keep_databases=False, in_memory=False):
+        """
+        Initialize the runner.
+
+        Args:
+            base_db (str or DatabaseSession): Database after initialisation (clients, managers, cash,
+                                              initial Products), stored in a file
+            results_db (str): SQLite database receiving the results of every scenario
+            max_workers (int): Number of processes (default: number of CPUs)
+            existing_data (pandas.DataFrame): Price feed shared by the scenarios (e.g. main_df)
+            workdir (str): Directory of the scenario databases (default: temporary directory)
+            keep_databases (bool): Keep the scenario databases after the run (their directory is
+                                   recorded in last_workdir)
+            in_memory (bool): Run each scenario on an in-memory copy of the base database
+                              (nothing is written to workdir)
+        """
+        if isinstance(base_db, DatabaseSession) and base_db.db_file == ":memory:":
+            raise ValueError("La base de départ doit être un fichier pour être partagée entre processus.")
+        self.base_db = base_db
+        self.results_db = results_db
+        self.max_workers = max_workers
+        self.existing_data = existing_data
+        self.workdir = workdir
+        self.keep_databases = keep_databases
+        self.in_memory = in_memory
+        self.last_workdir = None  # Directory of the scenario databases of the last run
+
+    def _store(self, conn, scenario, result):
+        """Append the results of one scenario to the results database."""
+        pd.DataFrame([{
+            "SCENARIO": result["name"],
+            "START_DATE": scenario["start_date"],
+            "END_DATE": scenario["end_date"],
+            "TICKERS": ",".join(scenario["tickers"]),
+            "STATUS": result["status"],
+            "ERROR": result["error"],
+            "CLONE_TIME": result.get("clone_time"),
+            "RUN_TIME": result.get("run_time"),
+            "HISTORY_TIME": result.get("history_time"),
+            "TOTAL_TIME": result["total_time"],
+        }]).to_sql("Scenario_Runs", conn, if_exists="append", index=False)
+        for table, key in (("Scenario_Deals", "deals"), ("Scenario_Portfolio_History", "history")):
+            if result[key] is not None and not result[key].empty:
+                result[key].assign(SCENARIO=result["name"]).to_sql(table, conn, if_exists="append", index=False)
+        conn.commit()
+
+    def run(self, scenarios, quiet=True):
+        """
+        Run the scenarios in parallel.
+
+        Args:
+            scenarios (list): Scenario dicts, see run_scenario (a missing name is generated)
+            quiet (bool): Silence the output of the strategies
+
+        Returns:
+            pandas.DataFrame: One row per scenario with its status and timings (Scenario_Runs)
+        """
+        scenarios = [dict(scenario, name=scenario.get("name", f"scenario_{i}")) for i, scenario in enumerate(scenarios)]
+        names = [scenario["name"] for scenario in scenarios]
+        if len(set(names)) != len(names):
+            raise ValueError("Les noms de scénarios doivent être uniques.")
+
+        temporary_dir = None
+        workdir = self.workdir
+        if workdir is None:
+            if self.keep_databases:
+                # Répertoire conservé après le run : créé sans nettoyage automatique
+                workdir = tempfile.mkdtemp(prefix="scenarios_")
+            else:
+                temporary_dir = tempfile.TemporaryDirectory(prefix="scenarios_")
+                workdir = temporary_dir.name
+        os.makedirs(workdir, exist_ok=True)
+        self.last_workdir = workdir
+
+        # Les processus relisent la base de départ depuis le fichier : valider une session ouverte
+        if isinstance(self.base_db, DatabaseSession):
+            connect(self.base_db).commit()
+
+        conn = connect(self.results_db)
+        start = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(run_scenario, self.base_db, workdir, scenario, self.existing_data,
+                                           quiet, self.in_memory): scenario
+                           for scenario in scenarios}
+
+                for done, future in enumerate(as_completed(futures), start=1):
+                    scenario = futures[future]
+                    result = future.result()
+                    self._store(conn, scenario, result)
+                    status = "terminé" if result["status"] == "ok" else f"échec ({result['error']})"
+                    print(f"[{done}/{len(scenarios)}] {scenario['name']} {status} "
+                          f"- simulation {result.get('run_time', 0):.1f} s, total {result['total_time']:.1f} s")
+                    if not self.keep_databases and not self.in_memory:
+                        scenario_db = os.path.join(workdir, f"{scenario['name']}.db")
+                        if os.path.exists(scenario_db):
+                            os.remove(scenario_db)
+
+            print(f"{len(scenarios)} scénarios exécutés en {time.perf_counter() - start:.1f} s")
+            if self.keep_databases and not self.in_memory:
+                print(f"Bases des scénarios conservées dans {workdir}")
+            placeholders = ", ".join("?" * len(names))
+            return pd.read_sql_query(f"SELECT * FROM Scenario_Runs WHERE SCENARIO IN ({placeholders})", conn, params=names)
+        finally:
+            conn.close()
+            if temporary_dir is not None:
+                temporary_dir.cleanup()
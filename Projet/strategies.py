@@ -1,20 +1,40 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import sqlite3
+from db_session import connect
 from scipy.optimize import minimize
 import schedule
 import time
-from base_update import BaseUpdate
+from base_update import BaseUpdate, IndexedFeed
+from price_cube import PriceCube
+from monte_carlo import MonteCarloEngine
 
 class RunAllStrat:
-    def __init__(self, db_file, start_date, end_date, tickers, existing_data=None):
-        self.db_file = db_file
+    def __init__(self, db_file, start_date, end_date, tickers, existing_data=None, price_cube=None,
+                 mc_paths=30, seed=None, low_risk_mode="random"):
+        self.db_file = db_file  # Chemin de la base ou DatabaseSession partagée
         self.start_date = datetime.strptime(start_date, "%d/%m/%Y")
         self.end_date = datetime.strptime(end_date, "%d/%m/%Y")
         self.tickers = tickers
         self.stop_flag = False  # Ajouter un flag pour arrêter proprement
         self.existing_data = existing_data
+        # Flux indexé par date une seule fois, découpé chaque semaine par recherche binaire
+        self.indexed_feed = IndexedFeed(existing_data) if existing_data is not None else None
+        # Cube de prix partagé par les stratégies (chargé au début de run() si absent)
+        self.price_cube = price_cube
+        # Nombre de chemins Monte Carlo de strategy_three et générateur aléatoire (seed reproductible)
+        self.mc_paths = mc_paths
+        self.rng = np.random.default_rng(seed)
+        # Allocation LOW_RISK : "random" (recherche aléatoire) ou "optimizer" (optimisation sous contraintes)
+        if low_risk_mode not in ("random", "optimizer"):
+            raise ValueError("low_risk_mode doit être 'random' ou 'optimizer'.")
+        self.low_risk_mode = low_risk_mode
+        self.low_risk_weights = None  # Poids de la dernière solution de l'optimiseur (warm start)
+        self.optimizer_reports = []
+        # Signaux de strategy_one précalculés par run()
+        self.strategy_one_signals = None
+        # Exception ayant interrompu run() (None si la simulation est allée à son terme)
+        self.error = None
         
 
     def update_products_for_last_week(self, simulation_date):
@@ -38,9 +58,10 @@ class RunAllStrat:
             start_date=week_start_str,
             end_date=week_end_str,
             db_file=self.db_file,
-            existing_data=self.existing_data
+            existing_data=self.indexed_feed
         )
-        updater.update_products()
+        # Upsert : la semaine mise à jour peut recouvrir des prix déjà stockés
+        updater.update_products(bulk=True)
 
     def update_strategy(self, simulation_date):
         self.update_products_for_last_week(simulation_date)
@@ -49,25 +70,47 @@ class RunAllStrat:
         self.strategy_two(simulation_date)
         self.strategy_three(simulation_date)
 
+    LOW_TURNOVER_TICKERS = ["BTC-USD", "ETH-USD"]
+
     def strategy_one(self, simulation_date):
         print("Running breakout weekly LOW_TURNOVER strategy...")
 
-        conn = sqlite3.connect(self.db_file)
-        tickers = ["BTC-USD", "ETH-USD"]
+        # Signaux précalculés par run() : rejouer la semaine sans requête de prix
+        if self.strategy_one_signals is not None:
+            date = pd.Timestamp(simulation_date).normalize()
+            if date in self.strategy_one_signals.index:
+                self.replay_strategy_one(simulation_date)
+                return
+
+        conn = connect(self.db_file)
+        tickers = self.LOW_TURNOVER_TICKERS
 
         # 🔹 1. Récupérer les données de prix (20 derniers jours)
-        price_data = {}
+        signals = []
         for ticker in tickers:
-            df = pd.read_sql_query("""
-                SELECT IMPORT_DATE, PRICE FROM Products
-                WHERE TICKER = ? ORDER BY IMPORT_DATE DESC LIMIT 20
-            """, conn, params=(ticker,))
+            if self.price_cube is not None:
+                history = self.price_cube.history(ticker, simulation_date, 20)
+                df = pd.DataFrame({'IMPORT_DATE': history.index, 'PRICE': history.to_numpy()})
+            else:
+                df = pd.read_sql_query("""
+                    SELECT IMPORT_DATE, PRICE FROM Products
+                    WHERE TICKER = ? ORDER BY IMPORT_DATE DESC LIMIT 20
+                """, conn, params=(ticker,))
             if not df.empty:
-                df['IMPORT_DATE'] = pd.to_datetime(df['IMPORT_DATE'], dayfirst=True)
+                df['IMPORT_DATE'] = pd.to_datetime(df['IMPORT_DATE'], format='%Y-%m-%d')
                 df.sort_values("IMPORT_DATE", inplace=True)
-                price_data[ticker] = df
-
-        if len(price_data) < 2:
+                last_week = df.iloc[-8:-1]  # 7 jours avant
+                signals.append({
+                    'ticker': ticker,
+                    'n_obs': len(df),
+                    'last_price': df['PRICE'].iloc[-1],
+                    'first_price': df['PRICE'].iloc[0],
+                    'ma20': df['PRICE'].rolling(window=20).mean().iloc[-1],
+                    'high_last_week': last_week['PRICE'].max(),
+                    'low_last_week': last_week['PRICE'].min(),
+                })
+
+        if len(signals) < 2:
             print("⚠️ Pas assez de données pour les tickers.")
             conn.close()
             return
@@ -80,15 +123,7 @@ class RunAllStrat:
         cash_available = float(cash_df['QUANTITY'].iloc[0]) if not cash_df.empty else 0
 
         # 🔹 3. Récupérer nombre de deals effectués ce mois-ci
-        current_month = simulation_date.strftime("%Y-%m")
-        deals_df = pd.read_sql_query("""
-            SELECT COUNT(*) as count FROM Deals
-            WHERE RISK_TYPE = 'LOW_TURNOVER' AND strftime('%Y-%m', EXECUTION_DATE) = ?
-        """, conn, params=(current_month,))
-        deals_this_month = int(deals_df['count'].iloc[0]) if not deals_df.empty else 0
-        remaining_deals = 2 - deals_this_month
-
-        decisions = []
+        remaining_deals = 2 - self.monthly_deal_count(conn, 'LOW_TURNOVER', simulation_date)
 
         # ✅ Pas de trades si limite atteinte
         if remaining_deals <= 0:
@@ -96,34 +131,50 @@ class RunAllStrat:
             conn.close()
             return
 
+        decisions = self.strategy_one_decisions(signals, cash_available, remaining_deals)
+        self.record_strategy_one_deals(conn, simulation_date, decisions)
+        conn.close()
+
+    def strategy_one_decisions(self, signals, cash_available, remaining_deals):
+        """
+        Décisions breakout / fallback de strategy_one pour une semaine.
+
+        Args:
+            signals (list): Un dict par ticker ayant des prix (n_obs, last_price, first_price, ma20,
+                            high_last_week, low_last_week), dans l'ordre de LOW_TURNOVER_TICKERS
+            cash_available (float): Cash LOW_TURNOVER disponible
+            remaining_deals (int): Deals encore autorisés ce mois-ci
+
+        Returns:
+            list: Décisions {'ticker', 'action', 'price'}
+        """
+        decisions = []
+
         # 🔹 4. Appliquer la stratégie breakout inversée
-        for ticker, df in price_data.items():
-            if len(df) < 15:
+        for signal in signals:
+            if signal['n_obs'] < 15:
                 continue
 
-            last_price = df['PRICE'].iloc[-1]
-            ma20 = df['PRICE'].rolling(window=20).mean().iloc[-1]
-            last_week = df.iloc[-8:-1]  # 7 jours avant
-            high_last_week = last_week['PRICE'].max()
-            low_last_week = last_week['PRICE'].min()
+            last_price = signal['last_price']
+            ma20 = signal['ma20']
 
             # ✅ Signal d'achat inversé (prix sous plus bas de la semaine + sous MA20)
-            if last_price < low_last_week and last_price < ma20 and remaining_deals > 0 and cash_available > last_price:
-                decisions.append({'ticker': ticker, 'action': 'Buy', 'price': last_price})
+            if last_price < signal['low_last_week'] and last_price < ma20 and remaining_deals > 0 and cash_available > last_price:
+                decisions.append({'ticker': signal['ticker'], 'action': 'Buy', 'price': last_price})
                 remaining_deals -= 1
                 cash_available -= last_price
 
             # ✅ Signal de vente inversé (prix au-dessus plus haut + au-dessus MA20)
-            elif last_price > high_last_week and last_price > ma20 and remaining_deals > 0:
-                decisions.append({'ticker': ticker, 'action': 'Sell', 'price': last_price})
+            elif last_price > signal['high_last_week'] and last_price > ma20 and remaining_deals > 0:
+                decisions.append({'ticker': signal['ticker'], 'action': 'Sell', 'price': last_price})
                 remaining_deals -= 1
 
         # 🔹 5. Fallback : stratégie basée sur performance
         if len(decisions) < 2 and remaining_deals >= 2:
             performances = []
-            for ticker, df in price_data.items():
-                rendement = (df['PRICE'].iloc[-1] - df['PRICE'].iloc[0]) / df['PRICE'].iloc[0]
-                performances.append((ticker, rendement, df['PRICE'].iloc[-1]))
+            for signal in signals:
+                rendement = (signal['last_price'] - signal['first_price']) / signal['first_price']
+                performances.append((signal['ticker'], rendement, signal['last_price']))
 
             sorted_perf = sorted(performances, key=lambda x: x[1])  # tri croissant
 
@@ -135,6 +186,31 @@ class RunAllStrat:
                 decisions.append({'ticker': sell_candidate[0], 'action': 'Sell', 'price': sell_candidate[2]})
                 remaining_deals -= 2
 
+        return decisions
+
+    def monthly_deal_count(self, conn, risk_type, simulation_date):
+        """
+        Nombre de deals du portefeuille sur le mois de simulation_date, lu dans le registre Trading_Limits,
+        ou compté dans Deals pour une base pas encore migrée (schéma antérieur à la migration 6).
+        """
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= 6:
+            row = conn.execute("""
+                SELECT DEAL_COUNT FROM Trading_Limits
+                WHERE RISK_TYPE = ? AND PERIOD = ?
+            """, (risk_type, simulation_date.strftime("%Y-%m"))).fetchone()
+            return int(row[0]) if row else 0
+
+        # (intervalle de dates plutôt que strftime, pour utiliser l'index (RISK_TYPE, EXECUTION_DATE))
+        month_start = simulation_date.replace(day=1)
+        next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+        row = conn.execute("""
+            SELECT COUNT(*) FROM Deals
+            WHERE RISK_TYPE = ? AND EXECUTION_DATE >= ? AND EXECUTION_DATE < ?
+        """, (risk_type, month_start.strftime("%Y-%m-%d"), next_month_start.strftime("%Y-%m-%d"))).fetchone()
+        return int(row[0])
+
+    def record_strategy_one_deals(self, conn, simulation_date, decisions):
+        """Enregistre les décisions de strategy_one dans Deals."""
         # 🔹 6. Exécution des décisions (Deals)
         for decision in decisions:
             conn.execute("""
@@ -151,7 +227,6 @@ class RunAllStrat:
             ))
 
         conn.commit()
-        conn.close()
 
         if decisions:
             print(f"✅ {len(decisions)} deal(s) exécuté(s) pour LOW_TURNOVER :")
@@ -160,6 +235,84 @@ class RunAllStrat:
         else:
             print("ℹ️ Aucune condition remplie pour un breakout cette semaine.")
 
+    def precompute_strategy_one_signals(self, dates):
+        """
+        Calcule en une passe les signaux de strategy_one pour toutes les dates de simulation.
+
+        Pour chaque date et chaque ticker, la fenêtre est celle du chemin hebdomadaire : les 20
+        dernières observations strictement avant la date. MA20 est calculée avec le même rolling
+        pandas sur chaque fenêtre (une colonne par date), donc bit à bit identique.
+
+        Args:
+            dates (list): Dates de simulation (lundis)
+
+        Returns:
+            pandas.DataFrame: Signaux indexés par DATE, une ligne par ticker (TICKER, N_OBS, LAST_PRICE,
+                              FIRST_PRICE, MA20, HIGH_LAST_WEEK, LOW_LAST_WEEK ; N_OBS = 0 sans donnée)
+        """
+        dates = pd.DatetimeIndex(dates).normalize()
+        offsets = np.arange(-20, 0)
+        frames = []
+        for ticker in self.LOW_TURNOVER_TICKERS:
+            prices, stops = self.price_cube.observations(ticker, dates)
+            n_obs = np.minimum(stops, 20)
+
+            # Fenêtres (20, nb_dates) des 20 dernières observations, complétées par NaN au début
+            padded = np.concatenate([[np.nan], prices])
+            windows = padded[np.maximum(stops + offsets[:, None] + 1, 0)]
+            last_week = pd.DataFrame(windows[12:19])  # iloc[-8:-1] : 7 jours avant
+
+            frames.append(pd.DataFrame({
+                "DATE": dates,
+                "TICKER": ticker,
+                "N_OBS": n_obs,
+                "LAST_PRICE": windows[-1],
+                "FIRST_PRICE": windows[20 - np.maximum(n_obs, 1), np.arange(len(dates))],
+                "MA20": pd.DataFrame(windows).rolling(window=20).mean().iloc[-1].to_numpy(),
+                "HIGH_LAST_WEEK": last_week.max().to_numpy(),
+                "LOW_LAST_WEEK": last_week.min().to_numpy(),
+            }))
+        return pd.concat(frames, ignore_index=True).sort_values("DATE", kind="stable").set_index("DATE")
+
+    def replay_strategy_one(self, simulation_date):
+        """
+        Applique les signaux précalculés de strategy_one pour une date : limite mensuelle de 2 deals
+        (registre Trading_Limits) et contrôle du cash, relu à chaque semaine comme dans strategy_one.
+        """
+        conn = connect(self.db_file)
+
+        week = self.strategy_one_signals.loc[[pd.Timestamp(simulation_date).normalize()]]
+        signals = [{
+            'ticker': row['TICKER'],
+            'n_obs': int(row['N_OBS']),
+            'last_price': row['LAST_PRICE'],
+            'first_price': row['FIRST_PRICE'],
+            'ma20': row['MA20'],
+            'high_last_week': row['HIGH_LAST_WEEK'],
+            'low_last_week': row['LOW_LAST_WEEK'],
+        } for row in week.to_dict("records") if row['N_OBS'] > 0]
+
+        if len(signals) < 2:
+            print("⚠️ Pas assez de données pour les tickers.")
+            conn.close()
+            return
+
+        cash_df = pd.read_sql_query("""
+            SELECT QUANTITY FROM Portfolios
+            WHERE RISK_TYPE = 'LOW_TURNOVER' AND TICKER = 'CASH'
+        """, conn)
+        cash_available = float(cash_df['QUANTITY'].iloc[0]) if not cash_df.empty else 0
+
+        remaining_deals = 2 - self.monthly_deal_count(conn, 'LOW_TURNOVER', simulation_date)
+        if remaining_deals <= 0:
+            print("🚫 Limite de transactions mensuelles atteinte pour LOW_TURNOVER.")
+            conn.close()
+            return
+
+        decisions = self.strategy_one_decisions(signals, cash_available, remaining_deals)
+        self.record_strategy_one_deals(conn, simulation_date, decisions)
+        conn.close()
+
 
     def strategy_two(self, simulation_date):
         print("Running HY_EQUITY strategy...")
@@ -168,7 +321,7 @@ class RunAllStrat:
             if isinstance(simulation_date, str):
                 simulation_date = datetime.strptime(simulation_date, "%d/%m/%Y")
             
-            conn = sqlite3.connect(self.db_file)
+            conn = connect(self.db_file)
             cursor = conn.cursor()
             risk_type = "HY_EQUITY"
 
@@ -189,6 +342,7 @@ class RunAllStrat:
                 SELECT p.TICKER, p.QUANTITY, p.ROWID, p.MANAGER_ID, p.SPOT_PRICE
                 FROM Portfolios p 
                 WHERE p.RISK_TYPE = ? AND p.TICKER != 'CASH'
+                ORDER BY p.INPUT_ID
             """
             cursor.execute(query, (risk_type,))
             for ticker, quantity, rowid, manager_id, spot_price in cursor.fetchall():
@@ -201,14 +355,17 @@ class RunAllStrat:
                 }
 
             # Étape 3 : Données depuis Products (seulement la dernière semaine)
-            df_sql = pd.read_sql_query("""
-                SELECT IMPORT_DATE, TICKER, PRICE 
-                FROM Products 
-                WHERE IMPORT_DATE >= date('now', '-7 days')
-                ORDER BY IMPORT_DATE, TICKER
-            """, conn)
-            
-            df_sql["IMPORT_DATE"] = pd.to_datetime(df_sql["IMPORT_DATE"], dayfirst=True)
+            if self.price_cube is not None:
+                df_sql = self.price_cube.as_of(simulation_date, lookback=timedelta(days=7)).to_frame()
+            else:
+                df_sql = pd.read_sql_query("""
+                    SELECT IMPORT_DATE, TICKER, PRICE 
+                    FROM Products 
+                    WHERE IMPORT_DATE >= date(?, '-7 days')
+                    ORDER BY IMPORT_DATE, TICKER
+                """, conn, params=(simulation_date.strftime("%Y-%m-%d"),))
+                
+                df_sql["IMPORT_DATE"] = pd.to_datetime(df_sql["IMPORT_DATE"], format='%Y-%m-%d')
 
             # Étape 4 : Calculer les variations et les prioriser
             variations = []
@@ -323,7 +480,7 @@ class RunAllStrat:
         num_days = 7
         target_volatility = 0.10
 
-        conn = sqlite3.connect(db_file)
+        conn = connect(db_file)
 
         # 🔹 Récupérer automatiquement le MANAGER_ID
         manager_query = """
@@ -353,6 +510,7 @@ class RunAllStrat:
         initial_query = """
             SELECT TICKER, QUANTITY FROM Portfolios
             WHERE RISK_TYPE = ? AND TICKER != 'CASH'
+            ORDER BY INPUT_ID
         """
         initial_df = pd.read_sql_query(initial_query, conn, params=(risk_type,))
         portfolio_tickers = initial_df['TICKER'].tolist()
@@ -365,12 +523,17 @@ class RunAllStrat:
         # 🔹 Récupérer les données de prix
         price_data = {}
         for ticker in portfolio_tickers:
+            if self.price_cube is not None:
+                history = self.price_cube.history(ticker, simulation_date)
+                if not history.empty:
+                    price_data[ticker] = history.rename('PRICE')
+                continue
             df = pd.read_sql_query("""
                 SELECT IMPORT_DATE, PRICE FROM Products
                 WHERE TICKER = ? ORDER BY IMPORT_DATE ASC
             """, conn, params=(ticker,))
             if not df.empty:
-                df['IMPORT_DATE'] = pd.to_datetime(df['IMPORT_DATE'], dayfirst=True)
+                df['IMPORT_DATE'] = pd.to_datetime(df['IMPORT_DATE'], format='%Y-%m-%d')
                 df.set_index('IMPORT_DATE', inplace=True)
                 price_data[ticker] = df['PRICE']
 
@@ -399,69 +562,64 @@ class RunAllStrat:
                 initial_quantities[i] = float(row['QUANTITY'].iloc[0])
         initial_cost = np.sum(initial_quantities * latest_prices)
 
-        # 🔹 Simulation Monte Carlo de la valeur future
-        def simulate_gain(q):
-            final_values = []
-            for _ in range(30):
-                future_prices = latest_prices.copy()
-                for _ in range(num_days):
-                    daily_returns = np.random.multivariate_normal(mean_returns, cov_matrix)
-                    future_prices *= np.exp(daily_returns)
-                final_values.append(np.sum(future_prices * q))
-            return np.mean(final_values)
-
-        # 🔹 Portefeuille actuel
-        initial_gain = simulate_gain(initial_quantities)
-        initial_result = {
-            'tickers': tickers,
-            'quantities': dict(zip(tickers, initial_quantities.astype(int))),
-            'volatility': np.sqrt(np.dot((initial_quantities / np.sum(initial_quantities)).T,
-                                        np.dot(cov_matrix * num_days, (initial_quantities / np.sum(initial_quantities))))),
-            'expected_return': np.sum(mean_returns * initial_quantities / np.sum(initial_quantities)) * num_days,
-            'total_cost': initial_cost,
-            'gain_or_loss': initial_gain - initial_cost,
-            'performance': 'gain' if initial_gain - initial_cost > 0 else 'loss'
-        }
-
-        best_result = initial_result
-
-        # 🔁 Simulations
-        for _ in range(num_simulations):
-            weights = np.random.random(nb_assets)
-            weights /= np.sum(weights)
-            candidate_quantities = np.floor((weights * max_budget) / latest_prices)
-
-            # ✅ Contraintes : vente max -10000 et achat max +150000
-            diff = candidate_quantities - initial_quantities
-            if any(diff < -10000) or any(diff > 150000):
-                continue
-
-            port_vol = np.sqrt(np.dot((candidate_quantities / np.sum(candidate_quantities)).T,
-                                    np.dot(cov_matrix * num_days, (candidate_quantities / np.sum(candidate_quantities)))))
-            total_cost = np.sum(candidate_quantities * latest_prices)
-
-            # ✅ Filtrer selon budget et volatilité cible
-            if port_vol <= target_volatility and total_cost <= max_budget:
-                future_value = simulate_gain(candidate_quantities)
-                gain_or_loss = future_value - total_cost
-
-                if gain_or_loss > best_result['gain_or_loss']:
-                    best_result = {
-                        'tickers': tickers,
-                        'quantities': dict(zip(tickers, candidate_quantities.astype(int))),
-                        'volatility': port_vol,
-                        'expected_return': np.sum(mean_returns * candidate_quantities / np.sum(candidate_quantities)) * num_days,
-                        'total_cost': total_cost,
-                        'gain_or_loss': gain_or_loss,
-                        'performance': 'gain' if gain_or_loss > 0 else 'loss'
-                    }
+        # 🔹 Moteur Monte Carlo vectorisé (un seul tirage pour tous les chemins et candidats)
+        engine = MonteCarloEngine(mean_returns, cov_matrix, latest_prices,
+                                  num_days=num_days, num_paths=self.mc_paths, seed=self.rng)
+
+        def portfolio_volatility(quantities):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                weights = quantities / quantities.sum(axis=-1, keepdims=True)
+                return np.sqrt(np.einsum('...i,ij,...j->...', weights, cov_matrix.values * num_days, weights))
+
+        def make_result(quantities, volatility, total_cost, gain_or_loss):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                expected_return = np.sum(mean_returns * quantities / np.sum(quantities)) * num_days
+            return {
+                'tickers': tickers,
+                'quantities': dict(zip(tickers, quantities.astype(int))),
+                'volatility': volatility,
+                'expected_return': expected_return,
+                'total_cost': total_cost,
+                'gain_or_loss': gain_or_loss,
+                'performance': 'gain' if gain_or_loss > 0 else 'loss'
+            }
+
+        if self.low_risk_mode == "optimizer":
+            # 🔹 Un seul candidat : la solution de l'optimisation sous contraintes
+            candidates = self.optimize_low_risk(tickers, mean_returns.values, cov_matrix.values, latest_prices,
+                                                initial_quantities, max_budget, num_days, target_volatility)
+            candidates = np.empty((0, nb_assets)) if candidates is None else candidates[np.newaxis, :]
+        else:
+            # 🔁 Tirage de tous les portefeuilles candidats
+            weights = self.rng.random((num_simulations, nb_assets))
+            weights /= weights.sum(axis=1, keepdims=True)
+            candidates = np.floor((weights * max_budget) / latest_prices)
+
+        # ✅ Contraintes : vente max -10000 et achat max +150000, budget et volatilité cible
+        diff = candidates - initial_quantities
+        port_vols = portfolio_volatility(candidates)
+        total_costs = candidates @ latest_prices
+        valid = (~((diff < -10000).any(axis=1) | (diff > 150000).any(axis=1))
+                 & (port_vols <= target_volatility) & (total_costs <= max_budget))
+        candidates, port_vols, total_costs = candidates[valid], port_vols[valid], total_costs[valid]
+
+        # 🔹 Valeur future du portefeuille actuel et des candidats en un seul produit matriciel
+        future_values = engine.expected_values(np.vstack([initial_quantities, candidates]))
+        initial_gain = future_values[0]
+        gains = future_values[1:] - total_costs
+
+        initial_result = make_result(initial_quantities, portfolio_volatility(initial_quantities),
+                                     initial_cost, initial_gain - initial_cost)
 
         # ⚠️ Si aucune meilleure solution, on ne change rien
-        if best_result == initial_result:
+        if len(gains) == 0 or gains.max() <= initial_result['gain_or_loss']:
             print("⚠️ Aucune stratégie optimale trouvée. Portefeuille conservé.")
             conn.close()
             return
 
+        best = int(np.argmax(gains))
+        best_result = make_result(candidates[best], port_vols[best], total_costs[best], gains[best])
+
         # 🔹 Mise à jour de la base : supprimer les lignes du portefeuille LOW_RISK
         cursor = conn.cursor()
         cursor.execute("DELETE FROM Portfolios WHERE RISK_TYPE = ?", (risk_type,))
@@ -508,10 +666,103 @@ class RunAllStrat:
         print(best_result)
 
 
+    def optimize_low_risk(self, tickers, mean_returns, cov_matrix, latest_prices, initial_quantities,
+                          max_budget, num_days=7, target_volatility=0.10):
+        """
+        Allocation LOW_RISK par optimisation sous contraintes (SLSQP) au lieu de la recherche aléatoire.
+
+        Maximise le gain espéré à num_days jours (espérance exacte du modèle log-normal simulé
+        par MonteCarloEngine) sous les contraintes de strategy_three : volatilité <= target_volatility,
+        coût total <= budget, ventes <= 10000 et achats <= 150000 par actif.
+        Les variables sont les fractions du budget investies dans chaque actif ; le point de départ
+        est la solution de la semaine précédente (ou le portefeuille actuel).
+
+        Returns:
+            numpy.ndarray: Quantités entières du portefeuille optimal, None si aucune solution
+        """
+        if max_budget <= 0:
+            return None
+
+        # Bornes des quantités converties en fractions du budget
+        lower_q = np.maximum(initial_quantities - 10000, 0)
+        upper_q = initial_quantities + 150000
+        value_per_unit = latest_prices / max_budget
+        bounds = list(zip(lower_q * value_per_unit, upper_q * value_per_unit))
+        if np.sum(lower_q * value_per_unit) > 1:
+            print("⚠️ Optimiseur : contraintes de vente incompatibles avec le budget.")
+            return None
+
+        # Gain espéré par unité de budget investie dans chaque actif
+        growth = np.exp(mean_returns * num_days + 0.5 * np.diag(cov_matrix) * num_days) - 1
+        cov_horizon = cov_matrix * num_days
+
+        def volatility(quantities):
+            weights = quantities / max(quantities.sum(), 1e-12)
+            return np.sqrt(weights @ cov_horizon @ weights)
+
+        def round_quantities(x):
+            return np.clip(np.floor(x / value_per_unit + 1e-9), lower_q, upper_q)
+
+        def feasible(quantities):
+            # Mêmes contraintes que le filtre des candidats de strategy_three
+            return (quantities.sum() > 0 and volatility(quantities) <= target_volatility
+                    and quantities @ latest_prices <= max_budget)
+
+        # Warm start : solution de la semaine précédente, sinon portefeuille actuel, sinon équipondéré
+        if self.low_risk_weights is not None and list(self.low_risk_weights.index) == list(tickers):
+            x0 = self.low_risk_weights.values.copy()
+        elif initial_quantities.sum() > 0:
+            x0 = initial_quantities * value_per_unit
+        else:
+            x0 = np.full(len(tickers), 1 / len(tickers))
+        x0 = np.clip(x0, *np.array(bounds).T)
+        if x0.sum() > 1:
+            x0 /= x0.sum()
+
+        # SLSQP converge sur les bornes (volatilité, budget) et l'arrondi à l'unité inférieure
+        # peut les franchir : on résout contre une marge, élargie tant que la solution arrondie
+        # ne passe pas le filtre des candidats
+        for margin in (1e-3, 1e-2, 5e-2):
+            vol_limit = (target_volatility * (1 - margin)) ** 2
+            start = time.perf_counter()
+            solution = minimize(
+                lambda x: -growth @ x, x0, jac=lambda x: -growth, method="SLSQP", bounds=bounds,
+                constraints=[{"type": "ineq", "fun": lambda x: 1 - margin - x.sum(),
+                              "jac": lambda x: -np.ones_like(x)},
+                             {"type": "ineq", "fun": lambda x: vol_limit - volatility(x / value_per_unit) ** 2}],
+                options={"maxiter": 200, "ftol": 1e-10},
+            )
+            report = {
+                "success": bool(solution.success),
+                "message": solution.message,
+                "iterations": int(solution.nit),
+                "evaluations": int(solution.nfev),
+                "solve_time": time.perf_counter() - start,
+                "margin": margin,
+            }
+            self.optimizer_reports.append(report)
+            print(f"Optimiseur LOW_RISK : {report['message']} ({report['iterations']} itérations, "
+                  f"{report['evaluations']} évaluations, {report['solve_time'] * 1000:.1f} ms)")
+            if not solution.success:
+                return None
+
+            quantities = round_quantities(solution.x)
+            if feasible(quantities):
+                self.low_risk_weights = pd.Series(solution.x, index=tickers)
+                return quantities
+
+        print("⚠️ Optimiseur : aucune solution arrondie ne respecte les contraintes.")
+        return None
+
     def run(self):
         try:
             print(f"\nDébut de la simulation historique du {self.start_date.strftime('%d/%m/%Y')} au {self.end_date.strftime('%d/%m/%Y')}")
             
+            if self.price_cube is None:
+                self.price_cube = PriceCube.from_db(self.db_file, feed=self.existing_data)
+            mondays = pd.date_range(self.start_date, self.end_date, freq="W-MON")
+            self.strategy_one_signals = self.precompute_strategy_one_signals(mondays)
+            
             current_date = self.start_date
             lundis_simulés = 0
             
@@ -528,6 +779,7 @@ class RunAllStrat:
             print(f"Période couverte : {self.start_date.strftime('%d/%m/%Y')} au {self.end_date.strftime('%d/%m/%Y')}")
                 
         except Exception as e:
+            self.error = e
             print(f"Erreur dans la simulation : {e}")
 
     def check_and_run_strategy(self, simulation_date):
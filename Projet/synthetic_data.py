@@ -0,0 +1,202 @@
+import zlib
+import numpy as np
+import pandas as pd
+
+EQUITY_SECTORS = ["Technology", "Healthcare", "Financial Services", "Consumer Cyclical", "Energy", "Industrials"]
+
+
+class SyntheticMarketData:
+    """
+    Offline, seeded provider of correlated synthetic prices.
+
+    Daily log-returns are drawn on every calendar day from `epoch`. Tickers ending in
+    "-USD" are crypto-like and quoted 7 days a week; the other tickers are quoted on
+    weekdays only (weekend returns accumulate into Monday). Two methods are available:
+
+    - "gbm": geometric Brownian motion whose shocks follow a factor model
+      (common market factor, crypto factor, sector factors plus an idiosyncratic part);
+    - "bootstrap": whole days of a historical log-return matrix are resampled, which
+      keeps the cross-correlation and fat tails of the source data.
+
+    Every ticker has its own generator seeded from crc32(ticker) and the seed, and the
+    common factors have their own, so the price of a ticker at a date does not depend
+    on the other requested tickers or on the requested window.
+
+    Can be passed to GetData as `transport`, or generate a main_data_frame-like frame
+    directly with frame().
+    """
+
+    def __init__(self, seed=0, method="gbm", epoch="2015-01-01", returns_source=None, chunk_size=128):
+        """
+        Initialize the provider.
+
+        Args:
+            seed (int): Global seed
+            method (str): "gbm" or "bootstrap"
+            epoch (str): First simulated day (YYYY-MM-DD); earlier dates cannot be generated
+            returns_source (pandas.DataFrame): Daily log-returns (dates x tickers) resampled by the
+                                               "bootstrap" method, e.g. np.log(prices).diff().dropna()
+            chunk_size (int): Number of tickers simulated together (bounds the memory use)
+
+        Raises:
+            ValueError: If the method is unknown or the bootstrap source is missing
+        """
+        if method not in ("gbm", "bootstrap"):
+            raise ValueError("method doit être 'gbm' ou 'bootstrap'.")
+        if method == "bootstrap" and (returns_source is None or returns_source.empty):
+            raise ValueError("La méthode 'bootstrap' nécessite returns_source.")
+        self.seed = seed
+        self.method = method
+        self.epoch = pd.Timestamp(epoch)
+        self.returns_source = None if returns_source is None else returns_source.to_numpy(dtype=float)
+        self.chunk_size = chunk_size
+        self.n_factors = 2 + len(EQUITY_SECTORS)
+
+    def _ticker_rng(self, ticker):
+        return np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+
+    def _parameters(self, ticker):
+        """Deterministic drift, volatility, factor loadings, initial price and sector of a ticker."""
+        rng = self._ticker_rng(ticker)
+        crypto = ticker.endswith("-USD")
+        sector = "Cryptocurrency" if crypto else EQUITY_SECTORS[zlib.crc32(ticker.encode()) % len(EQUITY_SECTORS)]
+        # Exposition au facteur de marché et au facteur crypto ou sectoriel, normalisées
+        loadings = np.array([rng.uniform(0.3, 1.0), rng.uniform(1.0, 2.0) if crypto else rng.uniform(0.5, 1.2)])
+        loadings /= np.linalg.norm(loadings)
+        if crypto:
+            volatility, drift = rng.uniform(0.5, 0.9), rng.uniform(-0.1, 0.4)
+        else:
+            volatility, drift = rng.uniform(0.15, 0.45), rng.uniform(-0.05, 0.15)
+        return {
+            "rng": rng,
+            "drift": drift,
+            "volatility": volatility,
+            "loadings": loadings,
+            "second_factor": 1 if crypto else 2 + EQUITY_SECTORS.index(sector),
+            "systematic_share": rng.uniform(0.2, 0.6),
+            "initial_price": rng.uniform(10, 500) * (100 if crypto else 1),
+            "sector": sector,
+            "crypto": crypto,
+        }
+
+    def _days(self, end):
+        """Calendar days from the epoch to end (excluded)."""
+        end = pd.Timestamp(end)
+        if end <= self.epoch:
+            return pd.DatetimeIndex([])
+        return pd.date_range(self.epoch, end - pd.Timedelta(days=1), freq="D")
+
+    def _common_draws(self, n_days):
+        """Draws shared by every ticker: factor shocks (gbm) or resampled source days (bootstrap)."""
+        if self.method == "gbm":
+            return np.random.default_rng([self.seed, 0]).standard_normal((n_days, self.n_factors))
+        return np.random.default_rng([self.seed, 1]).integers(0, len(self.returns_source), n_days)
+
+    def _log_prices(self, params, n_days, common):
+        """Log-price paths of shape (n_days, nb_tickers) for the parameters of a chunk of tickers."""
+        dt = 1 / 365
+        if self.method == "gbm":
+            # Facteurs communs de variance unitaire, combinés selon les expositions de chaque ticker
+            # (calcul élément par élément : le résultat d'un ticker ne dépend pas des autres tickers du lot)
+            loadings = np.array([p["loadings"] for p in params])
+            second = [p["second_factor"] for p in params]
+            systematic = common[:, [0]] * loadings[:, 0] + common[:, second] * loadings[:, 1]
+            share = np.array([p["systematic_share"] for p in params])
+            idiosyncratic = np.empty((len(params), n_days))
+            for k, p in enumerate(params):
+                p["rng"].standard_normal(out=idiosyncratic[k])
+            idiosyncratic = idiosyncratic.T
+            shocks = np.sqrt(share) * systematic + np.sqrt(1 - share) * idiosyncratic
+
+            volatility = np.array([p["volatility"] for p in params])
+            drift = np.array([p["drift"] for p in params])
+            returns = (drift - 0.5 * volatility ** 2) * dt + volatility * np.sqrt(dt) * shocks
+        else:
+            # Jours entiers tirés dans la source (mêmes tirages pour tous les tickers)
+            rows = common
+            columns = [zlib.crc32(p["name"].encode()) % self.returns_source.shape[1] for p in params]
+            returns = np.nan_to_num(self.returns_source[np.ix_(rows, columns)])
+
+        initial = np.log([p["initial_price"] for p in params])
+        return initial + np.cumsum(returns, axis=0)
+
+    def _generate(self, tickers, start, end):
+        """Yield (ticker, sector, dates, prices) for every ticker, quoted on its own calendar."""
+        days = self._days(end)
+        if pd.Timestamp(start) < self.epoch:
+            raise ValueError(f"Dates antérieures à l'epoch ({self.epoch.date()}) non disponibles.")
+        # Les rendements sont simulés depuis l'epoch, seuls les prix de la fenêtre sont calculés
+        first_day = int(days.searchsorted(pd.Timestamp(start)))
+        window_days = days[first_day:]
+        weekday = window_days.dayofweek < 5
+        common = self._common_draws(len(days))
+        for first in range(0, len(tickers), self.chunk_size):
+            chunk = list(tickers)[first:first + self.chunk_size]
+            params = [dict(self._parameters(ticker), name=ticker) for ticker in chunk]
+            if len(days):
+                prices = np.exp(self._log_prices(params, len(days), common)[first_day:])
+            else:
+                prices = np.empty((0, len(chunk)))
+            for j, p in enumerate(params):
+                if p["crypto"]:
+                    yield p["name"], p["sector"], window_days, prices[:, j]
+                else:
+                    yield p["name"], p["sector"], window_days[weekday], prices[weekday, j]
+
+    def download(self, tickers, start, end):
+        """
+        Close prices, with the same interface as YahooTransport.download.
+
+        Args:
+            tickers (list): Ticker symbols
+            start (str): Start date in YYYY-MM-DD format
+            end (str): End date in YYYY-MM-DD format (excluded)
+
+        Returns:
+            pandas.DataFrame: Close prices indexed by date, one column per ticker
+        """
+        series = {ticker: pd.Series(prices, index=dates) for ticker, _, dates, prices in self._generate(tickers, start, end)}
+        return pd.DataFrame(series)
+
+    def get_sector(self, ticker):
+        """Sector of a synthetic ticker."""
+        if ticker.endswith("-USD"):
+            return "Cryptocurrency"
+        return EQUITY_SECTORS[zlib.crc32(ticker.encode()) % len(EQUITY_SECTORS)]
+
+    def frame(self, tickers, start_date, end_date):
+        """
+        Long frame with the schema of GetData.main_data_frame, generated without GetData.
+
+        Args:
+            tickers (list): Ticker symbols
+            start_date (str): Start date in DD/MM/YYYY format
+            end_date (str): End date in DD/MM/YYYY format (excluded, like GetData)
+
+        Returns:
+            pandas.DataFrame: IMPORT_DATE (YYYY-MM-DD), PRICE, TICKER and SECTOR columns,
+                              grouped by ticker in date order
+        """
+        start = pd.to_datetime(start_date, format="%d/%m/%Y")
+        end = pd.to_datetime(end_date, format="%d/%m/%Y")
+        dates, prices, names, sectors, lengths = [], [], [], [], []
+        for ticker, sector, ticker_dates, ticker_prices in self._generate(tickers, start, end):
+            dates.append(ticker_dates.to_numpy())
+            prices.append(ticker_prices)
+            names.append(ticker)
+            sectors.append(sector)
+            lengths.append(len(ticker_dates))
+        if not names:
+            return pd.DataFrame(columns=["IMPORT_DATE", "PRICE", "TICKER", "SECTOR"])
+
+        # Dates formatées une seule fois sur le calendrier, puis indexées
+        all_dates = np.concatenate(dates)
+        calendar = pd.date_range(start, max(end - pd.Timedelta(days=1), start), freq="D")
+        labels = np.asarray(calendar.strftime("%Y-%m-%d"), dtype=object)
+        positions = ((all_dates - calendar[0].to_datetime64()) // np.timedelta64(1, "D")).astype(int)
+        return pd.DataFrame({
+            "IMPORT_DATE": labels[positions],
+            "PRICE": np.concatenate(prices),
+            "TICKER": np.repeat(np.asarray(names, dtype=object), lengths),
+            "SECTOR": np.repeat(np.asarray(sectors, dtype=object), lengths),
+        })
@@ -0,0 +1,189 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from base_builder import DatabaseBuilder
+from db_session import DatabaseSession
+
+
+def test_migration_converts_import_dates_to_iso(tmp_path):
+    db_file = str(tmp_path / "legacy.db")
+    DatabaseBuilder(db_file).create_tables()
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA user_version = 0")
+    conn.executemany("INSERT INTO Products (TICKER, SECTOR, PRICE, IMPORT_DATE) VALUES (?, 'Tech', 1.0, ?)",
+                     [("AAA", "02/01/2023"), ("AAA", "2023-01-03 00:00:00"), ("AAA", "2023-01-04")])
+    conn.commit()
+    conn.close()
+
+    DatabaseBuilder(db_file).migrate_database()
+
+    conn = sqlite3.connect(db_file)
+    dates = [row[0] for row in conn.execute("SELECT IMPORT_DATE FROM Products ORDER BY IMPORT_DATE")]
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    assert dates == ["2023-01-02", "2023-01-03", "2023-01-04"]
+    assert version == DatabaseBuilder.SCHEMA_VERSION
+
+
+INITIAL = {"AAA": 100, "BBB": 50}
+
+
+@pytest.fixture
+def session():
+    session = DatabaseSession(":memory:")
+    DatabaseBuilder(session).create_tables()
+    session.connection.executemany("""
+        INSERT INTO Portfolios (RISK_TYPE, TICKER, QUANTITY, MANAGER_ID, LAST_UPDATED, SPOT_PRICE)
+        VALUES ('LOW_RISK', ?, ?, 1, '2023-01-01', 10)
+    """, list(INITIAL.items()))
+    session.connection.commit()
+    yield session
+    session.close()
+
+
+def random_deals(seed=0, n=60):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2023-01-02", periods=25)
+    deals = [(str(dates[i].date()), str(rng.choice(["AAA", "BBB", "CCC"])), str(rng.choice(["Buy", "Sell"])),
+              int(rng.integers(1, 80))) for i in np.sort(rng.integers(0, len(dates), n))]
+    return deals
+
+
+def insert_deals(session, deals):
+    session.connection.executemany("""
+        INSERT INTO Deals (RISK_TYPE, TICKER, EXECUTION_DATE, MANAGER_ID, TRADE_TYPE, QUANTITY, BUY_PRICE)
+        VALUES ('LOW_RISK', ?, ?, 1, ?, ?, 10)
+    """, [(ticker, date, trade_type, qty) for date, ticker, trade_type, qty in deals])
+    session.connection.commit()
+
+
+def replay(deals, as_of):
+    # Rejoue tous les deals jusqu'à as_of inclus depuis la composition initiale
+    portfolio = dict(INITIAL)
+    for date, ticker, trade_type, qty in deals:
+        if date <= as_of:
+            change = qty if trade_type == "Buy" else -qty
+            portfolio[ticker] = max(portfolio.get(ticker, 0) + change, 0)
+    return {ticker: qty for ticker, qty in portfolio.items() if qty > 0}
+
+
+def history(session):
+    return session.connection.execute("""
+        SELECT TICKER, QUANTITY, DATE_SNAPSHOT, IS_CHECKPOINT FROM Portfolio_History
+        WHERE RISK_TYPE = 'LOW_RISK' ORDER BY DATE_SNAPSHOT, TICKER
+    """).fetchall()
+
+
+def test_full_rebuild_is_idempotent(session):
+    insert_deals(session, random_deals())
+    builder = DatabaseBuilder(session)
+
+    builder.rebuild_portfolio_history_by_risk_type("LOW_RISK")
+    first = history(session)
+    builder.rebuild_portfolio_history_by_risk_type("LOW_RISK")
+
+    assert first and history(session) == first
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_point_in_time_holdings_match_a_full_replay(session, incremental):
+    deals = random_deals(seed=1)
+    builder = DatabaseBuilder(session)
+    # Deals ajoutés par lots, avec une reconstruction après chaque lot
+    for batch in np.array_split(np.arange(len(deals)), 3):
+        insert_deals(session, [deals[i] for i in batch])
+        builder.rebuild_portfolio_history_by_risk_type("LOW_RISK", incremental=incremental, checkpoint_every=3)
+
+    for day in pd.bdate_range("2023-01-02", periods=27):
+        as_of = str(day.date())
+        holdings = builder.get_portfolio_holdings_as_of("LOW_RISK", day)
+        expected = replay(deals, as_of) if as_of >= deals[0][0] else {}
+        assert dict(zip(holdings["TICKER"], holdings["QUANTITY"])) == expected
+
+
+def test_bulk_client_loads_append_unique_emails(session):
+    builder = DatabaseBuilder(session)
+
+    assert builder.insert_clients_bulk(1000, seed=0, chunk_size=300) == 1000
+    assert builder.insert_clients_bulk(500, seed=0) == 500
+
+    count, emails = session.connection.execute("SELECT COUNT(*), COUNT(DISTINCT EMAIL) FROM Clients").fetchone()
+    assert count == emails == 1500
+
+
+def rule_based_risk_types(session):
+    builder = DatabaseBuilder(session)
+    clients = session.connection.execute("""
+        SELECT CLIENTS_ID, RISK_TYPE, INVESTMENT_AMOUNT, INVESTMENT_KNOWLEDGE, ASSET_PREFERENCE, INVESTMENT_GOAL, AGE
+        FROM Clients ORDER BY CLIENTS_ID
+    """).fetchall()
+    # Sans règle applicable, determine_risk_type tire au hasard : None
+    expected = {}
+    for client_id, risk_type, *profile in clients:
+        rules = {builder.determine_risk_type(*profile) for _ in range(20)}
+        expected[client_id] = rules.pop() if len(rules) == 1 else None
+    return expected
+
+
+@pytest.mark.parametrize("method", ["numpy", "sql"])
+def test_reclassification_applies_the_rules_once(session, method):
+    builder = DatabaseBuilder(session)
+    builder.insert_clients_bulk(2000, seed=0)
+    session.connection.execute("UPDATE Clients SET RISK_TYPE = 'HY_EQUITY' WHERE CLIENTS_ID % 3 = 0")
+    session.connection.commit()
+
+    builder.reclassify_clients(method=method, seed=0)
+    risk_types = dict(session.connection.execute("SELECT CLIENTS_ID, RISK_TYPE FROM Clients"))
+    expected = rule_based_risk_types(session)
+
+    assert all(risk_types[client_id] == rule for client_id, rule in expected.items() if rule is not None)
+    assert all(risk_types[client_id] in ("LOW_RISK", "LOW_TURNOVER") for client_id, rule in expected.items() if rule is None)
+    summary = builder.reclassify_clients(method=method, seed=1)
+    assert (summary.to_numpy().sum() - summary.to_numpy().trace()) == 0
+
+
+def test_bulk_client_load_restores_the_aum_triggers(session):
+    builder = DatabaseBuilder(session)
+    builder.insert_clients_bulk(1000, seed=0)
+    objects = session.connection.execute(
+        "SELECT name FROM sqlite_master WHERE tbl_name = 'Clients' AND sql IS NOT NULL AND type != 'table'"
+    ).fetchall()
+    assert {name for name, in objects} >= {"IDX_CLIENTS_RISK_AMOUNT", "TRG_CLIENTS_AUM_INSERT"}
+
+    session.connection.execute("DELETE FROM Clients WHERE CLIENTS_ID % 7 = 0")
+    aum = session.connection.execute("SELECT * FROM Risk_Type_AUM ORDER BY RISK_TYPE").fetchall()
+    expected = session.connection.execute("""
+        SELECT RISK_TYPE, COUNT(*), SUM(INVESTMENT_AMOUNT), MIN(INVESTMENT_AMOUNT), MAX(INVESTMENT_AMOUNT)
+        FROM Clients GROUP BY RISK_TYPE ORDER BY RISK_TYPE
+    """).fetchall()
+    assert [row[:2] for row in aum] == [row[:2] for row in expected]
+    assert all(abs(a - b) < 1e-6 * abs(b) for row, ref in zip(aum, expected) for a, b in zip(row[2:], ref[2:]))
+
+
+def test_trading_limits_follow_the_deals(session):
+    insert_deals(session, random_deals(seed=3, n=80))
+    session.connection.execute("UPDATE Deals SET EXECUTION_DATE = '2023-02-15' WHERE DEAL_ID % 4 = 0")
+    session.connection.execute("UPDATE Deals SET TRADE_TYPE = 'Buy' WHERE DEAL_ID % 5 = 0")
+    session.connection.execute("DELETE FROM Deals WHERE DEAL_ID % 7 = 0")
+    session.connection.commit()
+
+    ledger_query = """
+        SELECT RISK_TYPE, PERIOD, DEAL_COUNT, ROUND(BUY_NOTIONAL, 6), ROUND(SELL_NOTIONAL, 6), ROUND(TURNOVER, 6)
+        FROM Trading_Limits ORDER BY RISK_TYPE, PERIOD
+    """
+    ledger = session.connection.execute(ledger_query).fetchall()
+    expected = session.connection.execute("""
+        SELECT RISK_TYPE, substr(EXECUTION_DATE, 1, 7) AS PERIOD, COUNT(*),
+               ROUND(SUM(CASE WHEN TRADE_TYPE = 'Buy' THEN QUANTITY * BUY_PRICE ELSE 0 END), 6) AS BUYS,
+               ROUND(SUM(CASE WHEN TRADE_TYPE = 'Sell' THEN QUANTITY * BUY_PRICE ELSE 0 END), 6) AS SELLS,
+               ROUND(MIN(SUM(CASE WHEN TRADE_TYPE = 'Buy' THEN QUANTITY * BUY_PRICE ELSE 0 END),
+                         SUM(CASE WHEN TRADE_TYPE = 'Sell' THEN QUANTITY * BUY_PRICE ELSE 0 END)), 6)
+        FROM Deals GROUP BY RISK_TYPE, PERIOD ORDER BY RISK_TYPE, PERIOD
+    """).fetchall()
+    assert ledger == expected
+
+    assert DatabaseBuilder(session).rebuild_trading_limits() == len(expected)
+    assert session.connection.execute(ledger_query).fetchall() == expected
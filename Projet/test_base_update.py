@@ -0,0 +1,68 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from base_builder import DatabaseBuilder
+from base_update import BaseUpdate, IndexedFeed
+
+
+@pytest.fixture
+def feed():
+    dates = pd.bdate_range("2023-01-02", periods=10).strftime("%Y-%m-%d")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame([(date, ticker, "Tech", float(rng.uniform(10, 100)))
+                       for date in dates for ticker in ["AAA", "BBB", "CCC"]],
+                      columns=["IMPORT_DATE", "TICKER", "SECTOR", "PRICE"])
+    df.loc[4, "PRICE"] = np.nan
+    df.loc[7, "PRICE"] = -1.0
+    return df
+
+
+def products(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("SELECT TICKER, SECTOR, PRICE, IMPORT_DATE FROM Products ORDER BY TICKER, IMPORT_DATE").fetchall()
+    finally:
+        conn.close()
+
+
+def update(db_file, feed, bulk):
+    return BaseUpdate(["AAA", "BBB", "CCC"], "01/01/2023", "31/01/2023", db_file, feed).update_products(bulk=bulk)
+
+
+def test_bulk_upsert_matches_row_by_row(tmp_path, feed):
+    bulk_db, row_db = str(tmp_path / "bulk.db"), str(tmp_path / "row.db")
+    for db_file in (bulk_db, row_db):
+        DatabaseBuilder(db_file).create_tables()
+
+    bulk_counts = update(bulk_db, feed, bulk=True)
+    row_counts = update(row_db, feed, bulk=False)
+
+    assert bulk_counts == row_counts == {"inserted": 28, "updated": 0, "skipped": 2}
+    assert products(bulk_db) == products(row_db)
+
+
+def test_bulk_upsert_is_idempotent(tmp_path, feed):
+    db_file = str(tmp_path / "bulk.db")
+    DatabaseBuilder(db_file).create_tables()
+    update(db_file, feed, bulk=True)
+    first = products(db_file)
+
+    assert update(db_file, feed, bulk=True) == {"inserted": 0, "updated": 0, "skipped": 30}
+    assert products(db_file) == first
+
+
+@pytest.mark.parametrize("date_format", ["%Y-%m-%d", "%d/%m/%Y", None])
+def test_indexed_feed_windows_match_a_pandas_filter(feed, date_format):
+    shuffled = feed.sample(frac=1, random_state=0).reset_index(drop=True)
+    dates = pd.to_datetime(shuffled["IMPORT_DATE"])
+    raw = shuffled.assign(IMPORT_DATE=dates if date_format is None else dates.dt.strftime(date_format))
+    indexed = IndexedFeed(raw)
+
+    for start in pd.date_range("2023-01-01", "2023-01-20"):
+        end = start + pd.Timedelta(days=6)
+        expected = shuffled[(dates >= start) & (dates <= end)]
+        window = indexed.window(start, end)
+        pd.testing.assert_frame_equal(window.reset_index(drop=True), expected.reset_index(drop=True))
@@ -0,0 +1,118 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from data_collector import GetData, OutlierRemover, SqlPriceReader
+from price_cache import PriceCache
+
+TICKERS = ["AAA", "BBB", "CCC-USD"]
+
+
+class FakeTransport:
+    """Transport déterministe : BBB a des prix manquants, CCC-USD cote aussi le week-end."""
+
+    def __init__(self):
+        self.requests = []
+
+    def download(self, tickers, start, end):
+        self.requests.append((tuple(tickers), start, end))
+        close = {}
+        for ticker in tickers:
+            index = (pd.date_range(start, end, inclusive="left") if ticker.endswith("-USD")
+                     else pd.bdate_range(start, end, inclusive="left"))
+            series = pd.Series(100 + (pd.Index(index).dayofyear % 17).to_numpy(dtype=float), index=index)
+            if ticker == "BBB":
+                series.iloc[::5] = np.nan
+            close[ticker] = series
+        return pd.DataFrame(close)
+
+    def get_sector(self, ticker):
+        return "Tech"
+
+
+def sorted_frame(df):
+    return df.sort_values(["TICKER", "IMPORT_DATE"]).reset_index(drop=True)[["IMPORT_DATE", "TICKER", "SECTOR", "PRICE"]]
+
+
+def test_concurrent_fetch_matches_the_sequential_fetch():
+    sequential = GetData(TICKERS, "01/01/2023", "01/03/2023", transport=FakeTransport()).main_data_frame()
+    concurrent = GetData(TICKERS, "01/01/2023", "01/03/2023", transport=FakeTransport()).main_data_frame(
+        concurrent=True, max_workers=2, batch_size=2)
+
+    assert not sequential["PRICE"].isna().any()
+    pd.testing.assert_frame_equal(sorted_frame(sequential), sorted_frame(concurrent))
+
+
+def test_cached_fetch_only_downloads_the_missing_range(tmp_path):
+    cache = PriceCache(str(tmp_path / "cache"))
+    transport = FakeTransport()
+    first = GetData(["AAA"], "01/01/2023", "01/02/2023", transport=transport, cache=cache).main_data_frame()
+    transport.requests.clear()
+    second = GetData(["AAA"], "01/01/2023", "01/03/2023", transport=transport, cache=cache).main_data_frame()
+
+    assert transport.requests == [(("AAA",), "2023-02-01", "2023-03-01")]
+    uncached = GetData(["AAA"], "01/01/2023", "01/03/2023", transport=FakeTransport()).main_data_frame()
+    pd.testing.assert_frame_equal(sorted_frame(second), sorted_frame(uncached))
+    assert len(first) < len(second)
+
+
+def test_sql_price_reader_matches_a_pivot_of_products(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "products.db")
+    frame = GetData(TICKERS, "01/01/2023", "01/04/2023", transport=FakeTransport()).main_data_frame()
+    conn = sqlite3.connect(db_file)
+    frame.to_sql("Products", conn, index=False)
+    conn.close()
+    # Plusieurs requêtes par lecture
+    monkeypatch.setattr(SqlPriceReader, "MAX_TICKERS_PER_QUERY", 2)
+
+    with SqlPriceReader(db_file, dtype=np.float64) as reader:
+        matrix = reader.read(TICKERS + ["ZZZ"], "2023-01-15", "2023-03-10")
+        chunks = pd.concat(reader.iter_chunks(TICKERS + ["ZZZ"], "2023-01-15", "2023-03-10", chunk_days=10))
+
+    window = frame[(frame["IMPORT_DATE"] >= "2023-01-15") & (frame["IMPORT_DATE"] <= "2023-03-10")]
+    expected = (window.pivot(index="IMPORT_DATE", columns="TICKER", values="PRICE")
+                      .reindex(columns=TICKERS + ["ZZZ"]))
+    expected.index = pd.DatetimeIndex(pd.to_datetime(expected.index), name="IMPORT_DATE")
+    expected.columns.name = None
+    pd.testing.assert_frame_equal(matrix, expected)
+    pd.testing.assert_frame_equal(chunks, expected)
+
+
+def price_feed(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2023-01-02", periods=120).strftime("%Y-%m-%d")
+    frames = []
+    for ticker, level in [("AAA", 10.0), ("BBB", 1000.0)]:
+        prices = level * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        prices[[30, 75]] *= 3  # pics isolés
+        frames.append(pd.DataFrame({"IMPORT_DATE": dates, "PRICE": prices, "TICKER": ticker}))
+    return pd.concat(frames, ignore_index=True).sort_values("IMPORT_DATE", kind="stable").reset_index(drop=True)
+
+
+def test_grouped_zscore_flags_spikes_hidden_by_the_pooled_statistics():
+    feed = price_feed()
+    small = feed[feed["TICKER"] == "AAA"]
+    spikes = set(small.index[small["PRICE"] > 2 * small["PRICE"].median()])
+
+    pooled = OutlierRemover(method="zscore").remove_outliers(feed)
+    grouped = OutlierRemover(method="zscore", group_by="TICKER").remove_outliers(feed)
+
+    # Noyés dans la dispersion de BBB, les pics de AAA ne ressortent qu'avec les statistiques par ticker
+    assert len(spikes) == 2
+    assert spikes <= set(pooled.index)
+    assert not spikes & set(grouped.index)
+
+
+def test_hampel_matches_a_pandas_rolling_filter_and_streams_identically():
+    feed = price_feed()
+    remover = OutlierRemover(method="hampel", threshold=3, group_by="TICKER", window=11)
+
+    rolling = feed.groupby("TICKER")["PRICE"].rolling(11, min_periods=6)
+    median = rolling.median().droplevel(0).sort_index()
+    mad = 1.4826 * rolling.apply(lambda w: np.median(np.abs(w - np.median(w))), raw=True).droplevel(0).sort_index()
+    expected = (mad > 0) & ((feed["PRICE"] - median).abs() > 3 * mad)
+    np.testing.assert_array_equal(remover.outlier_mask(feed), expected.to_numpy())
+
+    streamed = pd.concat([remover.filter_stream(feed.iloc[start:start + 37]) for start in range(0, len(feed), 37)])
+    pd.testing.assert_frame_equal(streamed, remover.remove_outliers(feed))
@@ -0,0 +1,74 @@
+import pickle
+import sqlite3
+
+import pytest
+
+from db_session import DatabaseSession, connect
+from metadata_store import TickerMetadataStore
+
+
+@pytest.fixture
+def session(tmp_path):
+    session = DatabaseSession(str(tmp_path / "session.db"))
+    session.connection.execute("CREATE TABLE T (X INTEGER)")
+    yield session
+    session.close()
+
+
+def values(session):
+    return [x for x, in connect(session).execute("SELECT X FROM T ORDER BY X")]
+
+
+def test_connect_returns_the_shared_connection(session):
+    conn = connect(session)
+    conn.close()
+
+    assert connect(session) is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_commits_inside_a_transaction_are_deferred(session):
+    with pytest.raises(ValueError):
+        with session.transaction() as conn:
+            conn.execute("INSERT INTO T VALUES (1)")
+            conn.commit()
+            raise ValueError("boom")
+
+    assert values(session) == []
+
+    with session.transaction() as conn:
+        conn.execute("INSERT INTO T VALUES (2)")
+        with session.transaction() as inner:
+            inner.execute("INSERT INTO T VALUES (3)")
+    assert values(session) == [2, 3]
+
+
+def test_rollback_inside_a_transaction_rolls_back_the_whole_block(session):
+    with pytest.raises(sqlite3.OperationalError):
+        with session.transaction() as conn:
+            conn.execute("INSERT INTO T VALUES (1)")
+            conn.rollback()
+            conn.execute("INSERT INTO T VALUES (2)")
+            conn.commit()
+
+    assert values(session) == []
+
+
+def test_session_is_reopened_after_pickling(session):
+    connect(session).execute("INSERT INTO T VALUES (1)")
+    connect(session).commit()
+    copy = pickle.loads(pickle.dumps(session))
+
+    assert values(copy) == [1]
+    copy.close()
+
+
+def test_metadata_refresh_of_an_in_memory_session_runs_synchronously():
+    class Transport:
+        def get_sector(self, ticker):
+            return "Tech"
+
+    with DatabaseSession(":memory:") as session:
+        store = TickerMetadataStore(session, transport=Transport())
+        assert store.refresh_async(["AAA"]) is None
+        assert store.get_sectors(["AAA"]) == {"AAA": "Tech"}
@@ -0,0 +1,65 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from metadata_store import TickerMetadataStore
+
+
+class SectorTransport:
+    def __init__(self, sectors):
+        self.sectors = sectors
+        self.calls = []
+
+    def get_sector(self, ticker):
+        self.calls.append(ticker)
+        if ticker not in self.sectors:
+            raise KeyError(ticker)
+        return self.sectors[ticker]
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "metadata.db")
+
+
+def test_sectors_are_fetched_once_then_read_from_the_table(db_file):
+    transport = SectorTransport({"AAA": "Tech", "BBB": "Energy"})
+    store = TickerMetadataStore(db_file, transport=transport)
+
+    assert store.get_sectors(["AAA", "BBB", "ZZZ"]) == {"AAA": "Tech", "BBB": "Energy", "ZZZ": "Unknown"}
+    transport.calls.clear()
+    assert store.get_sectors(["AAA", "BBB"]) == {"AAA": "Tech", "BBB": "Energy"}
+    assert transport.calls == []
+
+
+def test_stale_sectors_are_served_then_refreshed_in_the_background(db_file):
+    transport = SectorTransport({"AAA": "Tech"})
+    store = TickerMetadataStore(db_file, transport=transport, ttl_days=1)
+    store.get_sector("AAA")
+    old = (datetime.now() - timedelta(days=2)).isoformat(timespec="seconds")
+    conn = sqlite3.connect(db_file)
+    conn.execute("UPDATE Ticker_Metadata SET SECTOR = 'Old', UPDATED_AT = ?", (old,))
+    conn.commit()
+    conn.close()
+
+    assert store.stale_tickers() == ["AAA"]
+    assert store.get_sector("AAA") == "Old"
+    store._refresh_thread.join()
+    assert store.stale_tickers() == []
+    assert store.get_sector("AAA") == "Tech"
+
+
+def test_fill_products_sectors(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE Products (TICKER TEXT, SECTOR TEXT, PRICE REAL, IMPORT_DATE DATE)")
+    conn.executemany("INSERT INTO Products VALUES (?, 'Unknown', 1.0, '2023-01-02')", [("AAA",), ("BBB",)])
+    conn.commit()
+    conn.close()
+    store = TickerMetadataStore(db_file, transport=SectorTransport({"AAA": "Tech"}))
+    store.refresh(["AAA"])
+
+    assert store.fill_products_sectors() == 1
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT TICKER, SECTOR FROM Products ORDER BY TICKER").fetchall() == [("AAA", "Tech"), ("BBB", "Unknown")]
+    conn.close()
@@ -0,0 +1,39 @@
+import numpy as np
+
+from monte_carlo import MonteCarloEngine
+
+MEAN = np.array([0.001, 0.0005, -0.0002])
+COV = np.array([[4e-4, 1e-4, 0.0], [1e-4, 2.5e-4, 5e-5], [0.0, 5e-5, 1e-4]])
+PRICES = np.array([100.0, 50.0, 20.0])
+
+
+def test_simulated_log_returns_have_the_model_moments():
+    engine = MonteCarloEngine(MEAN, COV, PRICES, num_days=7, num_paths=200_000, seed=0)
+    log_returns = np.log(engine.simulate_final_prices() / PRICES)
+
+    np.testing.assert_allclose(log_returns.mean(axis=0), MEAN * 7, atol=3e-4)
+    np.testing.assert_allclose(np.cov(log_returns.T), COV * 7, atol=5e-5)
+
+
+def test_expected_values_converge_to_the_lognormal_mean():
+    engine = MonteCarloEngine(MEAN, COV, PRICES, num_days=7, num_paths=200_000, seed=1)
+    quantities = np.array([3.0, 0.0, 10.0])
+    exact = PRICES * np.exp(MEAN * 7 + 0.5 * np.diag(COV) * 7) @ quantities
+
+    assert abs(engine.expected_values(quantities) - exact) / exact < 2e-3
+
+
+def test_candidates_are_evaluated_on_the_same_paths():
+    candidates = np.array([[1.0, 2.0, 3.0], [0.0, 5.0, 1.0], [2.0, 0.0, 0.0]])
+    batched = MonteCarloEngine(MEAN, COV, PRICES, num_paths=50, seed=7).expected_values(candidates)
+    one_by_one = [MonteCarloEngine(MEAN, COV, PRICES, num_paths=50, seed=7).expected_values(q) for q in candidates]
+
+    np.testing.assert_allclose(batched, one_by_one)
+
+
+def test_singular_covariance_is_accepted():
+    singular = np.array([[1e-4, 1e-4], [1e-4, 1e-4]])
+    engine = MonteCarloEngine([0.0, 0.0], singular, [10.0, 10.0], num_paths=1000, seed=0)
+    prices = engine.simulate_final_prices()
+
+    np.testing.assert_allclose(prices[:, 0], prices[:, 1])
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from db_session import DatabaseSession
+from online_metrics import MetricsAccumulator, OnlineMetrics
+from Performance import PortfolioAnalyzer
+
+
+@pytest.fixture
+def nav():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2023-01-02", "2023-12-29")
+    dates = dates[(dates < "2023-04-10") | (dates > "2023-04-23")]  # deux semaines sans cotation
+    values = {risk_type: 1e6 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, len(dates))))
+              for risk_type in ["HY_EQUITY", "LOW_RISK"]}
+    return pd.DataFrame(values, index=pd.DatetimeIndex(dates, name="DATE"))
+
+
+def batch_metrics(nav):
+    analyzer = PortfolioAnalyzer(":memory:")
+    analyzer.performance_df = nav
+    return analyzer.compute_portfolio_metrics()
+
+
+def test_online_metrics_match_the_batch_computation(nav):
+    expected = batch_metrics(nav)
+
+    for risk_type in nav.columns:
+        online = OnlineMetrics()
+        for date, value in nav[risk_type].items():
+            online.update(date, value)
+        for metric, value in online.metrics().items():
+            assert value == pytest.approx(expected.loc[risk_type, metric], abs=0.005 + 1e-9)
+
+
+def test_incremental_updates_match_a_single_pass(nav):
+    with DatabaseSession(":memory:") as session:
+        accumulator = MetricsAccumulator(session)
+        accumulator.update(nav.iloc[:100])
+        incremental = accumulator.update(nav)
+        accumulator.reset()
+        single = accumulator.update(nav)
+
+    pd.testing.assert_frame_equal(incremental, single)
+    pd.testing.assert_frame_equal(single.astype(float), batch_metrics(nav).astype(float), atol=0.011)
+
+
+def test_changed_history_restarts_the_accumulator(nav):
+    with DatabaseSession(":memory:") as session:
+        accumulator = MetricsAccumulator(session)
+        accumulator.update(nav)
+        rebuilt = nav * 1.5
+        rebuilt.iloc[:50] *= 0.9
+        restarted = accumulator.update(rebuilt)
+
+    pd.testing.assert_frame_equal(restarted.astype(float), batch_metrics(rebuilt).astype(float), atol=0.011)
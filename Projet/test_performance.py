@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from base_builder import DatabaseBuilder
+from db_session import DatabaseSession
+from Performance import PortfolioAnalyzer
+
+
+@pytest.fixture
+def session():
+    session = DatabaseSession(":memory:")
+    DatabaseBuilder(session).create_tables()
+    yield session
+    session.close()
+
+
+def test_nav_uses_the_last_quantities_and_prices(session):
+    days = [str(day.date()) for day in pd.bdate_range("2023-01-02", periods=5)]
+    prices = [("AAA", 10.0, days[0]), ("AAA", 11.0, days[1]), ("AAA", 12.0, days[3]), ("AAA", 13.0, days[4])]
+    prices += [("BBB", 20.0 + i, day) for i, day in enumerate(days)]
+    session.connection.executemany("INSERT INTO Products (TICKER, SECTOR, PRICE, IMPORT_DATE) VALUES (?, 'Tech', ?, ?)", prices)
+    session.connection.executemany("INSERT INTO Portfolio_History (RISK_TYPE, TICKER, QUANTITY, DATE_SNAPSHOT) VALUES (?, ?, ?, ?)", [
+        ("LOW_RISK", "AAA", 10, days[0]), ("LOW_RISK", "CASH", 100, days[0]),
+        ("LOW_RISK", "AAA", 5, days[3]), ("LOW_RISK", "CASH", 200, days[3]),
+        ("HY_EQUITY", "BBB", 2, days[2]),
+    ])
+    session.connection.commit()
+
+    nav = PortfolioAnalyzer(session).compute_nav()
+
+    expected = pd.DataFrame({
+        "HY_EQUITY": [None, None, 44.0, 46.0, 48.0],
+        # AAA non coté le troisième jour : dernier prix connu
+        "LOW_RISK": [200.0, 210.0, 210.0, 260.0, 265.0],
+    }, index=pd.DatetimeIndex(days, name="DATE"))
+    expected.columns.name = "RISK_TYPE"
+    pd.testing.assert_frame_equal(nav, expected, check_freq=False)
+    assert PortfolioAnalyzer(session).compute_nav(include_cash=False)["LOW_RISK"].tolist() == [100.0, 110.0, 110.0, 60.0, 65.0]
+
+
+def test_empty_history_gives_an_empty_nav(session):
+    nav = PortfolioAnalyzer(session).compute_nav()
+    assert nav.empty
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_cache import PriceCache
+
+
+def prices(start, end):
+    index = pd.bdate_range(start, end, inclusive="left")
+    return pd.Series(np.linspace(100, 110, len(index)), index=index)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PriceCache(str(tmp_path / "cache"))
+
+
+def test_missing_ranges_only_returns_the_gaps(cache):
+    assert cache.missing_ranges("AAA", "2023-01-01", "2023-03-01") == [("2023-01-01", "2023-03-01")]
+
+    cache.put("AAA", prices("2023-01-01", "2023-01-15"), "Tech", "2023-01-01", "2023-01-15")
+    cache.put("AAA", prices("2023-02-01", "2023-02-10"), "Tech", "2023-02-01", "2023-02-10")
+
+    assert cache.missing_ranges("AAA", "2023-01-01", "2023-03-01") == [("2023-01-15", "2023-02-01"),
+                                                                      ("2023-02-10", "2023-03-01")]
+    assert cache.missing_ranges("AAA", "2023-01-03", "2023-01-10") == []
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_empty_download_is_recorded_as_covered(cache):
+    cache.put("AAA", pd.Series(dtype=float), None, "2023-01-07", "2023-01-09")
+
+    assert cache.missing_ranges("AAA", "2023-01-07", "2023-01-09") == []
+    assert cache.get("AAA", "2023-01-07", "2023-01-09").empty
+
+
+def test_get_returns_the_stored_prices(cache):
+    series = prices("2023-01-01", "2023-02-01")
+    cache.put("AAA", series, "Tech", "2023-01-01", "2023-02-01")
+
+    stored = cache.get("AAA", "2023-01-10", "2023-01-20")
+    expected = series["2023-01-10":"2023-01-19"]
+    np.testing.assert_allclose(stored["PRICE"], expected.to_numpy())
+    assert cache.sector("AAA") == "Tech"
+
+
+def test_size_eviction_drops_the_least_recently_used_ticker(tmp_path):
+    cache = PriceCache(str(tmp_path / "cache"), max_size_mb=1e-9)
+    cache.put("AAA", prices("2023-01-01", "2023-02-01"), "Tech", "2023-01-01", "2023-02-01")
+    time.sleep(0.01)
+    cache.put("BBB", prices("2023-01-01", "2023-02-01"), "Tech", "2023-01-01", "2023-02-01")
+
+    # Le ticker qui vient d'être écrit n'est jamais évincé, même au-delà de la limite
+    assert cache.stats()["tickers"] == 1
+    assert cache.missing_ranges("BBB", "2023-01-01", "2023-02-01") == []
+
+
+def test_age_eviction(tmp_path):
+    cache = PriceCache(str(tmp_path / "cache"), max_age_days=1)
+    cache.put("AAA", prices("2023-01-01", "2023-02-01"), "Tech", "2023-01-01", "2023-02-01")
+    cache._index["AAA"]["written_at"] -= 2 * 86400
+
+    assert cache.evict() == ["AAA"]
+    assert cache.missing_ranges("AAA", "2023-01-01", "2023-02-01") == [("2023-01-01", "2023-02-01")]
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_cube import PriceCube
+
+
+@pytest.fixture
+def cube():
+    dates = pd.bdate_range("2023-01-02", periods=30)
+    rng = np.random.default_rng(0)
+    rows = []
+    for ticker in ["AAA", "BBB"]:
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        rows += [(date, ticker, price) for date, price in zip(dates, prices)
+                 if not (ticker == "BBB" and date.day % 3 == 0)]  # BBB a des trous
+    return PriceCube.from_frame(pd.DataFrame(rows, columns=["IMPORT_DATE", "TICKER", "PRICE"]))
+
+
+def test_as_of_excludes_the_simulation_date(cube):
+    window = cube.as_of(pd.Timestamp("2023-01-16"), lookback=5)
+
+    assert window.dates.max() < np.datetime64("2023-01-16")
+    assert len(window.dates) == 5
+    assert set(window.to_frame()["TICKER"]) == {"AAA", "BBB"}
+
+
+def test_observations_are_cut_at_the_latest_date(cube):
+    until = pd.DatetimeIndex(["2023-01-09", "2023-01-23", "2023-01-16"])
+    prices, counts = cube.observations("BBB", until)
+
+    assert len(prices) == counts.max()
+    for date, count in zip(until, counts):
+        expected = cube.history("BBB", date)
+        assert count == len(expected)
+        np.testing.assert_array_equal(prices[:count], expected.to_numpy())
+
+
+def test_observations_for_a_single_date_and_an_unknown_ticker(cube):
+    prices, count = cube.observations("AAA", pd.Timestamp("2023-01-05"))
+    assert count == 3 and len(prices) == 3
+
+    prices, counts = cube.observations("ZZZ", pd.DatetimeIndex(["2023-01-05"]))
+    assert len(prices) == 0 and counts.tolist() == [0]
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling_metrics import TRADING_DAYS, compute_rolling_metrics, rolling_max_drawdown, rolling_volatility_sharpe
+
+
+@pytest.fixture
+def nav():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2022-01-03", periods=300, name="DATE")
+    values = {risk_type: 1e6 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, len(dates))))
+              for risk_type in ["HY_EQUITY", "LOW_RISK"]}
+    frame = pd.DataFrame(values, index=dates)
+    frame.iloc[:40, 1] = np.nan  # portefeuille lancé plus tard
+    return frame
+
+
+def test_volatility_and_sharpe_match_pandas_rolling(nav):
+    returns = nav.pct_change(fill_method=None).iloc[1:]
+    volatility, sharpe = rolling_volatility_sharpe(returns.to_numpy(), 20)
+
+    rolling = returns.rolling(20)
+    std = rolling.std()
+    np.testing.assert_allclose(volatility, std * np.sqrt(TRADING_DAYS), rtol=1e-7, equal_nan=True)
+    np.testing.assert_allclose(sharpe, rolling.mean() / std * np.sqrt(TRADING_DAYS), rtol=1e-7, equal_nan=True)
+
+
+def test_max_drawdown_matches_pandas_rolling(nav):
+    expected = nav.rolling(20).apply(lambda window: (window / np.maximum.accumulate(window) - 1).min(), raw=True)
+    np.testing.assert_allclose(rolling_max_drawdown(nav.to_numpy(), 20), expected, rtol=1e-12, equal_nan=True)
+
+
+def test_long_frame_keeps_only_complete_windows(nav):
+    metrics = compute_rolling_metrics(nav, {"1M": 21})
+
+    volatility = metrics[(metrics["METRIC"] == "VOLATILITY") & (metrics["RISK_TYPE"] == "LOW_RISK")]
+    assert volatility["DATE"].min() == nav.index[40 + 21]
+    # 21 rendements demandent 22 points de NAV, le drawdown se contente de 21 points
+    counts = metrics[metrics["RISK_TYPE"] == "HY_EQUITY"].groupby("METRIC").size()
+    assert counts.to_dict() == {"MAX_DRAWDOWN": len(nav) - 20, "SHARPE": len(nav) - 21, "VOLATILITY": len(nav) - 21}
+
+
+def test_empty_nav_gives_an_empty_frame():
+    metrics = compute_rolling_metrics(pd.DataFrame())
+    assert metrics.empty
+    assert list(metrics.columns) == ["DATE", "RISK_TYPE", "WINDOW", "METRIC", "VALUE"]
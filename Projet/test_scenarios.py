@@ -0,0 +1,34 @@
+import os
+import sqlite3
+
+import pytest
+
+from scenarios import ScenarioRunner, run_scenario
+
+SCENARIO = {"name": "broken", "start_date": "02/01/2023", "end_date": "09/01/2023", "tickers": ["AAPL"]}
+
+
+@pytest.fixture
+def base_db(tmp_path):
+    # Base sans Products : la simulation échoue, mais Deals et Portfolio_History restent lisibles
+    path = str(tmp_path / "base.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Deals (TICKER TEXT)")
+    conn.execute("CREATE TABLE Portfolio_History (TICKER TEXT)")
+    conn.close()
+    return path
+
+
+def test_failed_simulation_is_reported_as_error(base_db, tmp_path):
+    result = run_scenario(base_db, str(tmp_path), SCENARIO)
+
+    assert result["status"] == "error"
+    assert result["error"]
+
+
+def test_kept_databases_survive_the_run(base_db, tmp_path):
+    runner = ScenarioRunner(base_db, str(tmp_path / "results.db"), max_workers=1, keep_databases=True)
+    runs = runner.run([SCENARIO])
+
+    assert runs["STATUS"].tolist() == ["error"]
+    assert os.path.exists(os.path.join(runner.last_workdir, "broken.db"))
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_cube import PriceCube
+from strategies import RunAllStrat
+
+
+def passes_low_risk_filter(quantities, initial_quantities, cov_matrix, latest_prices, max_budget,
+                           num_days, target_volatility):
+    # Même filtre que strategy_three applique aux candidats
+    diff = quantities - initial_quantities
+    weights = quantities / quantities.sum()
+    volatility = np.sqrt(weights @ (cov_matrix * num_days) @ weights)
+    return (not ((diff < -10000).any() or (diff > 150000).any())
+            and volatility <= target_volatility and quantities @ latest_prices <= max_budget)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_optimize_low_risk_returns_quantities_passing_the_candidate_filter(seed):
+    rng = np.random.default_rng(seed)
+    nb_assets = 5
+    # Actifs volatils à fort rendement : l'optimum touche la contrainte de volatilité
+    daily_vols = rng.uniform(0.02, 0.06, nb_assets)
+    correlation = np.full((nb_assets, nb_assets), 0.3) + 0.7 * np.eye(nb_assets)
+    cov_matrix = np.outer(daily_vols, daily_vols) * correlation
+    mean_returns = rng.uniform(0.001, 0.01, nb_assets)
+    latest_prices = rng.uniform(5, 500, nb_assets)
+    initial_quantities = np.floor(rng.uniform(0, 200, nb_assets))
+    max_budget = 250_000.0
+
+    strat = RunAllStrat(":memory:", "01/01/2024", "31/12/2024", [], low_risk_mode="optimizer")
+    tickers = [f"T{i}" for i in range(nb_assets)]
+    quantities = strat.optimize_low_risk(tickers, mean_returns, cov_matrix, latest_prices,
+                                         initial_quantities, max_budget, num_days=7, target_volatility=0.10)
+
+    assert quantities is not None
+    assert passes_low_risk_filter(quantities, initial_quantities, cov_matrix, latest_prices, max_budget,
+                                  7, 0.10)
+
+
+def test_precomputed_strategy_one_signals_match_the_weekly_windows():
+    rng = np.random.default_rng(0)
+    rows = []
+    for ticker, start in (("BTC-USD", "2023-01-01"), ("ETH-USD", "2023-01-20")):
+        dates = pd.date_range(start, "2023-03-31")
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+        rows += [(date, ticker, price) for date, price in zip(dates, prices) if rng.random() > 0.1]
+    cube = PriceCube.from_frame(pd.DataFrame(rows, columns=["IMPORT_DATE", "TICKER", "PRICE"]))
+    strat = RunAllStrat(":memory:", "02/01/2023", "31/03/2023", [], price_cube=cube)
+    mondays = pd.date_range("2023-01-02", "2023-03-27", freq="W-MON")
+
+    signals = strat.precompute_strategy_one_signals(mondays)
+
+    for monday in mondays:
+        week = signals.loc[[monday]].set_index("TICKER")
+        for ticker in strat.LOW_TURNOVER_TICKERS:
+            # Fenêtre lue chaque semaine par strategy_one
+            history = cube.history(ticker, monday, 20).reset_index(drop=True)
+            signal = week.loc[ticker]
+            assert signal["N_OBS"] == len(history)
+            if history.empty:
+                continue
+            last_week = history.iloc[-8:-1]
+            expected = [history.iloc[-1], history.iloc[0], history.rolling(window=20).mean().iloc[-1],
+                        last_week.max(), last_week.min()]
+            np.testing.assert_array_equal(
+                signal[["LAST_PRICE", "FIRST_PRICE", "MA20", "HIGH_LAST_WEEK", "LOW_LAST_WEEK"]].to_numpy(dtype=float),
+                np.array(expected, dtype=float))
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic_data import SyntheticMarketData
+
+
+@pytest.mark.parametrize("method", ["gbm", "bootstrap"])
+def test_prices_do_not_depend_on_the_request(method):
+    rng = np.random.default_rng(0)
+    source = pd.DataFrame(rng.normal(0, 0.01, (500, 3)))
+    provider = SyntheticMarketData(seed=1, method=method, returns_source=source, chunk_size=2)
+
+    wide = provider.download(["AAA", "BBB", "BTC-USD", "CCC"], "2023-01-01", "2023-07-01")
+    narrow = provider.download(["BTC-USD", "AAA"], "2023-03-01", "2023-04-01")
+
+    pd.testing.assert_frame_equal(narrow, wide.loc["2023-03-01":"2023-03-31", ["BTC-USD", "AAA"]].dropna(how="all"))
+
+
+def test_equities_are_quoted_on_weekdays_only():
+    prices = SyntheticMarketData(seed=0).download(["AAA", "ETH-USD"], "2023-01-01", "2023-02-01")
+
+    assert len(prices["ETH-USD"].dropna()) == 31
+    assert (prices["AAA"].dropna().index.dayofweek < 5).all()
+    assert len(prices["AAA"].dropna()) == len(pd.bdate_range("2023-01-01", "2023-01-31"))
+
+
+def test_frame_matches_the_transport():
+    provider = SyntheticMarketData(seed=0)
+    frame = provider.frame(["AAA", "ETH-USD"], "01/01/2023", "01/02/2023")
+    prices = provider.download(["AAA", "ETH-USD"], "2023-01-01", "2023-02-01")
+
+    pivot = frame.pivot(index="IMPORT_DATE", columns="TICKER", values="PRICE")
+    pivot.index = pd.to_datetime(pivot.index)
+    pd.testing.assert_frame_equal(pivot, prices, check_names=False, check_freq=False)
+    assert set(frame.groupby("TICKER")["SECTOR"].first()) == {provider.get_sector("AAA"), "Cryptocurrency"}